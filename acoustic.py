@@ -0,0 +1,127 @@
+import numpy as np
+
+# Sound level metrics from the raw audio stream (AUDIO_FRAMES in sketch_mar3a.ino).
+# Values handed to the processing pipeline, selected by the `acoustic_metric` setting:
+#   level   level of the latest block
+#   leq     equivalent continuous level over the rolling window
+#   l10     level exceeded 10% of the window (peaks)
+#   l90     level exceeded 90% of the window (background)
+ACOUSTIC_METRICS = ('level', 'leq', 'l10', 'l90')
+BLOCK_DURATION = 0.125  # Seconds per level block ("fast" time weighting)
+LEVEL_FLOOR = 1e-12     # Mean square used for silent blocks (-120 dB)
+
+
+# A-weighting amplitude gain (IEC 61672) at the given frequencies, 1.0 at 1 kHz
+def a_weighting(frequencies):
+    f2 = np.square(np.asarray(frequencies, dtype=np.float64))
+    gain = 12194.0 ** 2 * f2 ** 2 / ((f2 + 20.6 ** 2) * np.sqrt((f2 + 107.7 ** 2) * (f2 + 737.9 ** 2)) *
+                                     (f2 + 12194.0 ** 2))
+    return gain * 10 ** (2.0 / 20)
+
+
+# Turns raw ADC audio into sound levels, a block at a time. Samples are cut
+# into blocks of `block_duration`; per block the DC offset of the microphone
+# bias is removed and the RMS taken (through the spectrum when A-weighting is
+# on), then expressed in dB re 1 ADC count plus `offset_db` (the calibration).
+# Block levels also go into a ring covering `window` seconds for the rolling
+# Leq, L10 and L90. Samples left over from a partial block wait for the next
+# feed(). All per-sample work is vectorized; only the rolling statistics are
+# done per block.
+class AcousticMeter:
+    def __init__(self, sample_rate=8000, window=10.0, a_weighting=True, offset_db=0.0, metric='leq',
+                 block_duration=BLOCK_DURATION):
+        if metric not in ACOUSTIC_METRICS:
+            raise ValueError(f"Unknown acoustic metric: {metric}")
+        self.sample_rate = sample_rate
+        self.block_size = max(int(round(sample_rate * block_duration)), 2)
+        self.block_duration = self.block_size / sample_rate
+        self.window = window
+        self.weighted = a_weighting
+        self.offset_db = offset_db
+        self.metric = metric
+        self._weights = self._spectrum_weights() if a_weighting else None
+        self._pending = np.zeros(0)
+
+        self._levels = np.zeros(max(int(round(window / self.block_duration)), 1))
+        self._filled = 0
+        self._position = 0
+        self.level = None  # Latest block level
+        self.blocks = 0
+
+    # Per-bin factors turning |rfft|^2 of a block into its weighted mean
+    # square (Parseval); the DC bin gets zero, which removes the offset
+    def _spectrum_weights(self):
+        size = self.block_size
+        weights = a_weighting(np.fft.rfftfreq(size, 1 / self.sample_rate)) ** 2
+        weights[1:(size + 1) // 2] *= 2  # Bins standing for both positive and negative frequencies
+        weights[0] = 0.0
+        return weights / size ** 2
+
+    # Same meter for a Settings snapshot
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.audio_sample_rate, settings.acoustic_window, settings.a_weighting,
+                   settings.acoustic_offset_db, settings.acoustic_metric)
+
+    def matches(self, settings):
+        return (self.sample_rate, self.window, self.weighted, self.offset_db, self.metric) == (
+            settings.audio_sample_rate, settings.acoustic_window, settings.a_weighting,
+            settings.acoustic_offset_db, settings.acoustic_metric)
+
+    # Block levels (dB) for the complete blocks in `samples` plus any carried over
+    def block_levels(self, samples):
+        samples = np.asarray(samples, dtype=np.float64)
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        count = len(samples) // self.block_size
+        self._pending = samples[count * self.block_size:].copy()
+        if count == 0:
+            return np.zeros(0)
+
+        blocks = samples[:count * self.block_size].reshape(count, self.block_size)
+        if self._weights is not None:
+            spectrum = np.fft.rfft(blocks, axis=1)
+            mean_square = (spectrum.real ** 2 + spectrum.imag ** 2) @ self._weights
+        else:
+            centered = blocks - blocks.mean(axis=1, keepdims=True)
+            mean_square = np.einsum('ij,ij->i', centered, centered) / self.block_size
+        return 10 * np.log10(np.maximum(mean_square, LEVEL_FLOOR)) + self.offset_db
+
+    # Feed raw samples; returns the selected metric after each completed block
+    def feed(self, samples):
+        levels = self.block_levels(samples)
+        if self.metric == 'level':
+            for level in levels.tolist():
+                self._push(level)
+            return levels
+
+        values = np.empty(len(levels))
+        for i, level in enumerate(levels.tolist()):
+            self._push(level)
+            values[i] = self.statistic(self.metric)
+        return values
+
+    def _push(self, level):
+        self._levels[self._position] = level
+        self._position = (self._position + 1) % len(self._levels)
+        self._filled = min(self._filled + 1, len(self._levels))
+        self.level = level
+        self.blocks += 1
+
+    # Rolling statistic over the window ('level', 'leq', 'l10' or 'l90')
+    def statistic(self, name):
+        if self._filled == 0:
+            return None
+        if name == 'level':
+            return self.level
+        levels = self._levels[:self._filled]
+        if name == 'leq':
+            return float(10 * np.log10(np.mean(10 ** (levels / 10))))
+        if name == 'l10':
+            return float(np.percentile(levels, 90))
+        if name == 'l90':
+            return float(np.percentile(levels, 10))
+        raise ValueError(f"Unknown acoustic metric: {name}")
+
+    def summary(self):
+        return {name: self.statistic(name) for name in ACOUSTIC_METRICS}
@@ -0,0 +1,315 @@
+import numpy as np
+
+# Alert rules beyond the main threshold, written as a semicolon-separated
+# list of "kind:threshold" followed by optional key=value parameters, e.g.
+# "above:90 duration=1 renotify=60; rate:40; percent:70 percent=50 window=600":
+#   above:L      processed level above L
+#   below:L      processed level below L
+#   rate:R       level changing faster than R per second (either direction)
+#   percent:L    level above L for at least `percent`% of the last `window` seconds
+# Parameters (all default to 0 unless noted):
+#   duration     seconds the condition must hold before the alert fires
+#   hysteresis   how far back past the threshold the measure must go to resolve
+#   cooldown     seconds after resolving before the rule can trigger again
+#   renotify     seconds between repeat notifications while firing (0 = once)
+#   window       seconds covered by a percent rule (default 60)
+#   percent      share of the window for a percent rule (default 50)
+#   name         name used in messages (default "kind:threshold")
+#   sound        0 to keep the rule silent (default 1)
+ALERT_RULE_KINDS = ('above', 'below', 'rate', 'percent')
+ALERT_STATES = ('armed', 'pending', 'firing', 'cooldown', 'resolved')
+ALERT_RULE_EXAMPLES = ("", "above:95 duration=0.5", "below:5 duration=600", "rate:40",
+                       "percent:70 percent=50 window=600 renotify=300")
+
+
+class AlertRule:
+    def __init__(self, kind, threshold, duration=0.0, hysteresis=0.0, cooldown=0.0, renotify=0.0,
+                 window=60.0, percent=50.0, name=None, sound=True):
+        if kind not in ALERT_RULE_KINDS:
+            raise ValueError(f"unknown alert rule '{kind}'")
+        if min(duration, hysteresis, cooldown, renotify) < 0:
+            raise ValueError("duration, hysteresis, cooldown and renotify must not be negative")
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if not 0 < percent <= 100:
+            raise ValueError("percent must be in (0, 100]")
+        self.kind = kind
+        self.threshold = float(threshold)
+        self.duration = float(duration)
+        self.hysteresis = float(hysteresis)
+        self.cooldown = float(cooldown)
+        self.renotify = float(renotify)
+        self.window = float(window)
+        self.percent = float(percent)
+        self.name = name or f"{kind}:{threshold:g}"
+        self.sound = sound
+
+    # The condition for a measure passed to on_event, e.g. "level 91.0 > 80"
+    def describe(self, value):
+        if self.kind == 'above':
+            return f"level {value:.1f} > {self.threshold:g}"
+        if self.kind == 'below':
+            return f"level {value:.1f} < {self.threshold:g}"
+        if self.kind == 'rate':
+            return f"level changing {value:.1f}/s > {self.threshold:g}/s"
+        return f"level above {self.threshold:g} for {value:.0f}% of the last {self.window:g}s"
+
+    # The measure alone, e.g. "level 75.2"
+    def describe_value(self, value):
+        if self.kind == 'rate':
+            return f"level changing {value:.1f}/s"
+        if self.kind == 'percent':
+            return f"level above {self.threshold:g} for {value:.0f}% of the last {self.window:g}s"
+        return f"level {value:.1f}"
+
+
+# Build AlertRules from their text form; raises ValueError for unknown kinds,
+# parameters or bad values
+def parse_alert_rules(spec):
+    rules = []
+    for part in spec.split(';'):
+        words = part.split()
+        if not words or words == ['none']:
+            continue
+        kind, _, threshold = words[0].lower().partition(':')
+        if not threshold:
+            raise ValueError(f"alert rule '{kind}' needs a threshold, e.g. {kind}:80")
+        options = {}
+        for word in words[1:]:
+            key, _, value = word.partition('=')
+            key = key.lower()
+            if not value:
+                raise ValueError(f"expected key=value, got '{word}'")
+            if key == 'name':
+                options[key] = value
+            elif key == 'sound':
+                options[key] = value.lower() not in ('0', 'off', 'no', 'false')
+            elif key in ('duration', 'hysteresis', 'cooldown', 'renotify', 'window', 'percent'):
+                options[key] = float(value)
+            else:
+                raise ValueError(f"unknown alert rule parameter '{key}'")
+        rules.append(AlertRule(kind, float(threshold), **options))
+    names = [rule.name for rule in rules]
+    if len(set(names)) != len(names):
+        raise ValueError("alert rule names must be unique")
+    return rules
+
+
+# Where one rule is in its cycle: armed -> pending (condition met) -> firing
+# (held for `duration`) -> resolved (cleared past the hysteresis) -> cooldown
+# -> armed. A pending rule whose condition clears goes straight back to armed.
+class AlertState:
+    def __init__(self):
+        self.state = 'armed'
+        self.since = 0.0        # Start of the pending condition
+        self.until = 0.0        # End of the cooldown
+        self.resolved_at = 0.0
+        self.last_notify = 0.0  # Time of the last firing/renotify event
+        # Percent rules: above-threshold flags of the samples still in the window
+        self.window_times = np.zeros(0)
+        self.window_above = np.zeros(0, dtype=bool)
+        self.first_time = None
+
+
+# Evaluates a set of rules on batches of (processed value, time) samples.
+# Each rule's condition is computed for the whole batch with NumPy (the level
+# and rate rules as one comparison against the column of thresholds), so the
+# per-sample work does not grow with the number of rules. The state machines
+# then jump from one condition change to the next with searchsorted, so the
+# Python work per rule is proportional to the number of state changes, not
+# samples. Transitions are reported after each batch, in time order, as
+# on_event(rule, event, time, value) with event 'pending', 'cancelled',
+# 'firing', 'renotify' or 'resolved' and value the rule's measure at that
+# sample (level, rate or percent of the window).
+class AlertEngine:
+    def __init__(self, rules=(), on_event=None):
+        self.on_event = on_event
+        self.rules = []
+        self.states = []
+        self._previous = None  # (value, time) of the last sample, for rate rules
+        self._events = []
+        self.set_rules(rules)
+
+    # Replace the rules; a rule keeps its state when one of the same name existed
+    def set_rules(self, rules):
+        old = {rule.name: state for rule, state in zip(self.rules, self.states)}
+        previous = {rule.name: rule for rule in self.rules}
+        self.rules = list(rules)
+        self.states = []
+        for rule in self.rules:
+            state = old.get(rule.name) or AlertState()
+            before = previous.get(rule.name)
+            if before is not None and (before.kind, before.threshold, before.window) != (
+                    rule.kind, rule.threshold, rule.window):
+                state.window_times = np.zeros(0)
+                state.window_above = np.zeros(0, dtype=bool)
+                state.first_time = None
+            self.states.append(state)
+        self._thresholds = np.array([rule.threshold for rule in self.rules])
+        self._hysteresis = np.array([rule.hysteresis for rule in self.rules])
+        self._groups = {kind: np.array([i for i, rule in enumerate(self.rules) if rule.kind == kind], dtype=np.intp)
+                        for kind in ALERT_RULE_KINDS}
+
+    def reset(self):
+        self.states = [AlertState() for _ in self.rules]
+        self._previous = None
+
+    # Current state name per rule
+    def state_names(self):
+        return {rule.name: state.state for rule, state in zip(self.rules, self.states)}
+
+    @property
+    def firing(self):
+        return any(state.state == 'firing' for state in self.states)
+
+    # Run a batch through every rule. Returns a (rules, samples) boolean array,
+    # True where the rule was firing.
+    def evaluate(self, values, timestamps):
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        count = len(values)
+        firing = np.zeros((len(self.rules), count), dtype=bool)
+        if count == 0:
+            return firing
+
+        measures, active, clear = self._conditions(values, timestamps)
+        for i, (rule, state) in enumerate(zip(self.rules, self.states)):
+            self._run(rule, state, measures[i], active[i], clear[i], timestamps, firing[i])
+        self._previous = (values[-1], timestamps[-1])
+
+        events, self._events = self._events, []
+        if self.on_event is not None:
+            events.sort(key=lambda event: event[2])  # Stable, so same-time events keep rule order
+            for event in events:
+                self.on_event(*event)
+        return firing
+
+    # Per rule and sample: the measure, whether the condition holds and
+    # whether it has cleared past the hysteresis
+    def _conditions(self, values, timestamps):
+        shape = (len(self.rules), len(values))
+        measures = np.empty(shape)
+        active = np.empty(shape, dtype=bool)
+        clear = np.empty(shape, dtype=bool)
+        thresholds = self._thresholds[:, None]
+        hysteresis = self._hysteresis[:, None]
+
+        for kind in ('above', 'below', 'rate'):
+            rows = self._groups[kind]
+            if len(rows) == 0:
+                continue
+            measure = values if kind != 'rate' else self._rates(values, timestamps)
+            measures[rows] = measure
+            if kind == 'below':
+                active[rows] = measure < thresholds[rows]
+                clear[rows] = measure >= thresholds[rows] + hysteresis[rows]
+            else:
+                active[rows] = measure > thresholds[rows]
+                clear[rows] = measure <= thresholds[rows] - hysteresis[rows]
+
+        for row in self._groups['percent'].tolist():
+            rule = self.rules[row]
+            share, covered = self._window_share(rule, self.states[row], values, timestamps)
+            measures[row] = share
+            active[row] = (share >= rule.percent) & covered
+            clear[row] = share < rule.percent - rule.hysteresis
+        return measures, active, clear
+
+    # Absolute rate of change per second, continuing from the previous batch
+    def _rates(self, values, timestamps):
+        if self._previous is None:
+            previous_value, previous_time = values[0], timestamps[0]
+        else:
+            previous_value, previous_time = self._previous
+        changes = np.abs(np.diff(values, prepend=previous_value))
+        intervals = np.diff(timestamps, prepend=previous_time)
+        rates = np.zeros(len(values))
+        np.divide(changes, intervals, out=rates, where=intervals > 0)
+        return rates
+
+    # Percent of the samples in the rule's window (ending at each sample) that
+    # are above its threshold, and whether the window has been fully covered
+    def _window_share(self, rule, state, values, timestamps):
+        times = np.concatenate((state.window_times, timestamps))
+        above = np.concatenate((state.window_above, values > rule.threshold))
+        held = len(state.window_times)
+        if state.first_time is None:
+            state.first_time = timestamps[0]
+
+        totals = np.concatenate(([0], np.cumsum(above)))
+        ends = np.arange(held + 1, len(times) + 1)
+        starts = np.searchsorted(times, timestamps - rule.window, side='right')
+        share = (totals[ends] - totals[starts]) / (ends - starts) * 100
+        covered = timestamps - state.first_time >= rule.window
+
+        keep = int(np.searchsorted(times, times[-1] - rule.window, side='right'))
+        state.window_times = times[keep:]
+        state.window_above = above[keep:]
+        return share, covered
+
+    # Step one rule's state machine through the batch, jumping between the
+    # samples where something can change
+    def _run(self, rule, state, measure, active, clear, timestamps, firing):
+        count = len(timestamps)
+        active_at = np.flatnonzero(active)
+        clear_at = np.flatnonzero(clear)
+
+        def next_index(indexes, start):
+            position = int(np.searchsorted(indexes, start))
+            return int(indexes[position]) if position < len(indexes) else count
+
+        i = 0
+        fire_start = 0
+        while i < count:
+            if state.state == 'armed':
+                i = next_index(active_at, i)
+                if i == count:
+                    break
+                state.state = 'pending'
+                state.since = timestamps[i]
+                self._emit(rule, 'pending', timestamps[i], measure[i])
+                i += 1
+            elif state.state == 'pending':
+                cleared = next_index(clear_at, i)
+                due = max(int(np.searchsorted(timestamps, state.since + rule.duration, side='right')), i)
+                if due < cleared and due < count:
+                    state.state = 'firing'
+                    state.last_notify = timestamps[due]
+                    self._emit(rule, 'firing', timestamps[due], measure[due])
+                    fire_start = i = due
+                elif cleared < count:
+                    state.state = 'armed'
+                    self._emit(rule, 'cancelled', timestamps[cleared], measure[cleared])
+                    i = cleared
+                else:
+                    break
+            elif state.state == 'firing':
+                cleared = next_index(clear_at, i)
+                while rule.renotify > 0:
+                    due = max(int(np.searchsorted(timestamps, state.last_notify + rule.renotify)), i)
+                    if due >= cleared:
+                        break
+                    state.last_notify = timestamps[due]
+                    self._emit(rule, 'renotify', timestamps[due], measure[due])
+                    i = due + 1
+                firing[fire_start:cleared] = True
+                if cleared == count:
+                    break
+                state.state = 'resolved'
+                state.resolved_at = timestamps[cleared]
+                self._emit(rule, 'resolved', timestamps[cleared], measure[cleared])
+                i = cleared + 1
+            elif state.state == 'resolved':
+                if rule.cooldown > 0:
+                    state.state = 'cooldown'
+                    state.until = state.resolved_at + rule.cooldown
+                else:
+                    state.state = 'armed'
+            else:  # cooldown
+                i = max(int(np.searchsorted(timestamps, state.until)), i)
+                if i == count:
+                    break
+                state.state = 'armed'
+
+    def _emit(self, rule, event, now, value):
+        self._events.append((rule, event, float(now), float(value)))
@@ -0,0 +1,303 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import threading
+import time
+import tty
+from binascii import crc_hqx
+from datetime import datetime
+
+import numpy as np
+import serial
+
+from acoustic import AcousticMeter
+from history import SampleHistory
+from metrics import Metrics
+from pipeline import NoisePipeline
+from serial_reader import AUDIO_SYNC, FRAME_HEADER, FRAME_SYNC, SerialSampleReader
+from settings import Settings
+from ui_mailbox import Mailbox
+from volume_actuator import MockBackend, VolumeActuator
+
+# Samples carry a running counter (mod the 12-bit ADC range) so the receiving
+# side can match each one to its send time and spot gaps
+SEQUENCE_RANGE = 4096
+AUDIO_FRAME_SAMPLES = 256  # As in sketch_mar3a.ino
+FORMATS = ('text', 'binary', 'audio')
+
+
+# Encode samples in the sketch_mar3a.ino text format
+def encode_text(values):
+    return b''.join(f"Raw Noise Level: {v} | Smoothed Noise: {v} | Mapped Volume: {10 + v * 90 // 4095}\r\n"
+                    .encode() for v in values)
+
+
+# Encode samples as binary frames of up to `frame_samples` samples each
+# (raw audio frames with sync=AUDIO_SYNC)
+def encode_frames(values, sequence, device_time, frame_samples=10, sync=FRAME_SYNC):
+    frames = []
+    for start in range(0, len(values), frame_samples):
+        block = values[start:start + frame_samples]
+        body = FRAME_HEADER.pack(sync, sequence & 0xFFFF, device_time & 0xFFFFFFFF, len(block))
+        body += struct.pack(f'<{len(block)}H', *block)
+        frames.append(body + struct.pack('<H', crc_hqx(body[len(FRAME_SYNC):], 0xFFFF)))
+        sequence += 1
+    return b''.join(frames), sequence
+
+
+# Microphone waveform for samples first..first+count-1 at `sample_rate`: a
+# 1 kHz tone around the mid-scale bias whose amplitude swells and fades every
+# 5 s, so the sound level keeps moving
+def audio_waveform(first, count, sample_rate):
+    times = np.arange(first, first + count) / sample_rate
+    amplitude = 400 + 300 * np.sin(2 * np.pi * 0.2 * times)
+    return np.clip(np.rint(2048 + amplitude * np.sin(2 * np.pi * 1000 * times)), 0, 4095).astype(int).tolist()
+
+
+# Poses as the ESP32 on the master side of a pty: writes `burst` samples at a
+# time so that `rate` samples/s go out on average (rate 0 = as fast as the
+# port accepts) and records when each sample was written. 'audio' sends raw
+# audio frames of a waveform sampled at `rate` (8000 when rate is 0).
+class FakeDevice:
+    def __init__(self, fmt='text', rate=100.0, burst=1, duration=5.0, frame_samples=10):
+        self.fmt = fmt
+        self.rate = rate
+        self.burst = burst
+        self.duration = duration
+        self.frame_samples = frame_samples
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port_name = os.ttyname(slave)
+        self._slave = slave  # Held open so the pty survives until the port is opened
+        self.send_times = []
+        self.sent = 0
+        self.send_elapsed = 0.0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-esp32", daemon=True)
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def close(self):
+        os.close(self._slave)
+        os.close(self.master)
+
+    def _run(self):
+        interval = self.burst / self.rate if self.rate > 0 else 0.0
+        sequence = 0
+        started = time.perf_counter()
+        next_time = started
+        end_time = started + self.duration
+        while True:
+            now = time.perf_counter()
+            if now >= end_time:
+                break
+            if interval and now < next_time:
+                time.sleep(min(next_time - now, 0.01))
+                continue
+            next_time += interval
+
+            if self.fmt == 'audio':
+                values = audio_waveform(self.sent, self.burst, self.rate or 8000)
+                data, sequence = encode_frames(values, sequence, int((now - started) * 1000), AUDIO_FRAME_SAMPLES,
+                                               AUDIO_SYNC)
+            elif self.fmt == 'binary':
+                values = [(self.sent + i) % SEQUENCE_RANGE for i in range(self.burst)]
+                data, sequence = encode_frames(values, sequence, int((now - started) * 1000), self.frame_samples)
+            else:
+                values = [(self.sent + i) % SEQUENCE_RANGE for i in range(self.burst)]
+                data = encode_text(values)
+            # Stamp before writing so the reader never sees a sample without a send time
+            self.send_times.extend([time.perf_counter()] * len(values))
+            self.sent += len(values)
+            view = memoryview(data)
+            while view:
+                written = os.write(self.master, view)
+                view = view[written:]
+        self.send_elapsed = time.perf_counter() - started
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return None
+    values = np.array(latencies) * 1000
+    p50, p99, p999 = np.percentile(values, [50, 99, 99.9])
+    return {'count': len(values), 'p50_ms': p50, 'p99_ms': p99, 'p999_ms': p999,
+            'mean_ms': values.mean(), 'max_ms': values.max()}
+
+
+# One benchmark run: the app's read path (pyserial port, SerialSampleReader,
+# NoisePipeline.step_batch once per read, VolumeActuator with the mock
+# backend, SampleHistory and the UI mailbox) against a FakeDevice. Latency is measured from the write on the
+# device side to the backend volume call, and to a simulated GUI poll of the
+# mailbox. With `stages` the per-stage instrumentation is switched on and
+# reported too. In 'audio' format the waveform goes through an AcousticMeter
+# first, as in read_serial, and the pipeline sees the sound levels; samples
+# are matched to send times by count, so latencies assume no lost frames.
+def run_benchmark(fmt='text', rate=100.0, burst=1, duration=5.0, frame_samples=10, baud_rate=115200,
+                  ui_interval=0.05, drain_timeout=1.0, stages=False, min_delta=0.01, max_rate=20.0):
+    device = FakeDevice(fmt, rate, burst, duration, frame_samples)
+    ser = serial.Serial(device.port_name, baud_rate, timeout=0.2)
+    metrics = Metrics(enabled=stages)
+    reader = SerialSampleReader(ser, metrics=metrics)
+
+    actuation = []
+    display = []
+    send_time = [0.0]  # Send time of the newest sample in the batch being processed
+
+    actuator = VolumeActuator(MockBackend(), min_delta=min_delta, max_rate=max_rate, metrics=metrics,
+                              on_applied=lambda level, stamp, done: actuation.append(done - stamp))
+    actuator.start()
+    # Alerts would hold the volume still; only the path to actuation is measured
+    settings = Settings(alert_enabled=False, sound_alert=False, audio_sample_rate=int(rate) if rate > 0 else 8000)
+    meter = AcousticMeter.from_settings(settings)
+    levels = 0
+    pipeline = NoisePipeline(set_volume=lambda level: actuator.request(level, send_time[0]), metrics=metrics)
+    history = SampleHistory(1 << 20)
+    mailbox = Mailbox()
+
+    received = 0
+    missing = 0
+    expected = 0
+    last_batch_time = None
+    running = True
+
+    # Simulated GUI timer reading the mailbox
+    def poll_display():
+        while running:
+            value = mailbox.take()
+            if value is not None:
+                display.append(time.perf_counter() - device.send_times[value])
+            time.sleep(ui_interval)
+    display_thread = threading.Thread(target=poll_display, name="display-poll", daemon=True)
+    display_thread.start()
+
+    device.start()
+    started = time.perf_counter()
+    last_data = started
+    try:
+        while True:
+            samples = reader.read_samples()
+            now = time.perf_counter()
+            if len(samples) == 0:
+                if not device._thread.is_alive() and (received + missing >= device.sent or
+                                                      now - last_data > drain_timeout):
+                    break
+                continue
+            last_data = now
+
+            if reader.mode == 'audio':
+                # Raw audio: the sound level metric takes the place of the reading
+                received += len(samples)
+                values = meter.feed(samples)
+                if len(values) == 0:
+                    continue
+                levels += len(values)
+                indexes = np.array([received - 1])
+                samples = values.tolist()
+                send_time[0] = device.send_times[received - 1]
+            else:
+                # Match the samples to their send times; a jump in the counter means samples were lost
+                values = np.asarray(samples, dtype=np.int64)
+                skipped = (values - np.concatenate(([expected], (values[:-1] + 1) % SEQUENCE_RANGE))) % SEQUENCE_RANGE
+                indexes = received + missing + np.arange(len(values)) + np.cumsum(skipped)
+                missing += int(skipped.sum())
+                expected = int(values[-1] + 1) % SEQUENCE_RANGE
+                received += len(samples)
+                send_time[0] = device.send_times[int(indexes[-1])]
+
+            # One batch per read, timestamped as process_samples in mfc.py does
+            batch_time = time.time()
+            first = batch_time if last_batch_time is None else max(last_batch_time, batch_time - 1.0)
+            timestamps = np.linspace(first, batch_time, len(samples) + 1)[1:]
+            last_batch_time = batch_time
+            processed, volume_levels, is_alert = pipeline.step_batch(samples, settings, timestamps)
+            history.extend(timestamps, samples, processed, volume_levels)
+            mailbox.post(int(indexes[-1]))
+        elapsed = last_data - started
+    finally:
+        running = False
+        actuator.stop()
+        device.join()
+        ser.close()
+        device.close()
+        display_thread.join()
+
+    stats = reader.stats()
+    lost = device.sent - received
+    return {
+        'format': fmt,
+        'rate': rate,
+        'burst': burst,
+        'duration': duration,
+        'frame_samples': frame_samples if fmt == 'binary' else AUDIO_FRAME_SAMPLES if fmt == 'audio' else None,
+        'levels': levels if fmt == 'audio' else None,
+        'sent': device.sent,
+        'received': received,
+        'dropped': lost,
+        'drop_rate': lost / device.sent if device.sent else 0.0,
+        'send_rate': device.sent / device.send_elapsed if device.send_elapsed else 0.0,
+        'throughput': received / elapsed if elapsed > 0 else 0.0,
+        'actuation_latency': latency_summary(actuation),
+        'display_latency': latency_summary(display),
+        'volume': actuator.stats(),
+        'reader': {name: stats[name] for name in ('mode', 'port_high_water', 'buffer_high_water', 'invalid_lines',
+                                                  'frame_errors', 'lost_frames', 'dropped_bytes')},
+        'stages': metrics.snapshot()['stages'] if stages else None,
+    }
+
+
+# Identify the build being measured so results from different builds can be compared
+def build_info():
+    info = {'python': platform.python_version(), 'platform': platform.platform()}
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info['commit'] = None
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput and latency benchmark against a fake ESP32 on a pty")
+    parser.add_argument('--format', nargs='+', default=['text', 'binary'], choices=FORMATS)
+    parser.add_argument('--rate', nargs='+', type=float, default=[10, 100, 1000],
+                        help="samples/s sent by the fake device (0 = as fast as possible); "
+                             "for audio also its sample rate, e.g. 8000")
+    parser.add_argument('--burst', nargs='+', type=int, default=[1], help="samples written at a time")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per run")
+    parser.add_argument('--frame-samples', type=int, default=10, help="samples per binary frame")
+    parser.add_argument('--min-delta', type=float, default=1.0, help="smallest volume change applied (%%)")
+    parser.add_argument('--max-rate', type=float, default=20.0, help="volume updates per second (0 = unlimited)")
+    parser.add_argument('--stages', action='store_true', help="also report per-stage timings")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    results = {'build': build_info(), 'started': datetime.now().isoformat(timespec='seconds'), 'runs': []}
+    for fmt, rate, burst in itertools.product(args.format, args.rate, args.burst):
+        run = run_benchmark(fmt, rate, burst, args.duration, args.frame_samples, stages=args.stages,
+                            min_delta=args.min_delta / 100, max_rate=args.max_rate)
+        results['runs'].append(run)
+        latency = run['actuation_latency'] or {}
+        print(f"{fmt:6} rate {rate:8.0f} burst {burst:4}: {run['throughput']:9.0f} samples/s, "
+              f"drop {run['drop_rate']:.2%}, p50 {latency.get('p50_ms', 0):.2f} ms, "
+              f"p99 {latency.get('p99_ms', 0):.2f} ms, p999 {latency.get('p999_ms', 0):.2f} ms", file=sys.stderr)
+
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import math
+import threading
+
+import numpy as np
+
+# Calibration phases in order: (name, seconds)
+CALIBRATION_PHASES = (('quiet', 5.0), ('loud', 5.0))
+CALIBRATION_MARGIN = 0.1  # Widen the measured range by 10% on each side
+
+
+# Streaming statistics of one phase: count, mean, RMS about the mean (the
+# noise, without the DC level of the readings), peak and percentiles
+# from counts of readings rounded down to `resolution`. Adding a batch is a
+# handful of NumPy reductions, so the cost per reading is the same at any
+# input rate, and memory is bounded by the number of distinct rounded values.
+class PhaseStats:
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = math.inf
+        self.peak = -math.inf
+        self._counts = {}
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_squares += float(np.dot(values, values))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.peak = max(self.peak, float(values.max()))
+        keys, key_counts = np.unique(np.floor(values / self.resolution).astype(np.int64), return_counts=True)
+        counts = self._counts
+        for key, count in zip(keys.tolist(), key_counts.tolist()):
+            counts[key] = counts.get(key, 0) + count
+
+    def percentile(self, q):
+        keys = sorted(self._counts)
+        cumulative = np.cumsum([self._counts[key] for key in keys])
+        position = int(np.searchsorted(cumulative, q / 100 * self.count))
+        return keys[min(position, len(keys) - 1)] * self.resolution
+
+    def summary(self):
+        if self.count == 0:
+            return None
+        mean = self.total / self.count
+        return {
+            'count': self.count,
+            'mean': mean,
+            'rms': math.sqrt(max(self.total_squares / self.count - mean * mean, 0.0)),
+            'min': self.minimum,
+            'peak': self.peak,
+            'p5': self.percentile(5),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+        }
+
+
+# One run of the calibration procedure. The serial thread hands every batch
+# of readings to add() as it is processed; readings are assigned to a phase by
+# their time since `start_time`. The GUI only polls phase_at() and calls finish()
+# once the last phase is over, which computes the thresholds from the
+# quiet-phase 5th percentile and the loud-phase 95th percentile:
+#   min_threshold = quiet p5 - 10%,  max_threshold = loud p95 + 10%,
+#   alert_threshold = the processed level (0-100, after the sensitivity
+#   curve) of a reading 80% of the way from min to max.
+class CalibrationSession:
+    def __init__(self, start_time, phases=CALIBRATION_PHASES):
+        self.start_time = start_time
+        self.phases = phases
+        self.duration = sum(duration for _, duration in phases)
+        self.stats = {name: PhaseStats() for name, _ in phases}
+        self.last_value = None
+        self.result = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    # Name of the phase at `now`, or None before the start or after the end
+    def phase_at(self, now):
+        elapsed = now - self.start_time
+        if elapsed < 0:
+            return None
+        for name, duration in self.phases:
+            if elapsed < duration:
+                return name
+            elapsed -= duration
+        return None
+
+    def add(self, values, now):
+        if len(values) == 0:
+            return
+        with self._lock:
+            if self.finished:
+                return
+            self.last_value = values[-1]
+            phase = self.phase_at(now)
+            if phase is not None:
+                self.stats[phase].add(values)
+
+    # End the session; returns the result (None without data from every phase)
+    def finish(self, sensitivity):
+        with self._lock:
+            if not self.finished:
+                self.finished = True
+                self.result = self._compute(sensitivity)
+            return self.result
+
+    def _compute(self, sensitivity):
+        summaries = {name: stats.summary() for name, stats in self.stats.items()}
+        quiet, loud = summaries.get('quiet'), summaries.get('loud')
+        if quiet is None or loud is None:
+            return None
+        low = quiet['p5']
+        high = max(loud['p95'], quiet['p95'])
+        min_threshold = max(0, int(low - abs(low) * CALIBRATION_MARGIN))
+        max_threshold = int(math.ceil(high + abs(high) * CALIBRATION_MARGIN))
+        if max_threshold <= min_threshold:
+            return None
+        return {
+            'min_threshold': min_threshold,
+            'max_threshold': max_threshold,
+            'alert_threshold': int(0.8 ** (1 / sensitivity) * 100),
+            'noise_floor_rms': quiet['rms'],
+            'phases': summaries,
+        }
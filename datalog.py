@@ -0,0 +1,204 @@
+import csv
+import glob
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+LOG_HEADER = ['Timestamp', 'ISO DateTime', 'Raw Noise', 'Processed Noise', 'Volume Level']
+
+
+# Name for a rotated log: noise_log.csv -> noise_log.2024-03-05.1.csv
+def rotated_log_name(path, day, index):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{day.isoformat()}.{index}{ext}"
+
+
+# All files belonging to a log, oldest first: rotated files, then the active one
+def log_files(path):
+    stem, ext = os.path.splitext(path)
+    rotated = []
+    for name in glob.glob(glob.escape(stem) + ".*" + ext):
+        parts = name[len(stem) + 1:len(name) - len(ext)].split('.')
+        if len(parts) == 2 and parts[1].isdigit():
+            rotated.append((parts[0], int(parts[1]), name))
+    files = [name for _, _, name in sorted(rotated)]
+    if os.path.isfile(path):
+        files.append(path)
+    return files
+
+
+# Writes sample rows to CSV on its own thread so disk latency never stalls
+# sampling. Producers enqueue rows without blocking (rows are counted as
+# dropped if the bounded queue is full); the writer keeps the file open,
+# writes in batches, flushes by row count or time and rotates by size or day.
+# Every file starts with a header. With an enabled `metrics` each batch write
+# is timed.
+class CsvLogWriter:
+    def __init__(self, path, max_bytes=0, rotate_daily=False, max_queue=100000,
+                 batch_size=1000, flush_rows=5000, flush_interval=1.0, on_error=None, metrics=None):
+        self.path = path
+        self.metrics = metrics
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.batch_size = batch_size
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+
+        self._file = None
+        self._writer = None
+        self._open_path = None
+        self._file_day = None
+        self._next_midnight = 0.0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._second = None
+        self._second_text = ""
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-log-writer", daemon=True)
+        self._thread.start()
+
+    # Flush what is queued, close the file and stop the thread
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Change the target file or rotation policy; applied by the writer thread
+    def configure(self, path, max_bytes, rotate_daily):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+
+    # Queue one row (called from the sampling thread, never blocks)
+    def log(self, timestamp, raw_value, processed_value, volume_level):
+        try:
+            self.queue.put_nowait((timestamp, raw_value, processed_value, volume_level))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                if batch:
+                    metrics = self.metrics
+                    if metrics is not None and metrics.enabled:
+                        start = time.perf_counter()
+                        self._write(batch)
+                        metrics.observe('log_write_batch', time.perf_counter() - start)
+                    else:
+                        self._write(batch)
+                if self._file is not None and (self._unflushed >= self.flush_rows or
+                                               time.monotonic() - self._last_flush >= self.flush_interval):
+                    self._flush()
+            except Exception as e:
+                self._report(f"Error logging data: {e}")
+                self._close()
+            batch.clear()
+
+            if self._stop.is_set() and self.queue.empty():
+                break
+        self._close()
+
+    def _write(self, batch):
+        if self._open_path != self.path:
+            self._open(self.path, date.fromtimestamp(batch[0][0]))
+
+        start = 0
+        if self.rotate_daily:
+            # Split the batch at midnight so each day gets its own file
+            for i, row in enumerate(batch):
+                if row[0] >= self._next_midnight:
+                    self._write_rows(batch[start:i])
+                    start = i
+                    self._rotate(date.fromtimestamp(row[0]))
+        self._write_rows(batch[start:])
+
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate(self._file_day)
+
+    def _write_rows(self, rows):
+        if not rows:
+            return
+        writerow = self._writer.writerow
+        for timestamp, raw_value, processed_value, volume_level in rows:
+            # Format the wall-clock string once per second rather than per row
+            second = int(timestamp)
+            if second != self._second:
+                self._second = second
+                self._second_text = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            writerow([timestamp, self._second_text, raw_value, processed_value, volume_level])
+        self._unflushed += len(rows)
+        self.written += len(rows)
+
+    def _open(self, path, day):
+        self._close()
+        # An existing file from an earlier day is rotated before appending
+        if self.rotate_daily and os.path.isfile(path):
+            file_day = date.fromtimestamp(os.path.getmtime(path))
+            if file_day < day:
+                self._rename_rotated(path, file_day)
+
+        file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        self._open_path = path
+        if not file_exists:
+            self._writer.writerow(LOG_HEADER)
+
+        self._file_day = day
+        self._next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+
+    # Move the active file aside (named after the day it holds) and start a
+    # fresh one for `new_day`
+    def _rotate(self, new_day):
+        path = self._open_path
+        old_day = self._file_day
+        self._close()
+        self._rename_rotated(path, old_day)
+        self._open(path, new_day)
+
+    def _rename_rotated(self, path, day):
+        index = 1
+        while os.path.exists(rotated_log_name(path, day, index)):
+            index += 1
+        os.replace(path, rotated_log_name(path, day, index))
+
+    def _flush(self):
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+        self._file = None
+        self._writer = None
+        self._open_path = None
+
+    def _report(self, message):
+        print(message)
+        if self.on_error is not None:
+            self.on_error(message)
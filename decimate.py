@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# Min/max per time bucket for each of `columns`, with buckets aligned to
+# multiples of `width` seconds. `timestamps` must be sorted.
+# Returns (bucket_ids, mins, maxs) where mins/maxs hold one array per column.
+def minmax_buckets(timestamps, columns, width):
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.int64), [np.empty(0) for _ in columns], [np.empty(0) for _ in columns]
+    ids = np.floor_divide(timestamps, width).astype(np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    mins = [np.minimum.reduceat(column, starts) for column in columns]
+    maxs = [np.maximum.reduceat(column, starts) for column in columns]
+    return ids[starts], mins, maxs
+
+
+# Merge bucket results whose ids are sorted but may repeat (e.g. one bucket
+# split across two chunks)
+def merge_buckets(ids, mins, maxs):
+    if len(ids) < 2:
+        return ids, mins, maxs
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    if len(starts) == len(ids):
+        return ids, mins, maxs
+    return (ids[starts], [np.minimum.reduceat(values, starts) for values in mins],
+            [np.maximum.reduceat(values, starts) for values in maxs])
+
+
+# Reduces long time windows to about one min/max pair per horizontal pixel.
+#
+# Buckets are aligned to absolute time, so every bucket that has been closed
+# (a later sample exists) never changes and is cached for as long as the
+# window and bucket count stay the same. Each update only reduces samples
+# from the newest, still-open bucket onwards, so the cost per frame tracks
+# the screen width and the sample rate, not the window length.
+class MinMaxDecimator:
+    def __init__(self, column_count):
+        self.column_count = column_count
+        self.key = None
+        self.width = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.mins = [np.empty(0) for _ in range(column_count)]
+        self.maxs = [np.empty(0) for _ in range(column_count)]
+
+    def reset(self):
+        self.key = None
+
+    # `read(start_time, end_time)` must return a list of
+    # (timestamps, column, column, ...) tuples of sorted samples.
+    # Returns (x, [y per column]) with two points (min, max) per bucket.
+    def update(self, read, window, bucket_count, end_time):
+        key = (window, bucket_count)
+        if key != self.key:
+            self.key = key
+            self.width = window / bucket_count
+            self.ids = np.empty(0, dtype=np.int64)
+            self.mins = [np.empty(0) for _ in range(self.column_count)]
+            self.maxs = [np.empty(0) for _ in range(self.column_count)]
+
+        width = self.width
+        first_id = int(np.floor((end_time - window) / width))
+
+        # Drop buckets that scrolled out; re-reduce from the last (open) bucket
+        keep_from = int(np.searchsorted(self.ids, first_id, side='left'))
+        keep_to = max(len(self.ids) - 1, keep_from)
+        fetch_id = self.ids[keep_to] if keep_to < len(self.ids) else first_id
+        ids = [self.ids[keep_from:keep_to]]
+        mins = [[values[keep_from:keep_to]] for values in self.mins]
+        maxs = [[values[keep_from:keep_to]] for values in self.maxs]
+
+        for chunk in read(fetch_id * width, end_time):
+            chunk_ids, chunk_mins, chunk_maxs = minmax_buckets(chunk[0], chunk[1:], width)
+            ids.append(chunk_ids)
+            for i in range(self.column_count):
+                mins[i].append(chunk_mins[i])
+                maxs[i].append(chunk_maxs[i])
+
+        self.ids, self.mins, self.maxs = merge_buckets(
+            np.concatenate(ids), [np.concatenate(parts) for parts in mins],
+            [np.concatenate(parts) for parts in maxs])
+
+        # Two points per bucket at its centre draw the min/max envelope
+        x = np.repeat((self.ids + 0.5) * width, 2)
+        ys = []
+        for low, high in zip(self.mins, self.maxs):
+            y = np.empty(2 * len(low), dtype=np.float64)
+            y[0::2] = low
+            y[1::2] = high
+            ys.append(y)
+        return x, ys
@@ -0,0 +1,122 @@
+import os
+import queue
+import time
+from datetime import datetime
+
+
+# Name for a rotated event log: noise_events.log -> noise_events.log.1
+def rotated_event_log_name(path, index):
+    return f"{path}.{index}"
+
+
+# Event log lines from any thread, shown by the GUI in batches. post() only
+# puts the message on a bounded queue (messages are counted as dropped if it
+# is full), so the serial thread never touches Tk. The GUI calls drain() on a
+# timer; consecutive repeats of a message are folded into one line with a
+# count, which drain() reports as a replacement of the previous line. Lines
+# are also appended to `path` (if set), rotated once it exceeds `max_bytes`
+# and keeping `backups` older files; a run of repeats is written as the
+# first line plus a "repeated N times" line when the run ends.
+class EventLog:
+    def __init__(self, path=None, max_bytes=1024 * 1024, backups=3, max_queue=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._reported_drops = 0
+        self._last = None  # [message, first time, last time, count] of the newest line
+        self._file = None
+        self._file_failed = False
+
+    # Queue a message (any thread, never blocks)
+    def post(self, message, now=None):
+        try:
+            self.queue.put_nowait((time.time() if now is None else now, message))
+        except queue.Full:
+            self.dropped += 1
+
+    # Take up to `limit` queued messages. Returns (text, replaces_previous)
+    # per line to show, with at most one replacement at the start.
+    def drain(self, limit=1000):
+        lines = []
+        for _ in range(limit):
+            try:
+                now, message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            last = self._last
+            if last is not None and last[0] == message:
+                last[2] = now
+                last[3] += 1
+                if lines:
+                    lines[-1] = (self._format(last), lines[-1][1])
+                else:
+                    lines.append((self._format(last), True))
+                continue
+            self._end_run()
+            self._last = [message, now, now, 1]
+            self._write(self._stamp(now) + message)
+            lines.append((self._format(self._last), False))
+
+        if self.dropped != self._reported_drops:
+            message = f"{self.dropped - self._reported_drops} event log messages dropped (queue full)"
+            self._reported_drops = self.dropped
+            self._end_run()
+            self._last = None
+            self._write(self._stamp(time.time()) + message)
+            lines.append((self._stamp(time.time()) + message, False))
+        return lines
+
+    # Flush a pending repeat count and close the file
+    def close(self):
+        self._end_run()
+        self._last = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _stamp(now):
+        return datetime.fromtimestamp(now).strftime("[%Y-%m-%d %H:%M:%S] ")
+
+    def _format(self, entry):
+        message, first, last, count = entry
+        if count == 1:
+            return self._stamp(first) + message
+        return (self._stamp(first) + message +
+                f" (x{count}, last {datetime.fromtimestamp(last).strftime('%H:%M:%S')})")
+
+    # Record the length of a finished run of repeats in the file
+    def _end_run(self):
+        last = self._last
+        if last is not None and last[3] > 1:
+            self._write(self._stamp(last[2]) + f"Last message repeated {last[3] - 1} more times")
+            last[3] = 1
+
+    def _write(self, line):
+        if self.path is None or self._file_failed:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            # Keep logging to the GUI; report the file problem once
+            self._file_failed = True
+            print(f"Error writing event log file: {e}")
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            source = rotated_event_log_name(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, rotated_event_log_name(self.path, index + 1))
+        if self.backups > 0:
+            os.replace(self.path, rotated_event_log_name(self.path, 1))
+        else:
+            os.remove(self.path)
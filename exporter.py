@@ -0,0 +1,177 @@
+import csv
+import gzip
+import os
+import threading
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+from datalog import LOG_HEADER
+from rollups import row_percentile
+
+EXPORT_FORMATS = {
+    'CSV': '.csv',
+    'Compressed CSV (gzip)': '.csv.gz',
+    'NumPy (.npz)': '.npz',
+}
+COLUMN_NAMES = ('timestamp', 'raw', 'processed', 'volume')
+
+# Summary exports read pre-aggregated rollup rows: format -> rollup tier
+SUMMARY_FORMATS = {
+    'Summary CSV (1 min)': '1min',
+    'Summary CSV (1 h)': '1h',
+    'Summary CSV (daily)': 'day',
+}
+SUMMARY_HEADER = ['Start', 'ISO DateTime', 'Samples', 'Mean', 'Min', 'Max', 'Leq', 'P10', 'P50', 'P90',
+                  'Seconds Above Threshold', 'Volume Mean', 'Volume Min', 'Volume Max']
+
+
+# Streams sample chunks (e.g. from SampleStore.query) to a file on a worker
+# thread. Input chunks are walked in slices of `chunk_rows`, so memory use is
+# bounded by one slice whatever the size of the range. Progress is exposed as
+# `done`/`total` rows; `cancel()` stops at the next slice and removes the
+# partial file.
+class ExportJob:
+    def __init__(self, chunks, path, fmt='CSV', chunk_rows=65536):
+        self.chunks = chunks
+        self.path = path
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.total = sum(len(chunk.timestamp) for chunk in chunks)
+        self.done = 0
+        self.error = None
+        self.finished = False
+        self.cancelled = False
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def progress(self):
+        return 100.0 * self.done / self.total if self.total else 100.0
+
+    # Yield successive column slices of at most chunk_rows rows
+    def _slices(self):
+        for chunk in self.chunks:
+            for start in range(0, len(chunk.timestamp), self.chunk_rows):
+                if self._cancel.is_set():
+                    return
+                yield [column[start:start + self.chunk_rows] for column in chunk]
+
+    def _run(self):
+        try:
+            if self.fmt == 'NumPy (.npz)':
+                self._write_npz()
+            elif self.fmt == 'Compressed CSV (gzip)':
+                with gzip.open(self.path, 'wt', newline='') as file:
+                    self._write_csv(file)
+            else:
+                with open(self.path, 'w', newline='') as file:
+                    self._write_csv(file)
+            if self._cancel.is_set():
+                self.cancelled = True
+                self._remove_partial()
+        except Exception as e:
+            self.error = e
+            self._remove_partial()
+        finally:
+            self.finished = True
+
+    def _write_csv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(LOG_HEADER)
+        last_second = None
+        second_text = ""
+        for timestamps, raw, processed, volume in self._slices():
+            # ADC readings are whole numbers; in audio mode raw holds dB levels
+            if np.array_equal(raw, np.floor(raw)):
+                raw_values = raw.astype(np.int64).tolist()
+            else:
+                raw_values = [f"{value:.6g}" for value in raw.astype(np.float64).tolist()]
+            rows = []
+            for timestamp, raw_value, processed_value, volume_level in zip(
+                    timestamps.tolist(), raw_values,
+                    processed.astype(np.float64).round(4).tolist(), volume.astype(np.int64).tolist()):
+                # Format the wall-clock string once per second rather than per row
+                second = int(timestamp)
+                if second != last_second:
+                    last_second = second
+                    second_text = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+                rows.append((timestamp, second_text, raw_value, processed_value, volume_level))
+            writer.writerows(rows)
+            self.done += len(rows)
+
+    # Write each column as a .npy member of the archive, streamed slice by
+    # slice; the header is written up front since the row count is known.
+    def _write_npz(self):
+        written = 0
+        with zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for position, name in enumerate(COLUMN_NAMES):
+                parts = [chunk[position] for chunk in self.chunks]
+                dtype = parts[0].dtype if parts else np.dtype(np.float64)
+                with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (self.total,),
+                    })
+                    for part in parts:
+                        for start in range(0, len(part), self.chunk_rows):
+                            if self._cancel.is_set():
+                                return
+                            piece = part[start:start + self.chunk_rows]
+                            member.write(np.ascontiguousarray(piece).tobytes())
+                            written += len(piece)
+                            self.done = written // len(COLUMN_NAMES)
+
+    def _remove_partial(self):
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError:
+            pass
+
+
+# Writes rollup rows (see rollups.py) as one CSV line per bucket with the
+# derived statistics, using the same worker thread, progress and cancel
+# handling as ExportJob.
+class SummaryExportJob(ExportJob):
+    def __init__(self, rows, path, chunk_rows=65536):
+        super().__init__([], path, 'CSV', chunk_rows)
+        self.rows = rows
+        self.total = len(rows)
+
+    def _write_csv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(SUMMARY_HEADER)
+        for start in range(0, len(self.rows), self.chunk_rows):
+            if self._cancel.is_set():
+                return
+            rows = self.rows[start:start + self.chunk_rows]
+            count = rows['count'].astype(np.float64)
+            columns = [
+                rows['start'].tolist(),
+                [datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") for t in rows['start'].tolist()],
+                rows['count'].tolist(),
+                (rows['sum'] / count).round(2).tolist(),
+                rows['min'].astype(np.float64).round(2).tolist(),
+                rows['max'].astype(np.float64).round(2).tolist(),
+                (10 * np.log10(rows['energy'] / count)).round(2).tolist(),
+                row_percentile(rows, 10).tolist(),
+                row_percentile(rows, 50).tolist(),
+                row_percentile(rows, 90).tolist(),
+                rows['above'].astype(np.float64).round(1).tolist(),
+                (rows['volume_sum'] / count).round(1).tolist(),
+                rows['volume_min'].astype(np.int64).tolist(),
+                rows['volume_max'].astype(np.int64).tolist(),
+            ]
+            writer.writerows(zip(*columns))
+            self.done += len(rows)
@@ -0,0 +1,264 @@
+import heapq
+import math
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+# Smoothing applied to raw readings before processing, written as a
+# comma-separated chain of stages, e.g. "median:5, average:50":
+#   average:N    moving average over the last N samples
+#   ema:A        exponential moving average with smoothing factor A (0-1]
+#   median:N     median of the last N samples
+#   lowpass:F    first-order low-pass with cutoff F Hz (uses sample times)
+# "none" or an empty chain passes readings through unchanged.
+DEFAULT_FILTER_CHAIN = "average:5"
+FILTER_CHAIN_EXAMPLES = ("average:5", "average:50", "ema:0.2", "median:5", "median:5, average:20",
+                         "lowpass:1.0", "none")
+
+
+# Every stage takes one value at a time through update(value, timestamp) or
+# a NumPy batch through process(values, timestamps); both give the same
+# results and carry state across calls. Until a window has filled, the
+# window stages use the samples seen so far.
+
+# Moving average with a running sum: O(1) per sample whatever the window
+class MovingAverage:
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("average window must be at least 1")
+        self.window = int(window)
+        self.reset()
+
+    def reset(self):
+        self._values = deque(maxlen=self.window)
+        self._sum = 0.0
+        self._since_resync = 0
+
+    # Recompute the sum now and then so rounding errors cannot build up
+    def _resync(self, count):
+        self._since_resync += count
+        if self._since_resync >= 16 * self.window:
+            self._sum = math.fsum(self._values)
+            self._since_resync = 0
+
+    def update(self, value, timestamp=None):
+        values = self._values
+        if len(values) == self.window:
+            self._sum -= values[0]
+        values.append(value)
+        self._sum += value
+        self._resync(1)
+        return self._sum / len(values)
+
+    def process(self, values, timestamps=None):
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        if count == 0:
+            return values.copy()
+        window = self.window
+        held = len(self._values)
+
+        # Value leaving the window as each new one enters (0 while still filling)
+        leaving = np.zeros(count)
+        first = window - held  # First new sample that pushes one out
+        if first < count:
+            dropped = count - first
+            from_held = min(dropped, held)
+            leaving[first:first + from_held] = list(islice(self._values, from_held))
+            leaving[first + from_held:] = values[:dropped - from_held]
+
+        sums = self._sum + np.cumsum(values - leaving)
+        sizes = np.minimum(np.arange(held + 1, held + count + 1), window)
+        self._values.extend(values.tolist())
+        self._sum = float(sums[-1])
+        self._resync(count)
+        return sums / sizes
+
+
+# Exponential moving average: y += alpha * (x - y), starting at the first value
+class ExponentialAverage:
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError("ema factor must be in (0, 1]")
+        self.alpha = float(alpha)
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def update(self, value, timestamp=None):
+        if self._value is None:
+            self._value = float(value)
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def process(self, values, timestamps=None):
+        update = self.update
+        return np.array([update(value) for value in np.asarray(values, dtype=np.float64).tolist()])
+
+
+# Sliding median over two heaps (lower half as a max-heap, upper half as a
+# min-heap). Values leaving the window are deleted lazily: they are counted in
+# `_pending` and discarded once they reach the top of their heap, so each
+# sample costs O(log N).
+class SlidingMedian:
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("median window must be at least 1")
+        self.window = int(window)
+        self.reset()
+
+    def reset(self):
+        self._values = deque()
+        self._low = []   # Negated values
+        self._high = []
+        self._low_size = 0  # Live entries in each heap
+        self._high_size = 0
+        self._pending = {}  # value -> number of stale copies still in a heap
+
+    def _prune(self, heap, sign):
+        pending = self._pending
+        while heap:
+            value = heap[0] * sign
+            stale = pending.get(value)
+            if not stale:
+                break
+            if stale == 1:
+                del pending[value]
+            else:
+                pending[value] = stale - 1
+            heapq.heappop(heap)
+
+    # Keep the lower half equal to or one larger than the upper half
+    def _balance(self):
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(self._low, -1)
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune(self._high, 1)
+
+    def _add(self, value):
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+        self._balance()
+
+    def _remove(self, value):
+        self._pending[value] = self._pending.get(value, 0) + 1
+        if value <= -self._low[0]:
+            self._low_size -= 1
+            if value == -self._low[0]:
+                self._prune(self._low, -1)
+        else:
+            self._high_size -= 1
+            if value == self._high[0]:
+                self._prune(self._high, 1)
+        self._balance()
+
+    def update(self, value, timestamp=None):
+        value = float(value)
+        values = self._values
+        if len(values) == self.window:
+            self._remove(values.popleft())
+        values.append(value)
+        self._add(value)
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (self._high[0] - self._low[0]) / 2
+
+    def process(self, values, timestamps=None):
+        update = self.update
+        return np.array([update(value) for value in np.asarray(values, dtype=np.float64).tolist()])
+
+
+# First-order (RC) low-pass with cutoff `cutoff` Hz. The smoothing factor
+# follows the time since the previous sample, so irregular sample spacing is
+# handled; without timestamps samples are taken as `1 / sample_rate` apart.
+class LowPass:
+    def __init__(self, cutoff, sample_rate=10.0):
+        if cutoff <= 0:
+            raise ValueError("lowpass cutoff must be positive")
+        self.cutoff = float(cutoff)
+        self.time_constant = 1 / (2 * math.pi * self.cutoff)
+        self.sample_interval = 1 / sample_rate
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._time = None
+
+    def update(self, value, timestamp=None):
+        if timestamp is None:
+            timestamp = (self._time or 0.0) + self.sample_interval
+        if self._value is None:
+            self._value = float(value)
+        else:
+            interval = max(timestamp - self._time, 0.0)
+            self._value += interval / (self.time_constant + interval) * (value - self._value)
+        self._time = timestamp
+        return self._value
+
+    def process(self, values, timestamps=None):
+        update = self.update
+        values = np.asarray(values, dtype=np.float64).tolist()
+        if timestamps is None:
+            return np.array([update(value) for value in values])
+        return np.array([update(value, timestamp)
+                         for value, timestamp in zip(values, np.asarray(timestamps, dtype=np.float64).tolist())])
+
+
+FILTER_TYPES = {
+    'average': lambda parameter: MovingAverage(int(parameter)),
+    'ema': lambda parameter: ExponentialAverage(float(parameter)),
+    'median': lambda parameter: SlidingMedian(int(parameter)),
+    'lowpass': lambda parameter: LowPass(float(parameter)),
+}
+
+
+# Stages applied in order; itself usable as a stage
+class FilterChain:
+    def __init__(self, stages=()):
+        self.stages = list(stages)
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def update(self, value, timestamp=None):
+        for stage in self.stages:
+            value = stage.update(value, timestamp)
+        return value
+
+    def process(self, values, timestamps=None):
+        values = np.asarray(values, dtype=np.float64)
+        for stage in self.stages:
+            values = stage.process(values, timestamps)
+        return values
+
+
+# Build a FilterChain from its text form; raises ValueError for unknown
+# stages or bad parameters
+def parse_filter_chain(spec):
+    stages = []
+    for part in spec.split(','):
+        part = part.strip().lower()
+        if not part or part == 'none':
+            continue
+        name, _, parameter = part.partition(':')
+        make = FILTER_TYPES.get(name.strip())
+        if make is None:
+            raise ValueError(f"unknown filter '{name.strip()}'")
+        if not parameter.strip():
+            raise ValueError(f"filter '{name.strip()}' needs a parameter, e.g. {name.strip()}:5")
+        stages.append(make(parameter.strip()))
+    return FilterChain(stages)
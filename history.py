@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Column views over a contiguous run of samples, oldest first.
+# `total` is the writer's sample count when the snapshot was taken.
+HistorySnapshot = namedtuple('HistorySnapshot', ['total', 'timestamp', 'raw', 'processed', 'volume'])
+
+
+# Fixed-capacity columnar ring buffer of (timestamp, raw, processed, volume).
+#
+# Every sample is written twice, at i and i + capacity, so the most recent
+# `capacity` samples are always one contiguous slice and readers get plain
+# NumPy views with no copying. Appends are O(1). A sequence counter (seqlock)
+# is odd while a write is in progress; readers retry until they see the same
+# even value before and after taking their views.
+#
+# A view of n samples stays intact until capacity - n further samples have been
+# appended; use `is_intact` when holding on to one for a long time.
+class SampleHistory:
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        size = 2 * self.capacity
+        self._timestamp = np.zeros(size, dtype=np.float64)
+        self._raw = np.zeros(size, dtype=np.float32)
+        self._processed = np.zeros(size, dtype=np.float32)
+        self._volume = np.zeros(size, dtype=np.float32)
+        self._columns = (self._timestamp, self._raw, self._processed, self._volume)
+
+        self.sequence = 0   # Odd while a write is in progress
+        self.total = 0      # Samples appended since creation
+        self.start = 0      # `total` at the last clear()
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total - self.start, self.capacity)
+
+    # Append a single sample
+    def append(self, timestamp, raw, processed, volume):
+        with self._write_lock:
+            self.sequence += 1
+            index = self.total % self.capacity
+            mirror = index + self.capacity
+            self._timestamp[index] = self._timestamp[mirror] = timestamp
+            self._raw[index] = self._raw[mirror] = raw
+            self._processed[index] = self._processed[mirror] = processed
+            self._volume[index] = self._volume[mirror] = volume
+            self.total += 1
+            self.sequence += 1
+
+    # Append equally long arrays of samples in one go
+    def extend(self, timestamps, raw, processed, volume):
+        values = [np.asarray(column) for column in (timestamps, raw, processed, volume)]
+        count = len(values[0])
+        if count == 0:
+            return
+        with self._write_lock:
+            self.sequence += 1
+            # Only the newest `capacity` samples can survive
+            skip = max(count - self.capacity, 0)
+            written = count - skip
+            index = (self.total + skip) % self.capacity
+            first = min(written, self.capacity - index)
+            for column, value in zip(self._columns, values):
+                value = value[skip:]
+                column[index:index + first] = value[:first]
+                column[index + self.capacity:index + self.capacity + first] = value[:first]
+                if first < written:
+                    rest = written - first
+                    column[:rest] = value[first:]
+                    column[self.capacity:self.capacity + rest] = value[first:]
+            self.total += count
+            self.sequence += 1
+
+    def clear(self):
+        with self._write_lock:
+            self.sequence += 1
+            self.start = self.total
+            self.sequence += 1
+
+    # Views of the newest `count` samples (all retained samples by default).
+    # With include_cleared=True samples hidden by clear() are included too.
+    def snapshot(self, count=None, include_cleared=False):
+        while True:
+            sequence = self.sequence
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            total = self.total
+            start = 0 if include_cleared else self.start
+            available = min(total - start, self.capacity)
+            wanted = available if count is None else max(0, min(count, available))
+            end = total % self.capacity + self.capacity
+            begin = end - wanted
+            snapshot = HistorySnapshot(total, *(column[begin:end] for column in self._columns))
+            if self.sequence == sequence:
+                return snapshot
+
+    # Views of the retained samples with timestamp >= start_time
+    def since(self, start_time):
+        snapshot = self.snapshot()
+        first = int(np.searchsorted(snapshot.timestamp, start_time, side='left'))
+        return HistorySnapshot(snapshot.total, *(column[first:] for column in snapshot[1:]))
+
+    # True while none of the samples in `snapshot` have been overwritten
+    def is_intact(self, snapshot):
+        return self.total - snapshot.total <= self.capacity - len(snapshot.timestamp)
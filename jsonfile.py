@@ -0,0 +1,23 @@
+import json
+import os
+
+
+# (mtime in ns, size) of a file, or None if it does not exist; compared to
+# notice changes made by other programs
+def file_signature(path):
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+# Write JSON to a temporary file next to `path` and rename it over the
+# original, so readers (and a crash mid-write) never see a partial file
+def write_json_atomic(path, data, indent=4):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
@@ -0,0 +1,159 @@
+import json
+import math
+import threading
+import time
+
+
+# Streaming latency histogram with log-linear buckets: `sub_buckets` equal
+# steps per power of two from `min_value` seconds upwards (about 9% relative
+# error with 8 steps). Recording is a frexp and a list increment, and memory
+# stays fixed however many values are recorded. Each histogram should have a
+# single writing thread.
+class LatencyHistogram:
+    def __init__(self, min_value=1e-6, octaves=28, sub_buckets=8):
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        self.counts = [0] * (octaves * sub_buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        ratio = seconds / self.min_value
+        if ratio < 1:
+            index = 0
+        else:
+            mantissa, exponent = math.frexp(ratio)  # ratio = mantissa * 2**exponent, mantissa in [0.5, 1)
+            index = (exponent - 1) * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets) + 1
+            if index >= len(self.counts):
+                index = len(self.counts) - 1
+        self.counts[index] += 1
+
+    # Midpoint of a bucket in seconds
+    def _bucket_value(self, index):
+        if index == 0:
+            return self.min_value / 2
+        octave, step = divmod(index - 1, self.sub_buckets)
+        return self.min_value * 2 ** octave * (1 + (step + 0.5) / self.sub_buckets)
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        target = q / 100 * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if bucket and seen >= target:
+                return min(self._bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'p999_ms': self.percentile(99.9) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+# Per-stage timings, event counters and sampled gauges (e.g. queue depths).
+# Hot paths check `enabled` once and only then read the clock, so switched-off
+# instrumentation costs one attribute test per batch or sample:
+#
+#     if metrics.enabled:
+#         start = time.perf_counter()
+#     ...
+#     if metrics.enabled:
+#         metrics.observe('stage', time.perf_counter() - start)
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}  # name -> callable returning the current value
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Register a value that is read when a snapshot is taken
+    def gauge(self, name, read):
+        self.gauges[name] = read
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        gauges = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception:
+                gauges[name] = None
+        return {
+            'enabled': self.enabled,
+            'started': self.started,
+            'elapsed': time.time() - self.started,
+            'stages': {name: histogram.summary() for name, histogram in list(self.histograms.items())},
+            'counters': dict(self.counters),
+            'gauges': gauges,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=4)
+
+
+# Time spent in each phase of application startup. Phases on the main thread
+# are marked in sequence (each lasts from the previous mark); work on other
+# threads records its own span. Offsets are relative to `origin`.
+class StartupTimer:
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases = []  # (name, start offset, duration)
+        self._last = self.origin
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.origin
+
+    # End the current main-thread phase
+    def mark(self, name):
+        now = time.perf_counter()
+        self.record(name, self._last, now)
+        self._last = now
+
+    # Record a span measured elsewhere (perf_counter times)
+    def record(self, name, start, end=None):
+        if end is None:
+            end = time.perf_counter()
+        with self._lock:
+            self.phases.append((name, start - self.origin, end - start))
+
+    def as_dict(self):
+        with self._lock:
+            return {name: {'start': start, 'duration': duration} for name, start, duration in self.phases}
+
+    def report(self):
+        with self._lock:
+            return ", ".join(f"{name} {duration:.2f} s" for name, _, duration in self.phases)
@@ -1,19 +1,48 @@
-import serial
+import importlib
 import threading
 import time
+from metrics import Metrics, StartupTimer
+
+# Startup phases are timed from here on
+startup = StartupTimer()
+
+# Import matplotlib on a background thread while the rest of the app starts;
+# the graph setup below picks it up (waiting only if it is not done yet)
+def preload_matplotlib():
+    start = time.perf_counter()
+    importlib.import_module('matplotlib.figure')
+    importlib.import_module('matplotlib.backends.backend_tkagg')
+    startup.record('matplotlib (background)', start)
+
+threading.Thread(target=preload_matplotlib, name="preload-matplotlib", daemon=True).start()
+
+import serial
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 import json
-import csv
 import os
+import difflib
 from datetime import datetime
-import pygame
+from settings import SettingsStore
+from serial_reader import SerialSampleReader
+from history import SampleHistory
+from ui_mailbox import Mailbox
+from datalog import CsvLogWriter
+from sample_store import SampleStore, StoreChunk, HistoryPersister
+from exporter import ExportJob, SummaryExportJob, EXPORT_FORMATS, SUMMARY_FORMATS
+from decimate import MinMaxDecimator
+from rollups import Rollups
+from pipeline import NoisePipeline
+from filters import FILTER_CHAIN_EXAMPLES, parse_filter_chain
+from acoustic import AcousticMeter, ACOUSTIC_METRICS
+from calibration import CalibrationSession
+from presets import PresetRepository
+from alerts import ALERT_RULE_EXAMPLES, parse_alert_rules
+from event_log import EventLog
+from jsonfile import file_signature, write_json_atomic
+from replay import ReplayJob, REPLAY_SPEEDS, load_recording
+from volume_actuator import VolumeActuator, VOLUME_BACKENDS
 
 # Set the correct COM port (Change as needed)
 SERIAL_PORT = "COM3"  # Windows (Check in Arduino IDE)
@@ -22,31 +51,77 @@ BAUD_RATE = 115200
 
 # Global variables
 running = True
-noise_history = []
-max_history_length = 100
-noise_min = 0
-noise_max = 100  # Will be adjusted dynamically
-threshold_crossed = False
-threshold_time = 0
+history_capacity = 1000000  # Samples kept in memory (set 'history_capacity' in the config file)
+noise_history = SampleHistory(history_capacity)
+store_dir = "noise_store"  # Full-rate on-disk history (set 'store_dir' in the config file)
+sample_store = None
+history_persister = None
+rollups = None  # 1 s / 1 min / 1 h summaries kept next to the sample store
 config_file = "noise_config.json"
+config_signature = None  # file_signature of the config file as last loaded or saved
+config_error_signature = None  # Signature of a config file that failed to reload
+CONFIG_POLL_MS = 2000  # How often the config file is checked for outside changes
+settings_store = SettingsStore()
+settings_publish_pending = False
+last_log_time = 0
+last_batch_time = None  # time.time() of the previous sample batch on this connection
+reader_stats_text = ""
+presets = PresetRepository("presets.json")
+preset_list_names = []  # Names currently shown in the preset listbox
+PRESETS_POLL_MS = 2000  # How often the presets file is checked for outside changes
+calibration_session = None  # CalibrationSession fed by the serial thread while the dialog runs
+ui_mailbox = Mailbox()  # Latest (raw, processed, volume) for the GUI
+UI_REFRESH_MS = 50  # GUI poll interval for current values
+EVENT_LOG_POLL_MS = 200  # GUI poll interval for queued event log messages
+MAX_LOG_LINES = 5000  # Event Log tab keeps at most this many lines
+LOG_TRIM_LINES = 500  # Lines removed at once when the limit is reached
+event_log = EventLog("noise_events.log")  # Also written to noise_events.log (rotated at 1 MB)
+DEVICE_READY_TIMEOUT = 5.0  # Warn if no valid reading arrives this long after connecting
+first_sample_time = None  # perf_counter time of the first sample since launch
+metrics = Metrics()  # Per-stage timings for the Diagnostics tab (off by default)
+active_reader = None  # SerialSampleReader of the current connection
+data_logger = CsvLogWriter("noise_log.csv", on_error=lambda message: add_to_log(message), metrics=metrics)
+data_logger_version = -1  # Settings version the logger was last configured from
+
+# Volume control runs on its own thread; the backend is opened there
+volume_backend_setting = "auto"
+volume_actuator = VolumeActuator(volume_backend_setting, on_error=lambda message: add_to_log(message),
+                                 metrics=metrics)
+volume_actuator_version = -1  # Settings version the actuator was last configured from
+
+# Load pygame and the alert sound on a background thread; alerts raised
+# before it is ready are silent
+alert_sound = None
+
+def load_alert_sound():
+    global alert_sound
+    start = time.perf_counter()
+    try:
+        import pygame
+        pygame.mixer.init()
+        try:
+            alert_sound = pygame.mixer.Sound("alert.wav")
+        except Exception:
+            print("Alert sound file not found. Alerts will be silent.")
+    except Exception as e:
+        print(f"Error initializing sound: {e}")
+    startup.record('alert sound (background)', start)
 
-# Initialize volume control
-try:
-    devices = AudioUtilities.GetSpeakers()
-    interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-    volume = cast(interface, POINTER(IAudioEndpointVolume))
-    print("Volume control initialized successfully")
-except Exception as e:
-    print(f"Error initializing volume control: {e}")
-    volume = None
+def play_alert_sound():
+    if alert_sound:
+        alert_sound.play()
 
-# Initialize pygame for sounds
-pygame.mixer.init()
-try:
-    alert_sound = pygame.mixer.Sound("alert.wav")
-except:
-    print("Alert sound file not found. Alerts will be silent.")
-    alert_sound = None
+threading.Thread(target=load_alert_sound, name="load-alert-sound", daemon=True).start()
+
+# Smoothing, processing, alerts and volume control (shared with replay)
+noise_pipeline = NoisePipeline(
+    set_volume=volume_actuator.request,
+    on_message=lambda message: add_to_log(message),
+    on_indicator=lambda color: update_status_indicator(color),
+    play_alert=play_alert_sound,
+    metrics=metrics)
+
+startup.mark('imports')
 
 # Create GUI window
 root = tk.Tk()
@@ -82,6 +157,7 @@ tools_menu = tk.Menu(menu_bar, tearoff=0)
 menu_bar.add_cascade(label="Tools", menu=tools_menu)
 tools_menu.add_command(label="Calibrate", command=lambda: start_calibration())
 tools_menu.add_command(label="Find COM Ports", command=lambda: find_com_ports())
+tools_menu.add_command(label="Replay Recording", command=lambda: replay_recording())
 
 # Create a better UI layout
 main_frame = ttk.Frame(root, padding=10)
@@ -107,6 +183,10 @@ notebook.add(log_tab, text="Event Log")
 presets_tab = ttk.Frame(notebook)
 notebook.add(presets_tab, text="Presets")
 
+# Diagnostics tab
+diagnostics_tab = ttk.Frame(notebook)
+notebook.add(diagnostics_tab, text="Diagnostics")
+
 # About tab
 about_tab = ttk.Frame(notebook)
 notebook.add(about_tab, text="About")
@@ -178,21 +258,39 @@ reset_button.grid(row=0, column=4, padx=5, pady=5)
 graph_frame = ttk.LabelFrame(main_tab, text="Real-time Monitoring", padding=10)
 graph_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-# Set up matplotlib figure
-fig, ax = plt.subplots(figsize=(8, 4))
+# Graph window selection (label -> seconds); long windows are decimated
+GRAPH_WINDOWS = {"30 s": 30, "1 min": 60, "5 min": 300, "15 min": 900, "1 h": 3600, "6 h": 21600, "24 h": 86400}
+graph_controls = ttk.Frame(graph_frame)
+graph_controls.pack(fill=tk.X)
+ttk.Label(graph_controls, text="Window:").pack(side=tk.LEFT, padx=5)
+graph_window_var = tk.StringVar(value="30 s")
+graph_window_combo = ttk.Combobox(graph_controls, textvariable=graph_window_var, values=list(GRAPH_WINDOWS),
+                                  state='readonly', width=8)
+graph_window_combo.pack(side=tk.LEFT, padx=5)
+
+# Set up matplotlib figure (embedded directly, without pyplot)
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+fig = Figure(figsize=(8, 4))
+ax = fig.add_subplot()
 canvas = FigureCanvasTkAgg(fig, graph_frame)
 canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-# Initialize plots
-noise_line, = ax.plot([], [], label='Noise Level', color='blue')
-volume_line, = ax.plot([], [], label='System Volume', color='red')
-threshold_line, = ax.plot([], [], label='Alert Threshold', color='green', linestyle='--')
+# Initialize plots (animated lines are blitted over a cached background)
+graph_window = 30  # Seconds shown on the graph; "now" is at the right edge
+noise_line, = ax.plot([], [], label='Noise Level', color='blue', animated=True)
+volume_line, = ax.plot([], [], label='System Volume', color='red', animated=True)
+threshold_line, = ax.plot([], [], label='Alert Threshold', color='green', linestyle='--', animated=True)
 ax.set_title('Noise and Volume Over Time')
 ax.set_xlabel('Time (s)')
 ax.set_ylabel('Level')
 ax.legend()
+ax.set_xlim(0, graph_window)
 ax.set_ylim(0, 100)
 ax.grid(True)
+graph_background = None
+graph_last_state = None
+graph_decimator = MinMaxDecimator(2)  # Cached min/max of processed noise and volume
 
 # Status bar
 status_var = tk.StringVar(value="Initializing...")
@@ -212,7 +310,7 @@ com_port_entry.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
 ttk.Label(settings_frame, text="Baud Rate:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
 baud_rate_var = tk.IntVar(value=BAUD_RATE)
 baud_rate_combo = ttk.Combobox(settings_frame, textvariable=baud_rate_var, 
-                              values=[9600, 19200, 38400, 57600, 115200], width=10)
+                              values=[9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600], width=10)
 baud_rate_combo.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
 
 # Apply button
@@ -220,6 +318,73 @@ apply_button = ttk.Button(settings_frame, text="Apply Connection",
                          command=lambda: restart_serial_connection())
 apply_button.grid(row=0, column=4, padx=5, pady=5)
 
+# Smoothing settings
+smoothing_frame = ttk.LabelFrame(settings_tab, text="Smoothing Settings", padding=10)
+smoothing_frame.pack(fill=tk.X, padx=5, pady=5)
+
+# Filter chain, e.g. "median:5, average:50"
+ttk.Label(smoothing_frame, text="Filter Chain:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+filter_chain_var = tk.StringVar(value="average:5")
+filter_chain_combo = ttk.Combobox(smoothing_frame, textvariable=filter_chain_var, values=FILTER_CHAIN_EXAMPLES,
+                                  width=30)
+filter_chain_combo.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+ttk.Label(smoothing_frame, text="Stages: average:N, ema:A, median:N, lowpass:Hz, none").grid(
+    row=0, column=2, sticky=tk.W, padx=5, pady=5)
+
+# Auto-calibration settings: the range follows percentiles of recent readings
+calibration_frame = ttk.LabelFrame(settings_tab, text="Auto-Calibration Settings", padding=10)
+calibration_frame.pack(fill=tk.X, padx=5, pady=5)
+
+ttk.Label(calibration_frame, text="Window (s):").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+calibration_window_var = tk.DoubleVar(value=600.0)
+calibration_window_spin = ttk.Spinbox(calibration_frame, from_=10, to=86400, increment=60, width=7,
+                                      textvariable=calibration_window_var)
+calibration_window_spin.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(calibration_frame, text="Min Percentile:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
+calibration_low_var = tk.DoubleVar(value=5.0)
+calibration_low_spin = ttk.Spinbox(calibration_frame, from_=0, to=50, increment=1, width=5,
+                                   textvariable=calibration_low_var)
+calibration_low_spin.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(calibration_frame, text="Max Percentile:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
+calibration_high_var = tk.DoubleVar(value=95.0)
+calibration_high_spin = ttk.Spinbox(calibration_frame, from_=50, to=100, increment=1, width=5,
+                                    textvariable=calibration_high_var)
+calibration_high_spin.grid(row=0, column=5, sticky=tk.W, padx=5, pady=5)
+
+# Sound level settings (raw audio mode of the firmware)
+acoustic_frame = ttk.LabelFrame(settings_tab, text="Sound Level Settings (raw audio mode)", padding=10)
+acoustic_frame.pack(fill=tk.X, padx=5, pady=5)
+
+ttk.Label(acoustic_frame, text="Metric:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+acoustic_metric_var = tk.StringVar(value="leq")
+acoustic_metric_combo = ttk.Combobox(acoustic_frame, textvariable=acoustic_metric_var, values=ACOUSTIC_METRICS,
+                                     state='readonly', width=6)
+acoustic_metric_combo.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(acoustic_frame, text="Window (s):").grid(row=0, column=2, sticky=tk.W, padx=5, pady=5)
+acoustic_window_var = tk.DoubleVar(value=10.0)
+acoustic_window_spin = ttk.Spinbox(acoustic_frame, from_=1, to=3600, increment=1, width=6,
+                                   textvariable=acoustic_window_var)
+acoustic_window_spin.grid(row=0, column=3, sticky=tk.W, padx=5, pady=5)
+
+a_weighting_var = tk.BooleanVar(value=True)
+a_weighting_check = ttk.Checkbutton(acoustic_frame, text="A-weighting", variable=a_weighting_var)
+a_weighting_check.grid(row=0, column=4, padx=5, pady=5)
+
+ttk.Label(acoustic_frame, text="Calibration (dB):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+acoustic_offset_var = tk.DoubleVar(value=0.0)
+acoustic_offset_spin = ttk.Spinbox(acoustic_frame, from_=-100, to=200, increment=0.5, width=6,
+                                   textvariable=acoustic_offset_var)
+acoustic_offset_spin.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(acoustic_frame, text="Sample Rate (Hz):").grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+audio_sample_rate_var = tk.IntVar(value=8000)
+audio_sample_rate_combo = ttk.Combobox(acoustic_frame, textvariable=audio_sample_rate_var,
+                                       values=[4000, 8000, 16000], width=6)
+audio_sample_rate_combo.grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+
 # Alert settings
 alert_frame = ttk.LabelFrame(settings_tab, text="Alert Settings", padding=10)
 alert_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -246,6 +411,35 @@ sound_alert_var = tk.BooleanVar(value=True)
 sound_alert_check = ttk.Checkbutton(alert_frame, text="Sound Alert", variable=sound_alert_var)
 sound_alert_check.grid(row=1, column=0, padx=5, pady=5)
 
+# How far the level must fall below the threshold to resolve an alert
+ttk.Label(alert_frame, text="Hysteresis:").grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+alert_hysteresis_var = tk.DoubleVar(value=0.0)
+alert_hysteresis_spin = ttk.Spinbox(alert_frame, from_=0, to=50, increment=1, width=5,
+                                    textvariable=alert_hysteresis_var)
+alert_hysteresis_spin.grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+
+# Quiet time after an alert resolves
+ttk.Label(alert_frame, text="Cooldown (s):").grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+alert_cooldown_var = tk.DoubleVar(value=0.0)
+alert_cooldown_spin = ttk.Spinbox(alert_frame, from_=0, to=3600, increment=5, width=5,
+                                  textvariable=alert_cooldown_var)
+alert_cooldown_spin.grid(row=1, column=4, sticky=tk.W, padx=5, pady=5)
+
+# Repeat the notification while an alert stays active (0 = once)
+ttk.Label(alert_frame, text="Re-notify (s):").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+alert_renotify_var = tk.DoubleVar(value=0.0)
+alert_renotify_spin = ttk.Spinbox(alert_frame, from_=0, to=3600, increment=30, width=5,
+                                  textvariable=alert_renotify_var)
+alert_renotify_spin.grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+
+# Extra rules, e.g. "below:5 duration=600; rate:40"
+ttk.Label(alert_frame, text="Extra Rules:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+alert_rules_var = tk.StringVar(value="")
+alert_rules_combo = ttk.Combobox(alert_frame, textvariable=alert_rules_var, values=ALERT_RULE_EXAMPLES, width=40)
+alert_rules_combo.grid(row=3, column=1, columnspan=3, sticky=tk.W, padx=5, pady=5)
+ttk.Label(alert_frame, text="Rules: above:L, below:L, rate:R, percent:L; see alerts.py").grid(
+    row=3, column=4, sticky=tk.W, padx=5, pady=5)
+
 # Volume control settings
 volume_frame = ttk.LabelFrame(settings_tab, text="Volume Control Settings", padding=10)
 volume_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -267,6 +461,32 @@ max_volume_var = tk.IntVar(value=100)
 max_volume_spin = ttk.Spinbox(volume_frame, from_=0, to=100, width=5, textvariable=max_volume_var)
 max_volume_spin.grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
 
+# Change suppression and rate limit
+ttk.Label(volume_frame, text="Min Change (%):").grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+volume_min_delta_var = tk.DoubleVar(value=1.0)
+volume_min_delta_spin = ttk.Spinbox(volume_frame, from_=0, to=20, increment=0.5, width=5,
+                                    textvariable=volume_min_delta_var)
+volume_min_delta_spin.grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(volume_frame, text="Hysteresis (%):").grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+volume_hysteresis_var = tk.DoubleVar(value=0.0)
+volume_hysteresis_spin = ttk.Spinbox(volume_frame, from_=0, to=20, increment=0.5, width=5,
+                                     textvariable=volume_hysteresis_var)
+volume_hysteresis_spin.grid(row=1, column=4, sticky=tk.W, padx=5, pady=5)
+
+ttk.Label(volume_frame, text="Max Updates/s:").grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+volume_max_rate_var = tk.DoubleVar(value=20.0)
+volume_max_rate_spin = ttk.Spinbox(volume_frame, from_=0, to=100, increment=5, width=5,
+                                   textvariable=volume_max_rate_var)
+volume_max_rate_spin.grid(row=2, column=2, sticky=tk.W, padx=5, pady=5)
+
+# Volume backend
+ttk.Label(volume_frame, text="Backend:").grid(row=2, column=3, sticky=tk.W, padx=5, pady=5)
+volume_backend_var = tk.StringVar(value="auto")
+volume_backend_combo = ttk.Combobox(volume_frame, textvariable=volume_backend_var, values=VOLUME_BACKENDS,
+                                    state='readonly', width=10)
+volume_backend_combo.grid(row=2, column=4, sticky=tk.W, padx=5, pady=5)
+
 # Data logging settings
 logging_frame = ttk.LabelFrame(settings_tab, text="Data Logging Settings", padding=10)
 logging_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -295,6 +515,77 @@ browse_button = ttk.Button(logging_frame, text="...", width=3,
                               defaultextension=".csv", filetypes=[("CSV files", "*.csv")])))
 browse_button.grid(row=0, column=5, padx=5, pady=5)
 
+# Log every sample instead of one row per interval
+log_every_sample_var = tk.BooleanVar(value=False)
+log_every_sample_check = ttk.Checkbutton(logging_frame, text="Log Every Sample", variable=log_every_sample_var)
+log_every_sample_check.grid(row=1, column=0, padx=5, pady=5)
+
+# Log rotation
+log_rotate_daily_var = tk.BooleanVar(value=True)
+log_rotate_daily_check = ttk.Checkbutton(logging_frame, text="Rotate Daily", variable=log_rotate_daily_var)
+log_rotate_daily_check.grid(row=1, column=1, padx=5, pady=5)
+
+ttk.Label(logging_frame, text="Max File Size (MB):").grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+log_max_mb_var = tk.IntVar(value=100)
+log_max_mb_spin = ttk.Spinbox(logging_frame, from_=0, to=10000, width=6, textvariable=log_max_mb_var)
+log_max_mb_spin.grid(row=1, column=3, sticky=tk.W, padx=5, pady=5)
+
+# Full-rate sample store
+store_enabled_var = tk.BooleanVar(value=True)
+store_enabled_check = ttk.Checkbutton(logging_frame, text="Store Full-Rate History", variable=store_enabled_var)
+store_enabled_check.grid(row=1, column=4, padx=5, pady=5)
+
+# Display settings
+display_frame = ttk.LabelFrame(settings_tab, text="Display Settings", padding=10)
+display_frame.pack(fill=tk.X, padx=5, pady=5)
+
+# Maximum graph redraw rate
+ttk.Label(display_frame, text="Graph Refresh (FPS):").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+graph_fps_var = tk.IntVar(value=10)
+graph_fps_spin = ttk.Spinbox(display_frame, from_=1, to=60, width=5, textvariable=graph_fps_var)
+graph_fps_spin.grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+
+# Tk variables mirrored into the settings snapshot read by the serial thread
+settings_vars = {
+    'com_port': com_port_var,
+    'baud_rate': baud_rate_var,
+    'sensitivity': sensitivity_var,
+    'min_threshold': min_var,
+    'max_threshold': max_var,
+    'auto_calibrate': auto_cal_var,
+    'calibration_window': calibration_window_var,
+    'calibration_low': calibration_low_var,
+    'calibration_high': calibration_high_var,
+    'filter_chain': filter_chain_var,
+    'audio_sample_rate': audio_sample_rate_var,
+    'acoustic_metric': acoustic_metric_var,
+    'acoustic_window': acoustic_window_var,
+    'a_weighting': a_weighting_var,
+    'acoustic_offset_db': acoustic_offset_var,
+    'alert_threshold': alert_threshold_var,
+    'alert_duration': alert_duration_var,
+    'alert_hysteresis': alert_hysteresis_var,
+    'alert_cooldown': alert_cooldown_var,
+    'alert_renotify': alert_renotify_var,
+    'alert_rules': alert_rules_var,
+    'alert_enabled': alert_enabled_var,
+    'sound_alert': sound_alert_var,
+    'volume_control': volume_control_var,
+    'default_volume': default_volume_var,
+    'max_volume': max_volume_var,
+    'volume_min_delta': volume_min_delta_var,
+    'volume_hysteresis': volume_hysteresis_var,
+    'volume_max_rate': volume_max_rate_var,
+    'volume_backend': volume_backend_var,
+    'logging_enabled': logging_var,
+    'logging_interval': logging_interval_var,
+    'log_file': log_file_var,
+    'log_every_sample': log_every_sample_var,
+    'log_rotate_daily': log_rotate_daily_var,
+    'log_max_mb': log_max_mb_var,
+    'store_enabled': store_enabled_var,
+}
+
 # Log tab content
 log_frame = ttk.Frame(log_tab, padding=10)
 log_frame.pack(fill=tk.BOTH, expand=True)
@@ -309,8 +600,13 @@ log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 log_text.config(yscrollcommand=log_scrollbar.set)
 
 # Clear log button
+def clear_log():
+    global log_tail_replaceable
+    log_text.delete(1.0, tk.END)
+    log_tail_replaceable = False
+
 clear_log_button = ttk.Button(log_tab, text="Clear Log", 
-                             command=lambda: log_text.delete(1.0, tk.END))
+                             command=clear_log)
 clear_log_button.pack(side=tk.BOTTOM, pady=5)
 
 # Presets tab content
@@ -351,6 +647,30 @@ preset_desc_frame.pack(fill=tk.X, padx=5, pady=5)
 preset_desc_text = tk.Text(preset_desc_frame, wrap=tk.WORD, width=60, height=5)
 preset_desc_text.pack(fill=tk.BOTH, expand=True)
 
+# Diagnostics tab content
+diagnostics_controls = ttk.Frame(diagnostics_tab, padding=5)
+diagnostics_controls.pack(fill=tk.X)
+
+diagnostics_var = tk.BooleanVar(value=False)
+ttk.Checkbutton(diagnostics_controls, text="Enable Instrumentation", variable=diagnostics_var,
+                command=lambda: set_diagnostics_enabled()).pack(side=tk.LEFT, padx=5)
+ttk.Button(diagnostics_controls, text="Dump JSON...", command=lambda: dump_diagnostics()).pack(side=tk.RIGHT, padx=5)
+ttk.Button(diagnostics_controls, text="Reset", command=lambda: metrics.reset()).pack(side=tk.RIGHT, padx=5)
+
+# Latency per stage (milliseconds)
+stage_columns = ('count', 'mean', 'p50', 'p99', 'p999', 'max')
+stage_tree = ttk.Treeview(diagnostics_tab, columns=stage_columns, height=10)
+stage_tree.heading('#0', text="Stage")
+stage_tree.column('#0', width=160)
+for column, heading in zip(stage_columns, ("Count", "Mean ms", "p50 ms", "p99 ms", "p99.9 ms", "Max ms")):
+    stage_tree.heading(column, text=heading)
+    stage_tree.column(column, width=80, anchor=tk.E)
+stage_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+# Counters and queue depths
+counters_var = tk.StringVar(value="")
+ttk.Label(diagnostics_tab, textvariable=counters_var, justify=tk.LEFT, wraplength=700).pack(fill=tk.X, padx=10, pady=5)
+
 # About tab content
 about_frame = ttk.Frame(about_tab, padding=20)
 about_frame.pack(fill=tk.BOTH, expand=True)
@@ -377,209 +697,257 @@ License: MIT License
 about_label = ttk.Label(about_frame, text=about_text, wraplength=600, justify=tk.LEFT)
 about_label.pack(padx=20, pady=20)
 
-# Function to process noise value with high sensitivity to changes
-def process_noise(raw_value):
-    # Get current settings
-    sensitivity = sensitivity_var.get()
-    min_threshold = min_var.get()
-    max_threshold = max_var.get()
-    
-    # Clamp value to thresholds
-    clamped = max(min_threshold, min(raw_value, max_threshold))
-    
-    # Auto-adjust range if enabled
-    if auto_cal_var.get() and raw_value > 0:
-        global noise_min, noise_max
-        noise_min = min(noise_min, raw_value) if noise_min > 0 else raw_value
-        noise_max = max(noise_max, raw_value)
-        min_var.set(noise_min)
-        max_var.set(noise_max)
-    
-    # Normalize to 0-100 scale
-    range_size = max_threshold - min_threshold
-    if range_size <= 0:
-        normalized = 0
-    else:
-        normalized = ((clamped - min_threshold) / range_size) * 100
+# Publish a new settings snapshot from the Tk variables (GUI thread only)
+def publish_settings():
+    global settings_publish_pending
+    settings_publish_pending = False
     
-    # Apply non-linear sensitivity curve (higher sensitivity = more dramatic response)
-    # Using an exponential curve for sensitivity
-    enhanced = (normalized / 100) ** (1 / sensitivity) * 100
+    current = settings_store.current
+    values = {}
+    for name, var in settings_vars.items():
+        try:
+            values[name] = var.get()
+        except (tk.TclError, ValueError):
+            # Field is mid-edit or invalid; keep the last good value
+            values[name] = getattr(current, name)
+    try:
+        parse_filter_chain(values['filter_chain'])
+    except ValueError:
+        values['filter_chain'] = current.filter_chain  # Mid-edit or invalid
+    try:
+        parse_alert_rules(values['alert_rules'])
+    except ValueError:
+        values['alert_rules'] = current.alert_rules  # Mid-edit or invalid
+    settings = settings_store.publish(**values)
+    if settings.version != volume_actuator_version:
+        configure_volume_actuator(settings)
+
+# Coalesce bursts of variable writes (e.g. load_config) into one publish
+def schedule_settings_publish(*args):
+    global settings_publish_pending
+    if not settings_publish_pending:
+        settings_publish_pending = True
+        root.after_idle(publish_settings)
+
+# Mirror the auto-calibrated range into the spinboxes at a low rate
+def sync_calibrated_range():
+    settings = settings_store.current
+    calibrated_range = noise_pipeline.calibrated_range
+    if settings.auto_calibrate and calibrated_range is not None:
+        calibrated_min, calibrated_max = int(calibrated_range[0]), int(calibrated_range[1])
+        if settings.min_threshold != calibrated_min or settings.max_threshold != calibrated_max:
+            min_var.set(calibrated_min)
+            max_var.set(calibrated_max)
+    root.after(500, sync_calibrated_range)
+
+# Run a batch of raw readings through smoothing, processing, alerts and volume control
+def process_samples(samples):
+    global last_log_time, last_batch_time
     
-    return enhanced
-
-# Check if threshold is crossed
-def check_threshold(processed_value):
-    global threshold_crossed, threshold_time
+    timed = metrics.enabled
+    if timed:
+        batch_start = time.perf_counter()
     
-    if not alert_enabled_var.get():
-        return False
-        
-    threshold = alert_threshold_var.get()
-    required_duration = alert_duration_var.get()
-    
-    if processed_value > threshold:
-        if not threshold_crossed:
-            threshold_crossed = True
-            threshold_time = time.time()
-            add_to_log(f"Threshold exceeded: {processed_value:.1f} > {threshold}")
-        elif time.time() - threshold_time > required_duration:
-            # Alert has been active long enough to trigger
-            update_status_indicator("red")
-            if sound_alert_var.get() and alert_sound:
-                alert_sound.play()
-            add_to_log(f"ALERT: Noise level {processed_value:.1f} exceeded threshold {threshold} for {required_duration}s")
-            return True
-    else:
-        if threshold_crossed:
-            threshold_crossed = False
-            update_status_indicator("green")
-            add_to_log(f"Noise level returned below threshold: {processed_value:.1f} < {threshold}")
+    # One snapshot per batch so all stages agree
+    settings = settings_store.current
+    if settings.logging_enabled and settings.version != data_logger_version:
+        configure_data_logger(settings)
+    
+    now = time.time()
+    session = calibration_session
+    if session is not None:
+        session.add(samples, now)
+    
+    # Spread the batch evenly over the time since the previous one (at most a second)
+    first = now if last_batch_time is None else max(last_batch_time, now - 1.0)
+    timestamps = np.linspace(first, now, len(samples) + 1)[1:]
+    last_batch_time = now
+    processed, volume_levels, is_alert = noise_pipeline.step_batch(samples, settings, timestamps)
+    
+    # Update history for graph
+    noise_history.extend(timestamps, samples, processed, volume_levels)
+    
+    # Hand the newest values to the GUI; it polls at its own rate
+    ui_mailbox.post((samples[-1], float(processed[-1]), int(volume_levels[-1])))
+    
+    # Log data if enabled (queued; the writer thread does the disk I/O)
+    if settings.logging_enabled:
+        for timestamp, noise_value, processed_value, volume_level in zip(
+                timestamps.tolist(), samples, processed.tolist(), volume_levels.tolist()):
+            if settings.log_every_sample or (timestamp - last_log_time) >= settings.logging_interval:
+                data_logger.log(timestamp, noise_value, processed_value, volume_level)
+                last_log_time = timestamp
     
-    return False
+    if timed:
+        done = time.perf_counter()
+        metrics.observe('process_batch', done - batch_start)
+        if active_reader is not None and active_reader.last_arrival:
+            metrics.observe('read_to_processed', done - active_reader.last_arrival)
+        metrics.count('samples_out', len(samples))
+
+# Format serial reader throughput for the status bar
+def format_reader_stats(stats):
+    if stats['mode'] in ('binary', 'audio'):
+        rate = (f"{stats['frames_per_sec']:.0f} frames/s, "
+                f"{stats['frame_errors']} CRC errors, {stats['lost_frames']} lost")
+    else:
+        rate = f"{stats['lines_per_sec']:.0f} lines/s"
+    return (f"{stats['mode']}: {stats['bytes_per_sec'] / 1024:.1f} kB/s, {rate}, "
+            f"peak port buffer {stats['port_high_water']} B, peak receive buffer {stats['buffer_high_water']} B")
+
+# Rolling sound level figures for the status bar
+def format_acoustic_stats(meter):
+    summary = meter.summary()
+    if summary['level'] is None:
+        return ""
+    return (f"Level {summary['level']:.1f} dB, Leq {summary['leq']:.1f}, L10 {summary['l10']:.1f}, "
+            f"L90 {summary['l90']:.1f} ({meter.window:g} s{', A-weighted' if meter.weighted else ''})")
 
 # Read Serial Data
 def read_serial():
-    global running, noise_history
+    global running, last_log_time, last_batch_time, reader_stats_text, active_reader
     
-    last_log_time = time.time()
+    settings = settings_store.current
     
     try:
-        ser = serial.Serial(com_port_var.get(), baud_rate_var.get(), timeout=1)
-        status_var.set(f"Connected to {com_port_var.get()} at {baud_rate_var.get()} baud")
-        add_to_log(f"Connected to {com_port_var.get()} at {baud_rate_var.get()} baud")
-        time.sleep(2)  # Wait for connection to stabilize
+        # Short timeout so the blocking read notices `running` going False quickly
+        open_start = time.perf_counter()
+        ser = serial.Serial(settings.com_port, settings.baud_rate, timeout=0.2)
+        ser.reset_input_buffer()  # Drop anything buffered before the port was opened
+        opened = time.perf_counter()
+        status_var.set(f"Connected to {settings.com_port} at {settings.baud_rate} baud")
+        add_to_log(f"Connected to {settings.com_port} at {settings.baud_rate} baud")
+        
+        # Instead of a fixed wait for the board to boot, the reader skips
+        # anything unrecognizable until the first valid line or frame
+        device_ready = False
+        if first_sample_time is None:
+            startup.record('serial open', open_start, opened)
         
         # Set initial volume
-        if volume and volume_control_var.get():
-            volume.SetMasterVolumeLevelScalar(default_volume_var.get() / 100, None)
+        if settings.volume_control:
+            volume_actuator.force(settings.default_volume / 100)
+        
+        # Reset smoothing and logging state for this connection
+        noise_pipeline.reset()
+        last_log_time = time.time()
+        last_batch_time = None
         
-        # For calculating a moving average
-        value_buffer = []
-        buffer_size = 5  # Increased buffer size for better smoothing
+        reader = active_reader = SerialSampleReader(ser, metrics=metrics)
+        acoustic_meter = None  # Created once raw audio frames are detected
+        last_stats_time = time.time()
         
         while running:
             try:
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode('utf-8', errors='replace').strip()
+                # Blocks until data arrives, then decodes every complete line or frame
+                samples = reader.read_samples()
+                if reader.mode == 'audio':
+                    # Raw audio: the selected sound level metric takes the place of the reading
+                    current = settings_store.current
+                    if acoustic_meter is None or not acoustic_meter.matches(current):
+                        acoustic_meter = AcousticMeter.from_settings(current)
+                    samples = acoustic_meter.feed(samples).tolist()
+                if samples:
+                    process_samples(samples)
+                    if not device_ready:
+                        device_ready = True
+                        report_device_ready(opened)
+                elif not device_ready and time.perf_counter() - opened > DEVICE_READY_TIMEOUT:
+                    device_ready = True  # Warn once
+                    add_to_log(f"No readings from {settings.com_port} after {DEVICE_READY_TIMEOUT:.0f} s")
+                
+                # Refresh throughput figures for the status bar once a second
+                now = time.time()
+                if now - last_stats_time >= 1.0:
+                    reader_stats_text = format_reader_stats(reader.stats())
+                    if acoustic_meter is not None and acoustic_meter.level is not None:
+                        reader_stats_text += " | " + format_acoustic_stats(acoustic_meter)
+                    last_stats_time = now
                     
-                    # Try to extract noise value from various possible formats
-                    try:
-                        # Simple attempt to parse the raw value
-                        noise_value = None
-                        
-                        # Try parsing numbers directly from the line
-                        if line.isdigit():
-                            # Just a number
-                            noise_value = int(line)
-                        elif "Noise Level:" in line:
-                            # Format: "Raw Noise Level: X | Mapped Volume: Y"
-                            parts = line.split('|')[0].split(':')
-                            if len(parts) >= 2:
-                                noise_part = parts[1].strip()
-                                if noise_part.isdigit():
-                                    noise_value = int(noise_part)
-                        
-                        # If we successfully extracted a value
-                        if noise_value is not None:
-                            # Add to buffer for smoothing
-                            value_buffer.append(noise_value)
-                            if len(value_buffer) > buffer_size:
-                                value_buffer.pop(0)
-                                
-                            # Calculate smoothed value
-                            smoothed_value = sum(value_buffer) / len(value_buffer)
-                            
-                            # Process with sensitivity adjustment
-                            processed_value = process_noise(smoothed_value)
-                            
-                            # Check for threshold crossing
-                            is_alert = check_threshold(processed_value)
-                            
-                            # Calculate volume level (0-100)
-                            volume_level = min(int(processed_value), max_volume_var.get())
-                            
-                            # Update volume if not in alert state
-                            if volume and volume_control_var.get() and not is_alert:
-                                try:
-                                    # Set volume (0.0 to 1.0)
-                                    volume.SetMasterVolumeLevelScalar(volume_level / 100, None)
-                                except Exception as e:
-                                    print(f"Volume error: {e}")
-                            
-                            # Update history for graph
-                            timestamp = time.time()
-                            noise_history.append((timestamp, noise_value, processed_value, volume_level))
-                            
-                            # Trim history to maximum length
-                            if len(noise_history) > max_history_length:
-                                noise_history = noise_history[-max_history_length:]
-                            
-                            # Update UI (in a thread-safe way)
-                            root.after(0, update_ui, noise_value, processed_value, volume_level)
-                            
-                            # Log data if enabled
-                            if logging_var.get() and (timestamp - last_log_time) >= logging_interval_var.get():
-                                log_data(timestamp, noise_value, processed_value, volume_level)
-                                last_log_time = timestamp
-                            
-                        else:
-                            print(f"Invalid data received: {line}")
-                            
-                    except (ValueError, IndexError) as e:
-                        print(f"Invalid data received: {line}")
-                        
             except Exception as e:
                 print(f"Error processing data: {e}")
                 time.sleep(0.5)  # Wait before trying again
-                    
-            # Brief pause to prevent CPU overload
-            time.sleep(0.01)
             
     except Exception as e:
         status_var.set(f"Error: {e}")
         print(f"Serial error: {e}")
         add_to_log(f"Connection error: {e}")
-        messagebox.showerror("Connection Error", f"Failed to connect to {com_port_var.get()}: {e}")
+        messagebox.showerror("Connection Error", f"Failed to connect to {settings.com_port}: {e}")
     finally:
         if 'ser' in locals() and ser.is_open:
             ser.close()
             print("Serial connection closed")
             add_to_log("Serial connection closed")
 
+# Log how long the device took to send its first valid reading, and for the
+# first connection since launch the time to first sample
+def report_device_ready(opened):
+    global first_sample_time
+    now = time.perf_counter()
+    add_to_log(f"Device ready: first reading {now - opened:.2f} s after opening the port")
+    if first_sample_time is None:
+        first_sample_time = now
+        startup.record('device ready', opened, now)
+        add_to_log(f"First sample {startup.elapsed():.2f} s after launch")
+
+# Log the time spent per startup phase once the window is up
+def report_startup():
+    startup.mark('window shown')
+    if volume_actuator.open_span is not None:
+        startup.record('volume backend (background)', *volume_actuator.open_span)
+    add_to_log(f"Startup: {startup.report()} (window up {startup.elapsed():.2f} s after launch)")
+
 # Update status indicator color
 def update_status_indicator(color):
     status_indicator.configure(bg=color)
 
-# Add entry to log
+# Add entry to log (safe from any thread; shown by poll_event_log)
 def add_to_log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {message}\n"
-    log_text.insert(tk.END, log_entry)
+    event_log.post(message)
+
+# Show queued log messages in one batch, folding repeats into the last line
+# and trimming the oldest lines in chunks once MAX_LOG_LINES is exceeded
+log_tail_replaceable = False  # Last line in the widget came from the event log
+
+def poll_event_log():
+    global log_tail_replaceable
+    root.after(EVENT_LOG_POLL_MS, poll_event_log)
+    lines = event_log.drain()
+    if not lines:
+        return
+    
+    text, replaces = lines[0]
+    if replaces and log_tail_replaceable:
+        log_text.delete("end-2l", "end-1l")  # Line with the previous repeat count
+    log_text.insert(tk.END, "".join(text + "\n" for text, _ in lines))
+    log_tail_replaceable = True
+    
+    line_count = int(log_text.index("end-1c").split('.')[0]) - 1
+    if line_count > MAX_LOG_LINES:
+        log_text.delete("1.0", f"{line_count - MAX_LOG_LINES + LOG_TRIM_LINES + 1}.0")
     log_text.see(tk.END)  # Scroll to see the latest entry
 
-# Log data to CSV file
-def log_data(timestamp, raw_value, processed_value, volume_level):
-    try:
-        file_exists = os.path.isfile(log_file_var.get())
-        
-        with open(log_file_var.get(), 'a', newline='') as file:
-            writer = csv.writer(file)
-            
-            # Write header if file is new
-            if not file_exists:
-                writer.writerow(['Timestamp', 'ISO DateTime', 'Raw Noise', 'Processed Noise', 'Volume Level'])
-            
-            # Write data
-            dt_string = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-            writer.writerow([timestamp, dt_string, raw_value, processed_value, volume_level])
-            
-    except Exception as e:
-        print(f"Error logging data: {e}")
-        add_to_log(f"Error logging data: {e}")
+# Point the CSV writer at the configured file and rotation policy
+def configure_data_logger(settings):
+    global data_logger_version
+    data_logger.configure(settings.log_file, settings.log_max_mb * 1024 * 1024, settings.log_rotate_daily)
+    data_logger_version = settings.version
+
+# Apply the change suppression, rate limit and backend settings
+def configure_volume_actuator(settings):
+    global volume_actuator_version, volume_backend_setting
+    volume_actuator.configure(settings.volume_min_delta / 100, settings.volume_hysteresis / 100,
+                              settings.volume_max_rate)
+    if settings.volume_backend != volume_backend_setting:
+        volume_backend_setting = settings.volume_backend
+        volume_actuator.set_backend(settings.volume_backend)
+    volume_actuator_version = settings.version
 
 # Update UI with current values
 def update_ui(raw_value, processed_value, volume_level):
+    if metrics.enabled:
+        start = time.perf_counter()
+    
     # Update text displays
     raw_value_var.set(str(int(raw_value)))
     processed_var.set(f"{processed_value:.1f}")
@@ -588,110 +956,293 @@ def update_ui(raw_value, processed_value, volume_level):
     # Update progress bar
     volume_bar["value"] = volume_level
     
-    # Update graph - but not on every update to avoid performance issues
-    root.after(500, update_graph)  # Update graph every 500ms
-    
     # Update status
-    status_var.set(f"Running - Raw: {int(raw_value)}, Processed: {processed_value:.1f}, Volume: {volume_level}%")
-
-# Update the graph
+    status_var.set(f"Running - Raw: {int(raw_value)}, Processed: {processed_value:.1f}, Volume: {volume_level}%"
+                   + f" | UI lag {ui_mailbox.last_latency * 1000:.0f} ms, {ui_mailbox.merged} updates merged"
+                   + (f" | {reader_stats_text}" if reader_stats_text else ""))
+    
+    if metrics.enabled:
+        metrics.observe('ui_lag', ui_mailbox.last_latency)
+        metrics.observe('ui_update', time.perf_counter() - start)
+
+# Show the newest values from the serial thread at a fixed refresh rate
+def poll_ui_mailbox():
+    values = ui_mailbox.take()
+    if values is not None:
+        update_ui(*values)
+    root.after(UI_REFRESH_MS, poll_ui_mailbox)
+
+# Cache the static parts of the figure after every full redraw (startup, resize)
+def on_graph_draw(event):
+    global graph_background, graph_last_state
+    graph_background = canvas.copy_from_bbox(fig.bbox)
+    graph_last_state = None
+    draw_graph_lines()
+
+def draw_graph_lines():
+    for line in (noise_line, volume_line, threshold_line):
+        ax.draw_artist(line)
+
+# Time unit for the x axis of the current window
+def graph_time_unit():
+    if graph_window >= 7200:
+        return 'h', 3600
+    if graph_window >= 600:
+        return 'min', 60
+    return 's', 1
+
+# Switch the graph window; the axes change, so do one full redraw
+def set_graph_window(*args):
+    global graph_window
+    graph_window = GRAPH_WINDOWS.get(graph_window_var.get(), 30)
+    unit, scale = graph_time_unit()
+    ax.set_xlim(0, graph_window / scale)
+    ax.set_xlabel(f'Time ({unit})')
+    graph_decimator.reset()
+    canvas.draw_idle()
+
+# Samples between start_time and end_time as (timestamps, processed, volume)
+# views; spans older than the in-memory history come from the sample store
+# unless the history has been reset
+def read_graph_range(start_time, end_time):
+    snapshot = noise_history.snapshot()
+    timestamps = snapshot.timestamp
+    chunks = []
+    oldest = timestamps[0] if len(timestamps) else end_time
+    if start_time < oldest and sample_store is not None and noise_history.start == 0:
+        chunks += [(chunk.timestamp, chunk.processed, chunk.volume)
+                   for chunk in sample_store.query(start_time, oldest)]
+    first = int(np.searchsorted(timestamps, start_time, side='left'))
+    chunks.append((timestamps[first:], snapshot.processed[first:], snapshot.volume[first:]))
+    return chunks
+
+# Min/max envelope of processed noise and volume from the 1 minute rollups,
+# for windows where a pixel column spans at least a minute
+def rollup_envelope(start_time, end_time):
+    rows = rollups.query('1min', np.floor(start_time / 60) * 60, end_time)
+    x = np.repeat(rows['start'] + 30, 2)
+    noise_values = np.empty(len(x))
+    noise_values[0::2] = rows['min']
+    noise_values[1::2] = rows['max']
+    volume_values = np.empty(len(x))
+    volume_values[0::2] = rows['volume_min']
+    volume_values[1::2] = rows['volume_max']
+    return x, noise_values, volume_values
+
+# Update the graph from a single timer capped at the configured frame rate.
+# Only the line data changes; the axes, legend and grid come from the cached background.
 def update_graph():
-    if not noise_history:
+    global graph_last_state
+    
+    try:
+        fps = max(1, min(60, graph_fps_var.get()))
+    except (tk.TclError, ValueError):
+        fps = 10
+    root.after(int(1000 / fps), update_graph)
+    
+    # Nothing to do until the first full draw or while another tab is showing
+    if graph_background is None or notebook.index('current') != notebook.index(main_tab):
         return
-        
-    # Get the data for the last 30 seconds
-    cutoff_time = time.time() - 30
-    relevant_history = [x for x in noise_history if x[0] >= cutoff_time]
     
-    if not relevant_history:
+    # Skip the frame if no new samples arrived and nothing else changed
+    threshold = settings_store.current.alert_threshold
+    bucket_count = max(int(ax.bbox.width), 100)  # About one bucket per pixel
+    state = (noise_history.total, noise_history.start, threshold, graph_window, bucket_count)
+    if state == graph_last_state:
         return
-        
-    # Extract data
-    times = [x[0] for x in relevant_history]
-    base_time = times[0]  # Normalize times to start from 0
-    times = [t - base_time for t in times]
+    if graph_last_state is not None and state[1] != graph_last_state[1]:
+        graph_decimator.reset()  # History was cleared
+    graph_last_state = state
+    if metrics.enabled:
+        render_start = time.perf_counter()
     
-    noise_values = [x[2] for x in relevant_history]  # Use processed noise values
-    volume_values = [x[3] for x in relevant_history]  # Volume levels
+    end_time = time.time()
+    start_time = end_time - graph_window
+    unit, scale = graph_time_unit()
     
-    # Clear previous plots
-    ax.clear()
+    # Plot every sample while that is cheap and the history covers the window;
+    # otherwise reduce to min/max per pixel column
+    recent = noise_history.since(start_time)
+    history_covers = len(recent.timestamp) < len(noise_history) or noise_history.start != 0 or sample_store is None
+    if history_covers and len(recent.timestamp) <= 4 * bucket_count:
+        times = (recent.timestamp - start_time) / scale
+        noise_values = recent.processed  # Use processed noise values
+        volume_values = recent.volume  # Volume levels
+    elif rollups is not None and noise_history.start == 0 and graph_window / bucket_count >= 60:
+        times, noise_values, volume_values = rollup_envelope(start_time, end_time)
+        times = (times - start_time) / scale
+    else:
+        times, (noise_values, volume_values) = graph_decimator.update(read_graph_range, graph_window,
+                                                                      bucket_count, end_time)
+        times = (times - start_time) / scale
     
-    # Plot data
-    ax.plot(times, noise_values, label='Noise Level', color='blue')
-    ax.plot(times, volume_values, label='System Volume', color='red')
+    noise_line.set_data(times, noise_values)
+    volume_line.set_data(times, volume_values)
+    threshold_line.set_data([0, graph_window / scale], [threshold, threshold])
     
-    # Plot threshold line
-    threshold = alert_threshold_var.get()
-    ax.axhline(y=threshold, color='green', linestyle='--', label='Alert Threshold')
+    # Blit the lines over the cached background
+    canvas.restore_region(graph_background)
+    draw_graph_lines()
+    canvas.blit(fig.bbox)
+    if metrics.enabled:
+        metrics.observe('graph_render', time.perf_counter() - render_start)
+
+# Switch the instrumentation on or off
+def set_diagnostics_enabled():
+    metrics.enabled = diagnostics_var.get()
+
+# Refresh the Diagnostics tab once a second while it is showing
+def update_diagnostics():
+    root.after(1000, update_diagnostics)
+    if notebook.index('current') != notebook.index(diagnostics_tab):
+        return
     
-    # Set labels and limits
-    ax.set_title('Noise and Volume Over Time')
-    ax.set_xlabel('Time (s)')
-    ax.set_ylabel('Level')
-    ax.set_ylim(0, 100)
-    ax.legend()
-    ax.grid(True)
+    snapshot = metrics.snapshot()
+    for name, stage in sorted(snapshot['stages'].items()):
+        values = (stage['count'], f"{stage['mean_ms']:.3f}", f"{stage['p50_ms']:.3f}", f"{stage['p99_ms']:.3f}",
+                  f"{stage['p999_ms']:.3f}", f"{stage['max_ms']:.3f}")
+        if stage_tree.exists(name):
+            stage_tree.item(name, values=values)
+        else:
+            stage_tree.insert('', tk.END, iid=name, text=name, values=values)
+    for name in stage_tree.get_children():
+        if name not in snapshot['stages']:
+            stage_tree.delete(name)
     
-    # Redraw canvas
-    canvas.draw()
-
-# Save current configuration
+    elapsed = max(snapshot['elapsed'], 1e-9)
+    counters = [f"{name}: {value} ({value / elapsed:.0f}/s)" for name, value in sorted(snapshot['counters'].items())]
+    gauges = [f"{name}: {value}" for name, value in sorted(snapshot['gauges'].items())]
+    counters_var.set("Counters - " + (", ".join(counters) or "none") + "\nQueues - " + ", ".join(gauges))
+
+# Write the current diagnostics to a JSON file
+def dump_diagnostics():
+    file_path = filedialog.asksaveasfilename(
+        defaultextension=".json",
+        filetypes=[("JSON files", "*.json")],
+        initialfile="diagnostics.json"
+    )
+    if not file_path:
+        return
+    try:
+        metrics.dump(file_path)
+        add_to_log(f"Diagnostics written to {file_path}")
+    except Exception as e:
+        add_to_log(f"Error writing diagnostics: {e}")
+
+# Config file keys backed by a Tk variable: key -> (variable, default)
+config_vars = {
+    'com_port': (com_port_var, SERIAL_PORT),
+    'baud_rate': (baud_rate_var, BAUD_RATE),
+    'sensitivity': (sensitivity_var, 3.0),
+    'min_threshold': (min_var, 0),
+    'max_threshold': (max_var, 3000),
+    'auto_calibrate': (auto_cal_var, True),
+    'calibration_window': (calibration_window_var, 600.0),
+    'calibration_low': (calibration_low_var, 5.0),
+    'calibration_high': (calibration_high_var, 95.0),
+    'filter_chain': (filter_chain_var, "average:5"),
+    'audio_sample_rate': (audio_sample_rate_var, 8000),
+    'acoustic_metric': (acoustic_metric_var, "leq"),
+    'acoustic_window': (acoustic_window_var, 10.0),
+    'a_weighting': (a_weighting_var, True),
+    'acoustic_offset_db': (acoustic_offset_var, 0.0),
+    'alert_threshold': (alert_threshold_var, 80),
+    'alert_duration': (alert_duration_var, 3.0),
+    'alert_hysteresis': (alert_hysteresis_var, 0.0),
+    'alert_cooldown': (alert_cooldown_var, 0.0),
+    'alert_renotify': (alert_renotify_var, 0.0),
+    'alert_rules': (alert_rules_var, ""),
+    'alert_enabled': (alert_enabled_var, True),
+    'sound_alert': (sound_alert_var, True),
+    'volume_control': (volume_control_var, True),
+    'default_volume': (default_volume_var, 50),
+    'max_volume': (max_volume_var, 100),
+    'volume_min_delta': (volume_min_delta_var, 1.0),
+    'volume_hysteresis': (volume_hysteresis_var, 0.0),
+    'volume_max_rate': (volume_max_rate_var, 20.0),
+    'volume_backend': (volume_backend_var, "auto"),
+    'logging_enabled': (logging_var, False),
+    'logging_interval': (logging_interval_var, 5.0),
+    'log_file': (log_file_var, 'noise_log.csv'),
+    'log_every_sample': (log_every_sample_var, False),
+    'log_rotate_daily': (log_rotate_daily_var, True),
+    'log_max_mb': (log_max_mb_var, 100),
+    'store_enabled': (store_enabled_var, True),
+    'graph_fps': (graph_fps_var, 10),
+    'graph_window': (graph_window_var, "30 s"),
+    'diagnostics_enabled': (diagnostics_var, False),
+}
+
+# Save current configuration (atomically, so a station reading it never sees a partial file)
 def save_config():
-    config = {
-        'com_port': com_port_var.get(),
-        'baud_rate': baud_rate_var.get(),
-        'sensitivity': sensitivity_var.get(),
-        'min_threshold': min_var.get(),
-        'max_threshold': max_var.get(),
-        'auto_calibrate': auto_cal_var.get(),
-        'alert_threshold': alert_threshold_var.get(),
-        'alert_duration': alert_duration_var.get(),
-        'alert_enabled': alert_enabled_var.get(),
-        'sound_alert': sound_alert_var.get(),
-        'volume_control': volume_control_var.get(),
-        'default_volume': default_volume_var.get(),
-        'max_volume': max_volume_var.get(),
-        'logging_enabled': logging_var.get(),
-        'logging_interval': logging_interval_var.get(),
-        'log_file': log_file_var.get()
-    }
+    global config_signature
+    config = {key: var.get() for key, (var, default) in config_vars.items()}
+    config['store_dir'] = store_dir
+    config['history_capacity'] = noise_history.capacity
     
     try:
-        with open(config_file, 'w') as f:
-            json.dump(config, f, indent=4)
+        write_json_atomic(config_file, config)
+        config_signature = file_signature(config_file)  # Our own write is not an outside change
         status_var.set("Configuration saved successfully")
         add_to_log("Configuration saved to " + config_file)
     except Exception as e:
         status_var.set(f"Error saving configuration: {e}")
         add_to_log(f"Error saving configuration: {e}")
 
+# Apply configuration values, writing only the variables whose value differs
+# (so only those settings are republished). Returns the changed keys.
+def apply_config(config):
+    global noise_history, store_dir
+    
+    changed = []
+    for key, (var, default) in config_vars.items():
+        value = config.get(key, default)
+        try:
+            if var.get() == value:
+                continue
+        except (tk.TclError, ValueError):
+            pass  # Field holds something unparsable; overwrite it
+        var.set(value)
+        changed.append(key)
+    
+    # The store directory is opened once at startup
+    new_store_dir = config.get('store_dir', store_dir)
+    if new_store_dir != store_dir:
+        if sample_store is None:
+            store_dir = new_store_dir
+        else:
+            add_to_log(f"Sample store directory change to {new_store_dir} takes effect after restart")
+    
+    # Reallocate the in-memory history if its capacity changed
+    capacity = int(config.get('history_capacity', history_capacity))
+    if capacity != noise_history.capacity:
+        noise_history = SampleHistory(capacity)
+        if history_persister is not None:
+            history_persister.attach(noise_history)
+        add_to_log(f"History capacity set to {capacity} samples")
+        changed.append('history_capacity')
+    
+    if 'sensitivity' in changed:
+        update_sensitivity(sensitivity_var.get())
+    if 'diagnostics_enabled' in changed:
+        set_diagnostics_enabled()
+    if 'graph_window' in changed:
+        set_graph_window()
+    publish_settings()
+    return changed
+
 # Load configuration
 def load_config():
+    global config_signature
+    
     try:
         if os.path.exists(config_file):
+            signature = file_signature(config_file)
             with open(config_file, 'r') as f:
                 config = json.load(f)
             
-            # Apply loaded settings to variables
-            com_port_var.set(config.get('com_port', SERIAL_PORT))
-            baud_rate_var.set(config.get('baud_rate', BAUD_RATE))
-            sensitivity_var.set(config.get('sensitivity', 3.0))
-            min_var.set(config.get('min_threshold', 0))
-            max_var.set(config.get('max_threshold', 3000))
-            auto_cal_var.set(config.get('auto_calibrate', True))
-            alert_threshold_var.set(config.get('alert_threshold', 80))
-            alert_duration_var.set(config.get('alert_duration', 3.0))
-            alert_enabled_var.set(config.get('alert_enabled', True))
-            sound_alert_var.set(config.get('sound_alert', True))
-            volume_control_var.set(config.get('volume_control', True))
-            default_volume_var.set(config.get('default_volume', 50))
-            max_volume_var.set(config.get('max_volume', 100))
-            logging_var.set(config.get('logging_enabled', False))
-            logging_interval_var.set(config.get('logging_interval', 5.0))
-            log_file_var.set(config.get('log_file', 'noise_log.csv'))
-            
-            update_sensitivity(sensitivity_var.get())
+            apply_config(config)
+            config_signature = signature
             status_var.set("Configuration loaded successfully")
             add_to_log("Configuration loaded from " + config_file)
         else:
@@ -701,43 +1252,265 @@ def load_config():
         status_var.set(f"Error loading configuration: {e}")
         add_to_log(f"Error loading configuration: {e}")
 
-# Export data to CSV
+# Apply edits other programs make to the config file while running; the
+# serial thread keeps going and picks up the new settings snapshot
+def poll_config_file():
+    global config_signature, config_error_signature
+    
+    signature = file_signature(config_file)
+    if signature is not None and signature != config_signature and signature != config_error_signature:
+        try:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+            changed = apply_config(config)
+            config_signature = signature
+            if changed:
+                status_var.set("Configuration reloaded")
+                add_to_log("Configuration reloaded from " + config_file + ", changed: " + ", ".join(changed))
+                if 'com_port' in changed or 'baud_rate' in changed:
+                    add_to_log("Connection changes take effect after Apply Connection")
+        except Exception as e:
+            config_error_signature = signature  # Report a bad file once, retry when it changes again
+            add_to_log(f"Error reloading configuration: {e}")
+    root.after(CONFIG_POLL_MS, poll_config_file)
+
+# Export a chosen time range on a worker thread, streamed from the full-rate store
 def export_data():
-    if not noise_history:
+    use_store = sample_store is not None and settings_store.current.store_enabled
+    if use_store:
+        history_persister.persist()
+        available = sample_store.time_range()
+    else:
+        snapshot = noise_history.snapshot()
+        available = (snapshot.timestamp[0], snapshot.timestamp[-1]) if len(snapshot.timestamp) else None
+    
+    if available is None:
         messagebox.showwarning("Export Data", "No data to export")
         return
+    
+    time_format = "%Y-%m-%d %H:%M:%S"
+    
+    # Create export window
+    export_window = tk.Toplevel(root)
+    export_window.title("Export Data")
+    export_window.geometry("420x230")
+    export_window.transient(root)
+    
+    range_frame = ttk.Frame(export_window, padding=10)
+    range_frame.pack(fill=tk.X)
+    
+    ttk.Label(range_frame, text="From:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+    start_var = tk.StringVar(value=datetime.fromtimestamp(available[0]).strftime(time_format))
+    ttk.Entry(range_frame, textvariable=start_var, width=22).grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+    
+    ttk.Label(range_frame, text="To:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+    end_var = tk.StringVar(value=datetime.fromtimestamp(available[1]).strftime(time_format))
+    ttk.Entry(range_frame, textvariable=end_var, width=22).grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+    
+    ttk.Label(range_frame, text="Format:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
+    format_var = tk.StringVar(value='CSV')
+    formats = list(EXPORT_FORMATS) + (list(SUMMARY_FORMATS) if rollups is not None else [])
+    ttk.Combobox(range_frame, textvariable=format_var, values=formats, state='readonly',
+                 width=20).grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+    
+    # Progress bar
+    progress_var = tk.DoubleVar()
+    ttk.Progressbar(export_window, variable=progress_var, maximum=100).pack(fill=tk.X, padx=15, pady=5)
+    
+    # Export/Cancel buttons
+    button_frame = ttk.Frame(export_window)
+    button_frame.pack(side=tk.BOTTOM, pady=10)
+    
+    job = None
+    
+    def start_export():
+        nonlocal job
+        try:
+            start_time = datetime.strptime(start_var.get().strip(), time_format).timestamp()
+            # The end time is inclusive to the second
+            end_time = datetime.strptime(end_var.get().strip(), time_format).timestamp() + 1
+        except ValueError:
+            messagebox.showerror("Export Data", f"Times must look like {datetime.now().strftime(time_format)}",
+                                 parent=export_window)
+            return
         
-    try:
+        fmt = format_var.get()
+        extension = EXPORT_FORMATS.get(fmt, '.csv')
         file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv")],
-            initialfile="noise_export.csv"
+            parent=export_window,
+            defaultextension=extension,
+            filetypes=[(fmt, "*" + extension)],
+            initialfile="noise_export" + extension
         )
         
         if not file_path:
             return
-            
-        with open(file_path, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Timestamp', 'ISO DateTime', 'Raw Noise', 'Processed Noise', 'Volume Level'])
-            
-            for entry in noise_history:
-                timestamp, raw, processed, volume_level = entry
-                dt_string = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                writer.writerow([timestamp, dt_string, raw, processed, volume_level])
-                
-        status_var.set(f"Data exported to {file_path}")
-        add_to_log(f"Data exported to {file_path}")
-        messagebox.showinfo("Export Data", f"Data successfully exported to {file_path}")
+        
+        # Summaries come straight from the pre-aggregated rollup rows
+        if fmt in SUMMARY_FORMATS:
+            tier = SUMMARY_FORMATS[fmt]
+            if tier == 'day':
+                rows = rollups.daily(start_time, end_time)
+            else:
+                rows = rollups.query(tier, start_time, end_time)
+            if len(rows) == 0:
+                messagebox.showwarning("Export Data", "No summaries in the selected range", parent=export_window)
+                return
+            job = SummaryExportJob(rows, file_path).start()
+            export_button.config(state=tk.DISABLED)
+            status_var.set(f"Exporting {job.total} summary rows to {file_path}...")
+            poll_export()
+            return
+        
+        # Views only; the job copies one slice at a time
+        if use_store:
+            chunks = sample_store.query(start_time, end_time)
+        else:
+            first = int(np.searchsorted(snapshot.timestamp, start_time, side='left'))
+            last = int(np.searchsorted(snapshot.timestamp, end_time, side='left'))
+            chunks = [StoreChunk(*(column[first:last] for column in snapshot[1:]))] if last > first else []
+        
+        if not chunks:
+            messagebox.showwarning("Export Data", "No data in the selected range", parent=export_window)
+            return
+        
+        job = ExportJob(chunks, file_path, fmt).start()
+        export_button.config(state=tk.DISABLED)
+        status_var.set(f"Exporting {job.total} samples to {file_path}...")
+        poll_export()
+    
+    def poll_export():
+        progress_var.set(job.progress)
+        if not job.finished:
+            export_window.after(100, poll_export)
+            return
+        
+        if job.error is not None:
+            status_var.set(f"Error exporting data: {job.error}")
+            add_to_log(f"Error exporting data: {job.error}")
+            messagebox.showerror("Export Error", f"Failed to export data: {job.error}", parent=export_window)
+        elif job.cancelled:
+            status_var.set("Export cancelled")
+            add_to_log("Export cancelled")
+        else:
+            status_var.set(f"Data exported to {job.path}")
+            add_to_log(f"Data exported to {job.path} ({job.total} rows)")
+            messagebox.showinfo("Export Data", f"Data successfully exported to {job.path}", parent=export_window)
+        if export_window.winfo_exists():
+            export_window.destroy()
+    
+    def cancel_export():
+        if job is not None and not job.finished:
+            job.cancel()
+        else:
+            export_window.destroy()
+    
+    export_button = ttk.Button(button_frame, text="Export", command=start_export)
+    export_button.pack(side=tk.LEFT, padx=10)
+    ttk.Button(button_frame, text="Cancel", command=cancel_export).pack(side=tk.LEFT, padx=10)
+    export_window.protocol("WM_DELETE_WINDOW", cancel_export)
+
+# Replay a data log or raw serial capture through the processing path with the
+# current settings, without touching the volume, history or live alerts
+def replay_recording():
+    file_path = filedialog.askopenfilename(
+        title="Replay Recording",
+        filetypes=[("Data logs", "*.csv"), ("Serial captures", "*.bin *.txt"), ("All files", "*.*")]
+    )
+    if not file_path:
+        return
+    
+    try:
+        timestamps, raw = load_recording(file_path, settings=settings_store.current)
     except Exception as e:
-        status_var.set(f"Error exporting data: {e}")
-        add_to_log(f"Error exporting data: {e}")
-        messagebox.showerror("Export Error", f"Failed to export data: {e}")
+        messagebox.showerror("Replay", f"Failed to read {file_path}: {e}")
+        return
+    if len(timestamps) == 0:
+        messagebox.showwarning("Replay", "No samples found in the recording")
+        return
+    
+    replay_window = tk.Toplevel(root)
+    replay_window.title("Replay - " + os.path.basename(file_path))
+    replay_window.geometry("520x400")
+    replay_window.transient(root)
+    
+    options_frame = ttk.Frame(replay_window, padding=10)
+    options_frame.pack(fill=tk.X)
+    ttk.Label(options_frame, text=f"{len(timestamps)} samples, "
+              f"{(timestamps[-1] - timestamps[0]) / 60:.1f} minutes").pack(side=tk.LEFT, padx=5)
+    speed_var = tk.StringVar(value='Max')
+    ttk.Combobox(options_frame, textvariable=speed_var, values=list(REPLAY_SPEEDS), state='readonly',
+                 width=6).pack(side=tk.RIGHT, padx=5)
+    ttk.Label(options_frame, text="Speed:").pack(side=tk.RIGHT)
+    
+    progress_var = tk.DoubleVar()
+    ttk.Progressbar(replay_window, variable=progress_var, maximum=100).pack(fill=tk.X, padx=15, pady=5)
+    
+    output_text = tk.Text(replay_window, wrap=tk.WORD, height=14)
+    output_text.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
+    
+    button_frame = ttk.Frame(replay_window)
+    button_frame.pack(side=tk.BOTTOM, pady=10)
+    
+    job = None
+    shown = 0
+    
+    def start_replay():
+        nonlocal job, shown
+        output_text.delete(1.0, tk.END)
+        shown = 0
+        job = ReplayJob(timestamps, raw, settings_store.current, speed=REPLAY_SPEEDS[speed_var.get()]).start()
+        start_button.config(state=tk.DISABLED)
+        poll_replay()
+    
+    def poll_replay():
+        nonlocal shown
+        if not replay_window.winfo_exists():
+            job.cancel()
+            return
+        progress_var.set(job.progress)
+        
+        # Show event log lines produced since the last poll (recorded times)
+        new = min(job.message_count - shown, len(job.messages))
+        for timestamp, message in list(job.messages)[len(job.messages) - new:]:
+            output_text.insert(tk.END, f"[{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}] {message}\n")
+        shown = job.message_count
+        output_text.see(tk.END)
+        
+        if not job.finished:
+            replay_window.after(100, poll_replay)
+            return
+        
+        start_button.config(state=tk.NORMAL)
+        if job.error is not None:
+            output_text.insert(tk.END, f"Replay failed: {job.error}\n")
+            return
+        results = job.results()
+        output_text.insert(tk.END, f"\nReplayed {results['samples']} samples "
+                           f"({results['recorded_seconds']:.0f} s) in {results['elapsed_seconds']:.1f} s\n"
+                           f"Alerts: {results['alert_events']}, time above threshold: "
+                           f"{results['seconds_above_threshold']:.0f} s, mean processed: "
+                           f"{results['processed_mean']:.1f}, max: {results['processed_max']:.1f}\n")
+        output_text.see(tk.END)
+        add_to_log(f"Replayed {os.path.basename(file_path)}: {results['alert_events']} alerts")
+    
+    def close_replay():
+        if job is not None and not job.finished:
+            job.cancel()
+        replay_window.destroy()
+    
+    start_button = ttk.Button(button_frame, text="Start", command=start_replay)
+    start_button.pack(side=tk.LEFT, padx=10)
+    ttk.Button(button_frame, text="Close", command=close_replay).pack(side=tk.LEFT, padx=10)
+    replay_window.protocol("WM_DELETE_WINDOW", close_replay)
 
 # Restart serial connection
 def restart_serial_connection():
     global running
     
+    # Make sure the new connection sees the latest port and baud rate
+    publish_settings()
+    
     # Stop current thread if it's running
     running = False
     time.sleep(1)  # Give time for thread to finish
@@ -772,11 +1545,6 @@ def find_com_ports():
 
 # Start calibration procedure
 def start_calibration():
-    # Reset min/max
-    global noise_min, noise_max
-    noise_min = 0
-    noise_max = 100
-    
     # Create calibration window
     cal_window = tk.Toplevel(root)
     cal_window.title("Calibration")
@@ -803,86 +1571,103 @@ def start_calibration():
     value_label = ttk.Label(cal_window, textvariable=value_var, font=("Arial", 14))
     value_label.pack(pady=10)
     
+    # Stop feeding the session when the window goes away
+    def close_calibration():
+        global calibration_session
+        calibration_session = None
+        cal_window.destroy()
+    
     # Cancel/Start/Done buttons
     button_frame = ttk.Frame(cal_window)
     button_frame.pack(side=tk.BOTTOM, pady=20)
     
-    cancel_button = ttk.Button(button_frame, text="Cancel", command=cal_window.destroy)
+    cancel_button = ttk.Button(button_frame, text="Cancel", command=close_calibration)
     cancel_button.pack(side=tk.LEFT, padx=10)
     
     start_button = ttk.Button(button_frame, text="Start Calibration", 
                             command=lambda: start_cal_process())
     start_button.pack(side=tk.LEFT, padx=10)
     
-    done_button = ttk.Button(button_frame, text="Done", command=cal_window.destroy)
+    done_button = ttk.Button(button_frame, text="Done", command=close_calibration)
     done_button.pack(side=tk.LEFT, padx=10)
     done_button.config(state=tk.DISABLED)
+    cal_window.protocol("WM_DELETE_WINDOW", close_calibration)
     
-    # Calibration process
+    phase_prompts = {
+        'quiet': "Phase 1: Please remain quiet...",
+        'loud': "Phase 2: Please make loud noises...",
+    }
+    
+    # Calibration process: the serial thread feeds every reading to the
+    # session; this only shows progress and applies the result at the end
     def start_cal_process():
-        # Reset values
-        global noise_min, noise_max
-        noise_min = 999999
-        noise_max = 0
+        global calibration_session
+        session = calibration_session = CalibrationSession(time.time())
         
         # Disable start button
         start_button.config(state=tk.DISABLED)
-        
-        # Phase 1: Quiet
-        status_label.config(text="Phase 1: Please remain quiet...")
-        
-        # Monitor progress and values for 5 seconds
-        start_time = time.time()
+        shown_phase = None
         
         def update_cal_progress():
-            current_time = time.time()
-            elapsed = current_time - start_time
-            
-            # Get recent noise values (last 3 entries)
-            recent_values = [x[1] for x in noise_history[-3:]] if noise_history else [0]
-            current_value = sum(recent_values) / len(recent_values) if recent_values else 0
+            nonlocal shown_phase
+            global calibration_session
+            if calibration_session is not session:
+                return  # Window closed
+            now = time.time()
+            elapsed = now - session.start_time
             
             # Update display
-            value_var.set(f"Current value: {int(current_value)}")
+            if session.last_value is not None:
+                value_var.set(f"Current value: {int(session.last_value)}")
             
-            if elapsed < 5:  # Phase 1 (quiet)
-                progress_var.set(elapsed * 10)  # 0-50%
-                cal_window.after(100, update_cal_progress)
-            elif elapsed < 10:  # Phase 2 (loud)
-                if elapsed == 5:
-                    status_label.config(text="Phase 2: Please make loud noises...")
-                progress_var.set(50 + (elapsed - 5) * 10)  # 50-100%
+            phase = session.phase_at(now)
+            if phase is not None:
+                if phase != shown_phase:
+                    status_label.config(text=phase_prompts.get(phase, phase))
+                    shown_phase = phase
+                progress_var.set(min(elapsed / session.duration * 100, 100))
                 cal_window.after(100, update_cal_progress)
+                return
+            
+            # Calibration complete
+            calibration_session = None
+            progress_var.set(100)
+            status_label.config(text="Calibration complete!")
+            result = session.finish(sensitivity_var.get())
+            if result is not None:
+                apply_calibration(result)
+                value_var.set(f"Min: {result['min_threshold']}, Max: {result['max_threshold']}, "
+                              f"Threshold: {result['alert_threshold']}")
             else:
-                # Calibration complete
-                progress_var.set(100)
-                status_label.config(text="Calibration complete!")
-                
-                # Set thresholds based on measurements
-                if noise_min < 999999 and noise_max > 0:
-                    # Add some margin
-                    adjusted_min = max(0, noise_min - int(noise_min * 0.1))
-                    adjusted_max = noise_max + int(noise_max * 0.1)
-                    
-                    min_var.set(adjusted_min)
-                    max_var.set(adjusted_max)
-                    
-                    # Set alert threshold to 80% of the range
-                    threshold_value = adjusted_min + int((adjusted_max - adjusted_min) * 0.8)
-                    alert_threshold_var.set(threshold_value)
-                    
-                    value_var.set(f"Min: {adjusted_min}, Max: {adjusted_max}, Threshold: {threshold_value}")
-                    add_to_log(f"Calibration completed: Min={adjusted_min}, Max={adjusted_max}, Threshold={threshold_value}")
-                else:
-                    status_label.config(text="Calibration failed, insufficient data")
-                    add_to_log("Calibration failed: insufficient data")
-                
-                # Enable done button
-                done_button.config(state=tk.NORMAL)
+                status_label.config(text="Calibration failed, insufficient data")
+                add_to_log("Calibration failed: insufficient data")
+            
+            # Enable done button
+            done_button.config(state=tk.NORMAL)
         
         # Start progress updates
         update_cal_progress()
 
+# Set the calibrated thresholds together and publish them as one settings snapshot
+def apply_calibration(result):
+    # The measured range replaces the auto-calibrated one, which would
+    # otherwise overwrite it on the next sync_calibrated_range tick
+    was_auto = auto_cal_var.get()
+    auto_cal_var.set(False)
+    min_var.set(result['min_threshold'])
+    max_var.set(result['max_threshold'])
+    alert_threshold_var.set(result['alert_threshold'])
+    publish_settings()
+    if was_auto:
+        add_to_log("Auto-calibration turned off to keep the calibrated range")
+    
+    quiet, loud = result['phases']['quiet'], result['phases']['loud']
+    add_to_log(f"Calibration completed: Min={result['min_threshold']}, Max={result['max_threshold']}, "
+               f"Threshold={result['alert_threshold']}")
+    add_to_log(f"Calibration quiet phase: {quiet['count']} readings, median {quiet['p50']:.0f}, "
+               f"noise floor RMS {result['noise_floor_rms']:.1f}; loud phase: {loud['count']} readings, "
+               f"p95 {loud['p95']:.0f}, peak {loud['peak']:.0f}")
+
 # Save current settings as a preset
 def save_preset():
     preset_name = preset_name_var.get().strip()
@@ -902,41 +1687,26 @@ def save_preset():
             'sensitivity': sensitivity_var.get(),
             'min_threshold': min_var.get(),
             'max_threshold': max_var.get(),
+            'filter_chain': filter_chain_var.get(),
             'alert_threshold': alert_threshold_var.get(),
             'alert_duration': alert_duration_var.get(),
+            'alert_hysteresis': alert_hysteresis_var.get(),
+            'alert_cooldown': alert_cooldown_var.get(),
+            'alert_renotify': alert_renotify_var.get(),
+            'alert_rules': alert_rules_var.get(),
             'default_volume': default_volume_var.get(),
             'max_volume': max_volume_var.get()
         }
     }
     
-    # Load existing presets
-    presets = []
-    presets_file = "presets.json"
-    
-    try:
-        if os.path.exists(presets_file):
-            with open(presets_file, 'r') as f:
-                presets = json.load(f)
-    except Exception:
-        presets = []
-    
-    # Check if preset name already exists
-    for i, p in enumerate(presets):
-        if p.get('name') == preset_name:
-            # Ask for confirmation to overwrite
-            if messagebox.askyesno("Overwrite Preset", f"Preset '{preset_name}' already exists. Overwrite?"):
-                presets[i] = preset
-                break
-            else:
-                return
-    else:
-        # New preset
-        presets.append(preset)
+    # Ask for confirmation to overwrite an existing preset
+    if preset_name in presets and not messagebox.askyesno(
+            "Overwrite Preset", f"Preset '{preset_name}' already exists. Overwrite?"):
+        return
     
     # Save presets
     try:
-        with open(presets_file, 'w') as f:
-            json.dump(presets, f, indent=4)
+        presets.put(preset)
         
         # Update listbox
         update_preset_list()
@@ -956,39 +1726,37 @@ def load_preset():
     
     # Get the selected preset name
     preset_name = presets_listbox.get(selection[0])
+    preset = presets.get(preset_name)
     
-    # Load presets
-    presets_file = "presets.json"
     try:
-        if os.path.exists(presets_file):
-            with open(presets_file, 'r') as f:
-                presets = json.load(f)
-                
-            # Find the matching preset
-            preset = next((p for p in presets if p.get('name') == preset_name), None)
+        if preset and 'settings' in preset:
+            # Apply settings
+            settings = preset['settings']
+            sensitivity_var.set(settings.get('sensitivity', 3.0))
+            min_var.set(settings.get('min_threshold', 0))
+            max_var.set(settings.get('max_threshold', 3000))
+            filter_chain_var.set(settings.get('filter_chain', "average:5"))
+            alert_threshold_var.set(settings.get('alert_threshold', 80))
+            alert_duration_var.set(settings.get('alert_duration', 3.0))
+            alert_hysteresis_var.set(settings.get('alert_hysteresis', 0.0))
+            alert_cooldown_var.set(settings.get('alert_cooldown', 0.0))
+            alert_renotify_var.set(settings.get('alert_renotify', 0.0))
+            alert_rules_var.set(settings.get('alert_rules', ""))
+            default_volume_var.set(settings.get('default_volume', 50))
+            max_volume_var.set(settings.get('max_volume', 100))
             
-            if preset and 'settings' in preset:
-                # Apply settings
-                settings = preset['settings']
-                sensitivity_var.set(settings.get('sensitivity', 3.0))
-                min_var.set(settings.get('min_threshold', 0))
-                max_var.set(settings.get('max_threshold', 3000))
-                alert_threshold_var.set(settings.get('alert_threshold', 80))
-                alert_duration_var.set(settings.get('alert_duration', 3.0))
-                default_volume_var.set(settings.get('default_volume', 50))
-                max_volume_var.set(settings.get('max_volume', 100))
-                
-                # Update sensitivity display
-                update_sensitivity(sensitivity_var.get())
-                
-                # Show description
-                preset_desc_text.delete(1.0, tk.END)
-                preset_desc_text.insert(tk.END, preset.get('description', ''))
-                
-                status_var.set(f"Preset '{preset_name}' loaded successfully")
-                add_to_log(f"Preset '{preset_name}' loaded")
-            else:
-                messagebox.showerror("Load Error", f"Invalid preset structure for '{preset_name}'")
+            # Update sensitivity display
+            update_sensitivity(sensitivity_var.get())
+            publish_settings()
+            
+            # Show description
+            preset_desc_text.delete(1.0, tk.END)
+            preset_desc_text.insert(tk.END, preset.get('description', ''))
+            
+            status_var.set(f"Preset '{preset_name}' loaded successfully")
+            add_to_log(f"Preset '{preset_name}' loaded")
+        else:
+            messagebox.showerror("Load Error", f"Invalid preset structure for '{preset_name}'")
     except Exception as e:
         status_var.set(f"Error loading preset: {e}")
         add_to_log(f"Error loading preset: {e}")
@@ -1007,47 +1775,44 @@ def delete_preset():
     if not messagebox.askyesno("Delete Preset", f"Are you sure you want to delete preset '{preset_name}'?"):
         return
     
-    # Load presets
-    presets_file = "presets.json"
     try:
-        if os.path.exists(presets_file):
-            with open(presets_file, 'r') as f:
-                presets = json.load(f)
-                
-            # Remove the matching preset
-            presets = [p for p in presets if p.get('name') != preset_name]
-            
-            # Save updated presets
-            with open(presets_file, 'w') as f:
-                json.dump(presets, f, indent=4)
-            
-            # Update listbox
-            update_preset_list()
-            
-            # Clear description
-            preset_desc_text.delete(1.0, tk.END)
-            
-            status_var.set(f"Preset '{preset_name}' deleted successfully")
-            add_to_log(f"Preset '{preset_name}' deleted")
+        presets.delete(preset_name)
+        
+        # Update listbox
+        update_preset_list()
+        
+        # Clear description
+        preset_desc_text.delete(1.0, tk.END)
+        
+        status_var.set(f"Preset '{preset_name}' deleted successfully")
+        add_to_log(f"Preset '{preset_name}' deleted")
     except Exception as e:
         status_var.set(f"Error deleting preset: {e}")
         add_to_log(f"Error deleting preset: {e}")
 
-# Update the preset list
+# Bring the listbox in line with the repository, inserting and deleting only
+# the rows that differ
 def update_preset_list():
-    presets_listbox.delete(0, tk.END)
-    
-    presets_file = "presets.json"
+    global preset_list_names
+    names = presets.names()
+    matcher = difflib.SequenceMatcher(a=preset_list_names, b=names, autojunk=False)
+    # Back to front so earlier indices stay valid
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag in ('replace', 'delete'):
+            presets_listbox.delete(i1, i2 - 1)
+        if tag in ('replace', 'insert'):
+            presets_listbox.insert(i1, *names[j1:j2])
+    preset_list_names = names
+
+# Pick up changes other programs make to the presets file
+def poll_presets_file():
     try:
-        if os.path.exists(presets_file):
-            with open(presets_file, 'r') as f:
-                presets = json.load(f)
-                
-            # Add presets to listbox
-            for preset in presets:
-                presets_listbox.insert(tk.END, preset.get('name', 'Unnamed'))
+        if presets.refresh():
+            update_preset_list()
+            add_to_log(f"Presets reloaded from {presets.path}")
     except Exception as e:
         print(f"Error loading presets: {e}")
+    root.after(PRESETS_POLL_MS, poll_presets_file)
 
 # Show preset description when selected
 def on_preset_select(event):
@@ -1057,48 +1822,109 @@ def on_preset_select(event):
     
     # Get the selected preset name
     preset_name = presets_listbox.get(selection[0])
+    preset = presets.get(preset_name)
     
-    # Load presets
-    presets_file = "presets.json"
-    try:
-        if os.path.exists(presets_file):
-            with open(presets_file, 'r') as f:
-                presets = json.load(f)
-                
-            # Find the matching preset
-            preset = next((p for p in presets if p.get('name') == preset_name), None)
-            
-            if preset:
-                # Show description
-                preset_desc_text.delete(1.0, tk.END)
-                preset_desc_text.insert(tk.END, preset.get('description', ''))
-                
-                # Set name
-                preset_name_var.set(preset_name)
-    except Exception as e:
-        print(f"Error loading preset description: {e}")
+    if preset:
+        # Show description
+        preset_desc_text.delete(1.0, tk.END)
+        preset_desc_text.insert(tk.END, preset.get('description', ''))
+        
+        # Set name
+        preset_name_var.set(preset_name)
 
 # Bind preset selection event
 presets_listbox.bind('<<ListboxSelect>>', on_preset_select)
 
+# Publish a new settings snapshot whenever a setting changes
+for var in settings_vars.values():
+    var.trace_add('write', schedule_settings_publish)
+
 # Handle window closing
 def on_closing():
     global running
     running = False
     time.sleep(0.5)  # Give threads time to cleanup
+    data_logger.stop()  # Write out queued rows
+    volume_actuator.stop()
+    if history_persister is not None:
+        history_persister.stop()
+    if rollups is not None:
+        rollups.close()  # Write out the partly filled buckets
+    event_log.drain(limit=event_log.queue.qsize())  # Write the last messages to the file
+    event_log.close()
     root.destroy()
 
+startup.mark('gui build')
+
 # Load config on startup
 if os.path.exists(config_file):
     load_config()
 
-# Update preset list on startup
+# Load presets and fill the list on startup
+try:
+    presets.load()
+except Exception as e:
+    print(f"Error loading presets: {e}")
 update_preset_list()
 
+# Start the background CSV writer
+data_logger.start()
+volume_actuator.start()
+
+# Open the on-disk sample store and start persisting history into it; the
+# same thread keeps the rollups up to date
+try:
+    sample_store = SampleStore(store_dir)
+    rollups = Rollups(store_dir, threshold=lambda: settings_store.current.alert_threshold)
+    history_persister = HistoryPersister(noise_history, sample_store,
+                                         is_enabled=lambda: settings_store.current.store_enabled,
+                                         on_error=lambda message: add_to_log(message),
+                                         consumers=[lambda timestamps, raw, processed, volume:
+                                                    rollups.add(timestamps, processed, volume)])
+    history_persister.start()
+except Exception as e:
+    print(f"Error opening sample store: {e}")
+    add_to_log(f"Error opening sample store {store_dir}: {e}")
+    sample_store = None
+    rollups = None
+
+startup.mark('config and stores')
+
+# Take the initial settings snapshot and connect as early as possible
+publish_settings()
+sync_calibrated_range()
+
 # Start serial connection thread
 serial_thread = threading.Thread(target=read_serial, daemon=True)
 serial_thread.start()
 
+# Queue depths and error counts sampled by the Diagnostics tab
+metrics.gauge('log_queue', lambda: data_logger.queue.qsize())
+metrics.gauge('log_dropped', lambda: data_logger.dropped)
+metrics.gauge('reader_buffer_bytes', lambda: len(active_reader.buffer) if active_reader else 0)
+metrics.gauge('port_high_water', lambda: active_reader.port_high_water if active_reader else 0)
+metrics.gauge('parse_failures', lambda: active_reader.invalid_lines + active_reader.frame_errors if active_reader else 0)
+metrics.gauge('lost_frames', lambda: active_reader.lost_frames if active_reader else 0)
+metrics.gauge('ui_updates_merged', lambda: ui_mailbox.merged)
+metrics.gauge('volume_applied', lambda: volume_actuator.applied)
+metrics.gauge('volume_suppressed', lambda: volume_actuator.suppressed)
+metrics.gauge('volume_collapsed', lambda: volume_actuator.collapsed)
+metrics.gauge('volume_errors', lambda: volume_actuator.errors)
+metrics.gauge('volume_no_backend', lambda: volume_actuator.no_backend)
+metrics.gauge('persist_backlog', lambda: noise_history.total - history_persister.persisted if history_persister else 0)
+
+# Start the current-value, graph and diagnostics refresh timers
+poll_ui_mailbox()
+poll_event_log()
+root.after(PRESETS_POLL_MS, poll_presets_file)
+root.after(CONFIG_POLL_MS, poll_config_file)
+canvas.mpl_connect('draw_event', on_graph_draw)
+graph_window_combo.bind('<<ComboboxSelected>>', set_graph_window)
+update_graph()
+update_diagnostics()
+metrics.gauge('startup', startup.as_dict)
+root.after_idle(report_startup)
+
 # Set window close handler
 root.protocol("WM_DELETE_WINDOW", on_closing)
 
@@ -0,0 +1,344 @@
+import time
+
+import numpy as np
+
+from alerts import AlertEngine, AlertRule, parse_alert_rules
+from filters import DEFAULT_FILTER_CHAIN, parse_filter_chain
+from quantiles import WindowedQuantiles
+
+# Distinct raw readings from the 12-bit ADC (analogReadResolution(12) in sketch_mar3a.ino)
+ADC_LEVELS = 4096
+
+CALIBRATION_REFRESH = 1.0     # Seconds between auto-calibrated range updates
+CALIBRATION_MIN_SAMPLES = 10  # Readings needed before the range is first set
+
+
+# The per-sample processing path shared by the live serial connection and
+# replay: smoothing (the filter chain from settings), the sensitivity curve
+# with auto-calibrated range, alert rules and the volume level. The
+# auto-calibrated range is the calibration_low/high percentiles of the
+# smoothed readings over the last calibration_window seconds, refreshed once
+# a second. Alerts come from an AlertEngine running the main threshold rule
+# (alert_threshold for alert_duration, which also holds the volume while
+# firing) plus the extra `alert_rules`. It has no GUI dependencies;
+# side effects go through the optional callbacks:
+#   set_volume(level)       actuate the system volume (0.0 to 1.0)
+#   on_message(text)        event log line
+#   on_indicator(color)     status indicator colour ("red"/"green")
+#   play_alert()            alert sound
+# Every call takes a Settings snapshot and the sample time, so a replay
+# reproduces alert durations from the recorded timestamps. With an enabled
+# `metrics` the processing and the volume call are timed per sample.
+# process_batch() is the vectorized form of process_noise() for whole arrays,
+# step_batch() the batch form of step().
+class NoisePipeline:
+    def __init__(self, set_volume=None, on_message=None, on_indicator=None, play_alert=None, metrics=None):
+        self.set_volume = set_volume
+        self.metrics = metrics
+        self.on_message = on_message
+        self.on_indicator = on_indicator
+        self.play_alert = play_alert
+        self.filters = parse_filter_chain(DEFAULT_FILTER_CHAIN)
+        self.filter_spec = DEFAULT_FILTER_CHAIN
+        self.range_tracker = WindowedQuantiles()
+        self.calibrated_range = None  # (min, max) in effect with auto-calibration
+        self._next_refresh = 0.0
+        self.alerts = AlertEngine(on_event=self._alert_event)
+        self.event_time = None  # Sample time of the alert event being reported
+        self._rules_key = None
+        self._sound_alert = True
+        self._table = None  # Sensitivity curve per ADC reading, see _curve_table
+        self._table_key = None
+
+    # Start smoothing afresh (new connection or replay)
+    def reset(self):
+        self.filters.reset()
+
+    # Rebuild the filter chain when its setting changes; an invalid chain is
+    # reported and replaced by the default
+    def configure_filters(self, spec):
+        self.filter_spec = spec
+        try:
+            self.filters = parse_filter_chain(spec)
+        except ValueError as e:
+            self._message(f"Invalid filter chain '{spec}': {e}; using {DEFAULT_FILTER_CHAIN}")
+            self.filters = parse_filter_chain(DEFAULT_FILTER_CHAIN)
+
+    # Process noise value with high sensitivity to changes
+    def process_noise(self, raw_value, settings):
+        sensitivity = settings.sensitivity
+        min_threshold = settings.min_threshold
+        max_threshold = settings.max_threshold
+
+        # With auto-calibration the tracked range replaces the configured values
+        calibrated_range = self.calibrated_range
+        if settings.auto_calibrate and calibrated_range is not None:
+            min_threshold, max_threshold = calibrated_range
+
+        # Clamp value to thresholds
+        clamped = max(min_threshold, min(raw_value, max_threshold))
+
+        # Normalize to 0-100 scale
+        range_size = max_threshold - min_threshold
+        if range_size <= 0:
+            normalized = 0
+        else:
+            normalized = ((clamped - min_threshold) / range_size) * 100
+
+        # Apply non-linear sensitivity curve (higher sensitivity = more dramatic response)
+        # Using an exponential curve for sensitivity
+        enhanced = (normalized / 100) ** (1 / sensitivity) * 100
+
+        return enhanced
+
+    # Clamp, normalize and apply the sensitivity curve to an array; the range
+    # may be per-sample arrays. Same arithmetic as process_noise.
+    @staticmethod
+    def _curve(values, sensitivity, min_threshold, max_threshold):
+        range_size = max_threshold - min_threshold
+        clamped = np.maximum(min_threshold, np.minimum(values, max_threshold))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = np.where(range_size > 0, ((clamped - min_threshold) / range_size) * 100, 0.0)
+        return (normalized / 100) ** (1 / sensitivity) * 100
+
+    # Curve value for every possible ADC reading, rebuilt only when the
+    # sensitivity or the range changes
+    def _curve_table(self, sensitivity, min_threshold, max_threshold):
+        key = (sensitivity, min_threshold, max_threshold)
+        if key != self._table_key:
+            self._table = self._curve(np.arange(ADC_LEVELS, dtype=np.float64), sensitivity, min_threshold,
+                                      max_threshold)
+            self._table_key = key
+        return self._table
+
+    # Feed one smoothed reading to the auto-calibration window
+    def track_range(self, value, now, settings):
+        self._range_tracker(settings).add(value, now)
+        if now >= self._next_refresh:
+            self._refresh_range(settings, now)
+
+    def _range_tracker(self, settings):
+        if self.range_tracker.window != settings.calibration_window:
+            self.range_tracker = WindowedQuantiles(settings.calibration_window)
+        return self.range_tracker
+
+    def _refresh_range(self, settings, now):
+        self._next_refresh = now + CALIBRATION_REFRESH
+        tracker = self.range_tracker
+        if tracker.count:
+            self._update_range(tracker.count, *tracker.quantiles((settings.calibration_low / 100,
+                                                                  settings.calibration_high / 100)))
+
+    def _update_range(self, count, low, high):
+        if count >= CALIBRATION_MIN_SAMPLES and high > low:
+            self.calibrated_range = (low, high)
+
+    # Curve for an array under one range: the lookup table for whole-number
+    # ADC readings, otherwise computed directly
+    def _apply_curve(self, values, sensitivity, min_threshold, max_threshold):
+        if self._fits_table(values):
+            return self._curve_table(sensitivity, min_threshold, max_threshold)[values.astype(np.intp)]
+        return self._curve(values.astype(np.float64, copy=False), sensitivity, min_threshold, max_threshold)
+
+    # Process a whole array of raw or smoothed readings at once. Returns
+    # (processed_values, volume_levels) as arrays, equal to calling
+    # process_noise and track_range per value. `timestamps` (default: now)
+    # place the readings in the auto-calibration window.
+    def process_batch(self, values, settings, timestamps=None):
+        values = np.asarray(values)
+        count = len(values)
+        if count == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        sensitivity = settings.sensitivity
+
+        if not settings.auto_calibrate:
+            processed = self._apply_curve(values, sensitivity, settings.min_threshold, settings.max_threshold)
+        else:
+            timestamps = (np.full(count, time.time()) if timestamps is None
+                          else np.asarray(timestamps, dtype=np.float64))
+            # Readings up to the one that triggers the next refresh share the
+            # current range; the refresh times only depend on the timestamps
+            ends, refreshes = [], []
+            next_refresh = self._next_refresh
+            start = 0
+            while start < count:
+                end = min(max(int(np.searchsorted(timestamps, next_refresh)), start) + 1, count)
+                ends.append(end)
+                if timestamps[end - 1] >= next_refresh:
+                    refreshes.append(end)
+                    next_refresh = timestamps[end - 1] + CALIBRATION_REFRESH
+                start = end
+            self._next_refresh = next_refresh
+
+            # Window contents at every refresh in one go
+            counts, ranges = self._range_tracker(settings).add_many_and_query(
+                values, timestamps, refreshes, (settings.calibration_low / 100, settings.calibration_high / 100))
+            lows, highs = [], []
+            refresh = 0
+            for end in ends:
+                min_threshold, max_threshold = self.calibrated_range or (settings.min_threshold,
+                                                                         settings.max_threshold)
+                lows.append(min_threshold)
+                highs.append(max_threshold)
+                if refresh < len(refreshes) and refreshes[refresh] == end:
+                    self._update_range(int(counts[refresh]), *ranges[refresh].tolist())
+                    refresh += 1
+
+            # One pass of the curve, each reading under the range in effect when it arrived
+            if len(ends) == 1:
+                processed = self._apply_curve(values, sensitivity, lows[0], highs[0])
+            else:
+                sizes = np.diff(ends, prepend=0)
+                processed = self._curve(values.astype(np.float64, copy=False), sensitivity,
+                                        np.repeat(np.array(lows, dtype=np.float64), sizes),
+                                        np.repeat(np.array(highs, dtype=np.float64), sizes))
+
+        volume_levels = np.minimum(processed.astype(np.int64), settings.max_volume)
+        return processed, volume_levels
+
+    # Whether every reading is a whole number from 0 to ADC_LEVELS - 1
+    @staticmethod
+    def _fits_table(values):
+        if values.dtype.kind not in 'iu':
+            if values.dtype.kind != 'f' or not np.array_equal(values, np.floor(values)):
+                return False
+        return values.min() >= 0 and values.max() < ADC_LEVELS
+
+    # Rebuild the alert rules when their settings change; invalid extra rules
+    # are reported and left out
+    def _configure_alerts(self, settings):
+        key = (settings.alert_threshold, settings.alert_duration, settings.alert_hysteresis,
+               settings.alert_cooldown, settings.alert_renotify, settings.alert_rules)
+        if key == self._rules_key:
+            return
+        self._rules_key = key
+        rules = [AlertRule('above', settings.alert_threshold, settings.alert_duration, settings.alert_hysteresis,
+                           settings.alert_cooldown, settings.alert_renotify, name='threshold')]
+        try:
+            extra = parse_alert_rules(settings.alert_rules)
+            if any(rule.name == 'threshold' for rule in extra):
+                raise ValueError("the name 'threshold' is taken by the main alert")
+            rules += extra
+        except ValueError as e:
+            self._message(f"Invalid alert rules '{settings.alert_rules}': {e}; using the threshold alert only")
+        self.alerts.set_rules(rules)
+
+    # Evaluate the alert rules on arrays of processed values and their times.
+    # Returns a boolean array, True where the main threshold alert is firing.
+    def check_alerts(self, processed_values, settings, timestamps):
+        if not settings.alert_enabled:
+            return np.zeros(len(processed_values), dtype=bool)
+        self._configure_alerts(settings)
+        self._sound_alert = settings.sound_alert
+        return self.alerts.evaluate(processed_values, timestamps)[0]
+
+    # Single-sample form of check_alerts; True while the threshold alert is firing
+    def check_threshold(self, processed_value, settings, now):
+        return bool(self.check_alerts(np.array([processed_value]), settings, np.array([now]))[0])
+
+    def _alert_event(self, rule, event, now, value):
+        self.event_time = now
+        condition = rule.describe(value)
+        if event == 'pending':
+            self._message(f"Alert '{rule.name}' pending: {condition}")
+        elif event == 'cancelled':
+            self._message(f"Alert '{rule.name}' cleared before firing: {rule.describe_value(value)}")
+        elif event in ('firing', 'renotify'):
+            if event == 'firing':
+                if self.on_indicator is not None:
+                    self.on_indicator("red")
+                self._message(f"ALERT '{rule.name}': {condition}" +
+                              (f" for {rule.duration:g}s" if rule.duration else ""))
+            else:
+                self._message(f"ALERT '{rule.name}' still active: {condition}")
+            if rule.sound and self._sound_alert and self.play_alert is not None:
+                self.play_alert()
+        elif event == 'resolved':
+            if self.on_indicator is not None and not self.alerts.firing:
+                self.on_indicator("green")
+            self._message(f"Alert '{rule.name}' resolved: {rule.describe_value(value)}")
+        self.event_time = None
+
+    # Run one raw reading through smoothing, processing, alerts and volume
+    # control. Returns (processed_value, volume_level, is_alert).
+    def step(self, noise_value, settings, now=None):
+        if now is None:
+            now = time.time()
+        metrics = self.metrics
+        timed = metrics is not None and metrics.enabled
+        if timed:
+            start = time.perf_counter()
+
+        # Smooth through the filter chain
+        if settings.filter_chain != self.filter_spec:
+            self.configure_filters(settings.filter_chain)
+        smoothed_value = self.filters.update(noise_value, now)
+
+        # Process with sensitivity adjustment
+        processed_value = self.process_noise(smoothed_value, settings)
+        if settings.auto_calibrate:
+            self.track_range(smoothed_value, now, settings)
+
+        # Check for threshold crossing
+        is_alert = self.check_threshold(processed_value, settings, now)
+
+        # Calculate volume level (0-100)
+        volume_level = min(int(processed_value), settings.max_volume)
+
+        if timed:
+            volume_start = time.perf_counter()
+            metrics.observe('process', volume_start - start)
+
+        # Update volume if not in alert state
+        if self.set_volume is not None and settings.volume_control and not is_alert:
+            try:
+                # Set volume (0.0 to 1.0)
+                self.set_volume(volume_level / 100)
+            except Exception as e:
+                print(f"Volume error: {e}")
+                if timed:
+                    metrics.count('volume_errors')
+            if timed:
+                metrics.observe('volume_call', time.perf_counter() - volume_start)
+
+        return processed_value, volume_level, is_alert
+
+    # Batch form of step() for arrays of raw readings and their times:
+    # smoothing, processing and the alert rules run vectorized. The volume
+    # follows the newest reading outside an alert (a volume actuator only
+    # keeps the newest target anyway). Returns (processed_values,
+    # volume_levels, is_alert) arrays.
+    def step_batch(self, values, settings, timestamps):
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        metrics = self.metrics
+        timed = metrics is not None and metrics.enabled
+        if timed:
+            start = time.perf_counter()
+
+        if settings.filter_chain != self.filter_spec:
+            self.configure_filters(settings.filter_chain)
+        smoothed = self.filters.process(values, timestamps)
+        processed, volume_levels = self.process_batch(smoothed, settings, timestamps)
+        is_alert = self.check_alerts(processed, settings, timestamps)
+
+        if timed:
+            volume_start = time.perf_counter()
+            metrics.observe('process', volume_start - start)
+
+        if self.set_volume is not None and settings.volume_control:
+            quiet = np.flatnonzero(~is_alert)
+            if len(quiet):
+                try:
+                    self.set_volume(int(volume_levels[quiet[-1]]) / 100)
+                except Exception as e:
+                    print(f"Volume error: {e}")
+                    if timed:
+                        metrics.count('volume_errors')
+                if timed:
+                    metrics.observe('volume_call', time.perf_counter() - volume_start)
+
+        return processed, volume_levels, is_alert
+
+    def _message(self, text):
+        if self.on_message is not None:
+            self.on_message(text)
@@ -0,0 +1,60 @@
+import json
+
+from jsonfile import file_signature, write_json_atomic
+
+
+# The presets file held in memory as a dict by name (in file order). Reads
+# never touch the disk; every change is written through atomically. The file
+# is reloaded when its mtime or size shows another program changed it, which
+# refresh() checks cheaply and every write checks first so external edits
+# are not overwritten.
+class PresetRepository:
+    def __init__(self, path="presets.json"):
+        self.path = path
+        self._presets = {}
+        self._signature = None
+
+    # Read the file (an empty repository if it does not exist)
+    def load(self):
+        signature = file_signature(self.path)
+        presets = {}
+        if signature is not None:
+            with open(self.path, 'r') as f:
+                for preset in json.load(f):
+                    presets[preset.get('name', 'Unnamed')] = preset
+        self._presets = presets
+        self._signature = signature
+
+    # Reload if the file changed on disk; True when it did
+    def refresh(self):
+        if file_signature(self.path) == self._signature:
+            return False
+        self.load()
+        return True
+
+    def names(self):
+        return list(self._presets)
+
+    def get(self, name):
+        return self._presets.get(name)
+
+    def __contains__(self, name):
+        return name in self._presets
+
+    def __len__(self):
+        return len(self._presets)
+
+    # Add or replace a preset (an existing one keeps its position)
+    def put(self, preset):
+        self.refresh()
+        self._presets[preset['name']] = preset
+        self._write()
+
+    def delete(self, name):
+        self.refresh()
+        if self._presets.pop(name, None) is not None:
+            self._write()
+
+    def _write(self):
+        write_json_atomic(self.path, list(self._presets.values()))
+        self._signature = file_signature(self.path)
@@ -0,0 +1,171 @@
+import math
+from collections import deque
+
+import numpy as np
+
+QUERY_BLOCK = 64  # Queries answered per cumulative histogram in add_many_and_query
+
+
+# Quantiles of the values seen over the last `window` seconds, kept as dense
+# count arrays over the values rounded down to `resolution`. The window is
+# split into `slices` time slices; when a slice falls out of the window its
+# counts are subtracted from the running totals. Adding is O(1) per value
+# (one bincount per batch) and a query is one cumsum and searchsorted over
+# the bins, so both stay cheap at any rate. The arrays span the rounded values
+# seen so far (4096 bins for raw 12-bit ADC readings), which suits bounded
+# readings such as ADC values or dB levels.
+class WindowedQuantiles:
+    def __init__(self, window=600.0, slices=10, resolution=1.0):
+        self.window = window
+        self.slices = slices
+        self.resolution = resolution
+        self.slice_duration = window / slices
+        self.clear()
+
+    def clear(self):
+        self._slices = deque()  # [slice index, offset, counts, count]
+        self._offset = 0        # Rounded value of _totals[0]
+        self._totals = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    # (offset, counts) widened to cover rounded values low to high; grows
+    # with some room to spare so a drifting range does not regrow every time
+    @staticmethod
+    def _fit(offset, counts, low, high):
+        size = len(counts)
+        if size == 0:
+            return low, np.zeros(high - low + 1, dtype=np.int64)
+        if low >= offset and high < offset + size:
+            return offset, counts
+        new_low = min(low, offset)
+        new_high = max(high, offset + size - 1)
+        room = (new_high - new_low + 1) // 2
+        if low < offset:
+            new_low -= room
+        if high >= offset + size:
+            new_high += room
+        grown = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        grown[offset - new_low:offset - new_low + size] = counts
+        return new_low, grown
+
+    # Slice holding time `now`, expiring slices that have left the window
+    def _slice(self, now):
+        index = math.floor(now / self.slice_duration)
+        slices = self._slices
+        if slices and slices[-1][0] >= index:
+            return slices[-1]  # Current slice (times running backwards stay in it)
+        while slices and slices[0][0] <= index - self.slices:
+            self._expire(slices.popleft())
+        entry = [index, 0, np.zeros(0, dtype=np.int64), 0]
+        slices.append(entry)
+        return entry
+
+    def _expire(self, entry):
+        _, offset, counts, count = entry
+        if count:
+            # A slice's array may have grown past the range of the totals
+            self._offset, self._totals = self._fit(self._offset, self._totals, offset, offset + len(counts) - 1)
+            start = offset - self._offset
+            self._totals[start:start + len(counts)] -= counts
+            self.count -= count
+
+    # Add counts of rounded values low to high (`counts`, or 1 for a single value)
+    def _add_counts(self, entry, low, high, counts, count):
+        entry[1], entry[2] = self._fit(entry[1], entry[2], low, high)
+        self._offset, self._totals = self._fit(self._offset, self._totals, low, high)
+        start = low - entry[1]
+        entry[2][start:start + high - low + 1] += counts
+        start = low - self._offset
+        self._totals[start:start + high - low + 1] += counts
+        entry[3] += count
+        self.count += count
+
+    def add(self, value, now):
+        key = math.floor(value / self.resolution)
+        self._add_counts(self._slice(now), key, key, 1, 1)
+
+    # Add arrays of values and their (non-decreasing) times
+    def add_many(self, values, timestamps):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        indexes = np.floor(timestamps / self.slice_duration)
+        # One group per time slice (nearly always a single one)
+        bounds = np.flatnonzero(np.diff(indexes)) + 1
+        keys = np.floor(values / self.resolution).astype(np.int64)
+        for start, end in zip(np.concatenate(([0], bounds)).tolist(),
+                              np.concatenate((bounds, [len(values)])).tolist()):
+            self._add_keys(self._slice(timestamps[start]), keys[start:end])
+
+    # add_many() that also answers queries part way through: returns the
+    # count and the values at quantiles `qs` as they stood after each of the
+    # (increasing, exclusive) indexes `ends`. Queries within one time slice are
+    # answered together from cumulative histograms, QUERY_BLOCK at a time,
+    # rather than one cumsum per query.
+    def add_many_and_query(self, values, timestamps, ends, qs):
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.intp)
+        qs = np.asarray(qs, dtype=np.float64)
+        counts = np.zeros(len(ends), dtype=np.int64)
+        results = np.zeros((len(ends), len(qs)))
+        if len(values) == 0:
+            return counts, results
+
+        keys = np.floor(values / self.resolution).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(np.floor(timestamps / self.slice_duration))) + 1
+        for group_start, group_end in zip(np.concatenate(([0], bounds)).tolist(),
+                                          np.concatenate((bounds, [len(values)])).tolist()):
+            entry = self._slice(timestamps[group_start])
+            group = keys[group_start:group_end]
+            low, high = int(group.min()), int(group.max())
+            first = int(np.searchsorted(ends, group_start, side='right'))
+            last = int(np.searchsorted(ends, group_end, side='right'))
+            position = group_start
+            for block in range(first, last, QUERY_BLOCK):
+                block_ends = ends[block:min(block + QUERY_BLOCK, last)]
+                end = int(block_ends[-1])
+                self._offset, self._totals = self._fit(self._offset, self._totals, low, high)
+                # Only the bins between the lowest and highest value present
+                span_low, span_high = low - self._offset, high - self._offset
+                present = np.flatnonzero(self._totals)
+                if len(present):
+                    span_low, span_high = min(span_low, int(present[0])), max(span_high, int(present[-1]))
+                span = span_high - span_low + 1
+
+                # Histogram of each stretch up to a query, accumulated onto the totals
+                sizes = np.diff(block_ends, prepend=position)
+                stretch = np.repeat(np.arange(len(block_ends)), sizes)
+                histograms = np.bincount(stretch * span + (keys[position:end] - self._offset - span_low),
+                                         minlength=len(block_ends) * span).reshape(len(block_ends), span)
+                np.cumsum(histograms, axis=0, out=histograms)
+                histograms += self._totals[span_low:span_high + 1]
+                cumulative = np.cumsum(histograms, axis=1)
+
+                block_counts = self.count + np.cumsum(sizes)
+                # At least 1 so that quantile 0 lands on the lowest value present
+                targets = np.maximum(block_counts[:, None] * qs, 1)
+                positions = (cumulative[:, None, :] < targets[:, :, None]).sum(axis=2)
+                counts[block:block + len(block_ends)] = block_counts
+                results[block:block + len(block_ends)] = (self._offset + span_low + positions) * self.resolution
+
+                self._add_keys(entry, keys[position:end])
+                position = end
+            if position < group_end:
+                self._add_keys(entry, keys[position:group_end])
+        return counts, results
+
+    def _add_keys(self, entry, keys):
+        low, high = int(keys.min()), int(keys.max())
+        self._add_counts(entry, low, high, np.bincount(keys - low), len(keys))
+
+    # Values at the given quantiles (0-1), or None while empty
+    def quantiles(self, qs):
+        if self.count == 0:
+            return None
+        cumulative = np.cumsum(self._totals)
+        # At least 1 so that quantile 0 lands on the lowest value present
+        targets = np.maximum(np.asarray(qs, dtype=np.float64) * self.count, 1)
+        positions = np.searchsorted(cumulative, targets, side='left')
+        return [(self._offset + position) * self.resolution for position in positions.tolist()]
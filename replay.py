@@ -0,0 +1,238 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from acoustic import AcousticMeter
+from datalog import LOG_HEADER, log_files
+from pipeline import NoisePipeline
+from serial_reader import SerialSampleReader
+from settings import Settings, SETTING_NAMES
+
+# Replay speeds offered in the GUI: label -> multiple of real time (0 = as fast as possible)
+REPLAY_SPEEDS = {'1x': 1.0, '10x': 10.0, '100x': 100.0, 'Max': 0.0}
+
+# Sample spacing assumed for raw captures, by wire format (see sketch_mar3a.ino)
+CAPTURE_INTERVALS = {'text': 0.1, 'binary': 0.01}
+
+
+# (timestamps, raw) from a data log written by log_data / CsvLogWriter.
+# With `include_rotated` the day/size-rotated siblings are read first.
+def read_log_samples(path, include_rotated=False):
+    timestamps = []
+    raw = []
+    for name in (log_files(path) if include_rotated else [path]):
+        with open(name, 'r', newline='') as f:
+            for row in csv.reader(f):
+                if not row or row[0] == LOG_HEADER[0]:
+                    continue
+                try:
+                    timestamps.append(float(row[0]))
+                    raw.append(float(row[2]))
+                except (ValueError, IndexError):
+                    continue
+    return np.array(timestamps, dtype=np.float64), np.array(raw, dtype=np.float64)
+
+
+# (timestamps, raw) from a capture of the raw serial bytes (text lines,
+# binary frames or raw audio frames), decoded by the same reader as the live
+# connection. The capture has no clock, so samples are spaced
+# `sample_interval` apart (default: the firmware rate for the detected
+# format). Raw audio is turned into sound levels with the acoustic settings
+# from `settings`, one sample per level block.
+def read_capture_samples(path, sample_interval=None, start_time=0.0, settings=None):
+    reader = SerialSampleReader(None)
+    meter = None
+    samples = []
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(65536)
+            if not data:
+                break
+            decoded = reader.feed(data)
+            if reader.mode == 'audio':
+                if meter is None:
+                    meter = AcousticMeter.from_settings(settings if settings is not None else Settings())
+                decoded = meter.feed(decoded).tolist()
+            samples += decoded
+    if sample_interval is None:
+        sample_interval = meter.block_duration if meter is not None else CAPTURE_INTERVALS.get(reader.mode, 0.1)
+    timestamps = start_time + np.arange(len(samples)) * sample_interval
+    return timestamps, np.array(samples, dtype=np.float64)
+
+
+# Load either kind of recording; CSV logs are recognized by their header
+def load_recording(path, sample_interval=None, settings=None):
+    with open(path, 'rb') as f:
+        head = f.read(len(LOG_HEADER[0]))
+    if head == LOG_HEADER[0].encode():
+        return read_log_samples(path)
+    return read_capture_samples(path, sample_interval, settings=settings)
+
+
+# Feeds recorded samples through a fresh NoisePipeline in place of the serial
+# port, with volume actuation off. Alert timing follows the recorded
+# timestamps, so results are the same at any speed. `speed` is a multiple of
+# real time; 0 runs as fast as possible. Progress is exposed as
+# `done`/`total`, like ExportJob, and `results()` summarizes the run.
+class ReplayJob:
+    def __init__(self, timestamps, raw, settings, speed=0.0, batch_size=1000, on_message=None,
+                 max_messages=1000):
+        self.timestamps = timestamps
+        self.raw = raw
+        self.settings = settings
+        self.speed = speed
+        self.batch_size = batch_size
+        self.on_message = on_message
+        self.total = len(timestamps)
+        self.done = 0
+        self.error = None
+        self.finished = False
+        self.cancelled = False
+
+        self.messages = deque(maxlen=max_messages)  # Newest event log lines
+        self.message_count = 0
+        self.alert_samples = 0
+        self.alert_events = 0
+        self.seconds_above = 0.0
+        self.processed_sum = 0.0
+        self.processed_max = 0.0
+        self.elapsed = 0.0
+
+        self._current_time = 0.0
+        self._pipeline = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def progress(self):
+        return 100.0 * self.done / self.total if self.total else 100.0
+
+    def run(self):
+        try:
+            self._replay()
+            self.cancelled = self._cancel.is_set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+        return self
+
+    def _replay(self):
+        pipeline = self._pipeline = NoisePipeline(on_message=self._message)
+        settings = self.settings
+        pipeline.configure_filters(settings.filter_chain)
+        threshold = settings.alert_threshold
+        timestamps = self.timestamps.tolist()
+        was_alert = False
+        previous_time = timestamps[0] if timestamps else 0.0
+        started = time.perf_counter()
+
+        position = 0
+        while position < self.total and not self._cancel.is_set():
+            end = min(position + self.batch_size, self.total)
+            if self.speed > 0:
+                # Only process samples whose (scaled) time has come
+                offset = (time.perf_counter() - started) * self.speed
+                due = int(np.searchsorted(self.timestamps, timestamps[0] + offset, side='right'))
+                if due <= position:
+                    wait = (timestamps[position] - timestamps[0]) / self.speed - (time.perf_counter() - started)
+                    self._cancel.wait(min(max(wait, 0.001), 0.05))
+                    continue
+                end = min(end, due)
+
+            # Smoothing, processing and the alert rules run on the whole batch
+            batch_times = self.timestamps[position:end]
+            self._current_time = timestamps[position]
+            smoothed = pipeline.filters.process(self.raw[position:end], batch_times)
+            processed, volume_levels = pipeline.process_batch(smoothed, settings, batch_times)
+            is_alert = pipeline.check_alerts(processed, settings, batch_times)
+            self.alert_samples += int(is_alert.sum())
+            starts = np.count_nonzero(is_alert[1:] & ~is_alert[:-1]) + (is_alert[0] and not was_alert)
+            self.alert_events += int(starts)
+            was_alert = bool(is_alert[-1])
+
+            gaps = np.minimum(np.diff(batch_times, prepend=previous_time), 1.0)
+            self.seconds_above += float(gaps[processed > threshold].sum())
+            self.processed_sum += float(processed.sum())
+            self.processed_max = max(self.processed_max, float(processed.max()))
+            previous_time = timestamps[end - 1]
+            position = self.done = end
+
+        self.elapsed = time.perf_counter() - started
+
+    # Alert messages carry the time of the sample they are about
+    def _message(self, text):
+        now = self._pipeline.event_time
+        if now is None:
+            now = self._current_time
+        self.message_count += 1
+        self.messages.append((now, text))
+        if self.on_message is not None:
+            self.on_message(now, text)
+
+    def results(self):
+        duration = float(self.timestamps[self.done - 1] - self.timestamps[0]) if self.done else 0.0
+        return {
+            'samples': self.done,
+            'recorded_seconds': duration,
+            'elapsed_seconds': self.elapsed,
+            'speedup': duration / self.elapsed if self.elapsed else 0.0,
+            'alert_events': self.alert_events,
+            'alert_samples': self.alert_samples,
+            'seconds_above_threshold': self.seconds_above,
+            'processed_mean': self.processed_sum / self.done if self.done else 0.0,
+            'processed_max': self.processed_max,
+            'messages': self.message_count,
+        }
+
+
+# Settings from a saved configuration file (keys as written by save_config)
+def settings_from_config(path):
+    with open(path, 'r') as f:
+        config = json.load(f)
+    return Settings(**{name: config[name] for name in SETTING_NAMES if name in config})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded noise log through the processing pipeline")
+    parser.add_argument('recording', help="CSV data log or raw serial capture")
+    parser.add_argument('--config', default="noise_config.json", help="settings to replay with")
+    parser.add_argument('--speed', type=float, default=0.0, help="multiple of real time (0 = as fast as possible)")
+    parser.add_argument('--interval', type=float, default=None, help="sample spacing for raw captures (s)")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    settings = settings_from_config(args.config) if os.path.exists(args.config) else Settings()
+    timestamps, raw = load_recording(args.recording, args.interval, settings)
+
+    def show(timestamp, text):
+        if not args.json:
+            print(f"[{timestamp:.3f}] {text}")
+
+    job = ReplayJob(timestamps, raw, settings, speed=args.speed, on_message=show).run()
+    if job.error is not None:
+        raise job.error
+    results = job.results()
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        for name, value in results.items():
+            print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+# Rollup tiers: name -> bucket length in seconds. Each tier is built from the
+# closed rows of the tier before it.
+TIERS = (('1s', 1), ('1min', 60), ('1h', 3600))
+
+# Processed noise is on a 0-100 scale; one histogram bin per unit makes
+# percentiles exact to 1 unit and lets rows be merged by adding histograms.
+HIST_BINS = 101
+
+
+def rollup_dtype(hist_type):
+    return np.dtype([
+        ('start', '<f8'),       # Bucket start (epoch seconds)
+        ('count', '<u4'),       # Samples in the bucket
+        ('sum', '<f8'),         # Sum of processed noise
+        ('energy', '<f8'),      # Sum of 10^(processed/10), for Leq
+        ('min', '<f4'),
+        ('max', '<f4'),
+        ('above', '<f4'),       # Seconds above the alert threshold
+        ('volume_sum', '<f8'),
+        ('volume_min', '<f4'),
+        ('volume_max', '<f4'),
+        ('hist', hist_type, (HIST_BINS,)),
+    ])
+
+
+# 1 s rows hold at most one second of samples, so 16-bit bin counts suffice
+TIER_DTYPES = {'1s': rollup_dtype('<u2'), '1min': rollup_dtype('<u4'), '1h': rollup_dtype('<u4')}
+
+
+# Merge rows into one row per `keys` value (rows must be sorted by key)
+def aggregate(rows, keys, dtype):
+    if len(rows) == 0:
+        return np.zeros(0, dtype=dtype)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    out = np.zeros(len(starts), dtype=dtype)
+    out['start'] = keys[starts]
+    for name in ('count', 'sum', 'energy', 'above', 'volume_sum'):
+        out[name] = np.add.reduceat(rows[name], starts)
+    for name in ('min', 'volume_min'):
+        out[name] = np.minimum.reduceat(rows[name], starts)
+    for name in ('max', 'volume_max'):
+        out[name] = np.maximum.reduceat(rows[name], starts)
+    out['hist'] = np.add.reduceat(rows['hist'].astype(np.uint32), starts, axis=0)
+    return out
+
+
+# Per-row value below which q percent of the row's samples fall, from the
+# histograms (exact to one histogram bin)
+def row_percentile(rows, q):
+    cumulative = np.cumsum(rows['hist'], axis=1, dtype=np.uint64)
+    return np.argmax(cumulative >= (q / 100 * rows['count'])[:, None], axis=1)
+
+
+# Mean, extremes, Leq, percentiles and time above threshold over all of `rows`
+def summarize(rows, percentiles=(10, 50, 90)):
+    if len(rows) == 0:
+        return None
+    total = aggregate(rows, np.full(len(rows), rows['start'][0]), rows.dtype)
+    count = int(total['count'][0])
+    summary = {
+        'start': float(total['start'][0]),
+        'count': count,
+        'mean': float(total['sum'][0] / count),
+        'min': float(total['min'][0]),
+        'max': float(total['max'][0]),
+        'leq': float(10 * np.log10(total['energy'][0] / count)),
+        'above_seconds': float(total['above'][0]),
+        'volume_mean': float(total['volume_sum'][0] / count),
+        'volume_min': float(total['volume_min'][0]),
+        'volume_max': float(total['volume_max'][0]),
+    }
+    for q in percentiles:
+        summary[f'p{q}'] = int(row_percentile(total, q)[0])
+    return summary
+
+
+# One tier: an open (still filling) bucket in memory plus closed rows
+# appended to a flat binary file of fixed-size records.
+class _Tier:
+    def __init__(self, name, seconds, path):
+        self.name = name
+        self.seconds = seconds
+        self.path = path
+        self.dtype = TIER_DTYPES[name]
+        self.open = np.zeros(0, dtype=self.dtype)
+
+    # Merge finer rows in; returns the rows closed by this call
+    def add(self, rows):
+        rows = np.concatenate((self.open, rows.astype(self.dtype)))
+        keys = np.floor(rows['start'] / self.seconds) * self.seconds
+        grouped = aggregate(rows, keys, self.dtype)
+        closed, self.open = grouped[:-1], grouped[-1:]
+        self._append(closed)
+        return closed
+
+    # Close the open bucket (on shutdown). It may be partial: after a restart
+    # within the same bucket a second row with the same start follows, and
+    # query() merges the two.
+    def close_open(self):
+        closed, self.open = self.open, np.zeros(0, dtype=self.dtype)
+        self._append(closed)
+        return closed
+
+    def _append(self, rows):
+        if len(rows):
+            with open(self.path, 'ab') as f:
+                rows.tofile(f)
+
+    # Stored rows (memory-mapped; a partly written last record is ignored)
+    def stored(self):
+        if not os.path.isfile(self.path):
+            return np.zeros(0, dtype=self.dtype)
+        count = os.path.getsize(self.path) // self.dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', shape=(count,))
+
+    # Rows whose bucket starts in [start_time, end_time), including the open
+    # one; rows sharing a start (a bucket split by a restart) are merged
+    def query(self, start_time, end_time):
+        stored = self.stored()
+        starts = stored['start']
+        first = int(np.searchsorted(starts, start_time, side='left'))
+        last = int(np.searchsorted(starts, end_time, side='left'))
+        rows = np.array(stored[first:last])
+        if len(self.open) and start_time <= self.open['start'][0] < end_time:
+            rows = np.concatenate((rows, self.open))
+        if len(rows) > 1 and np.any(np.diff(rows['start']) == 0):
+            rows = aggregate(rows, rows['start'], self.dtype)
+        return rows
+
+
+# Maintains 1 s / 1 min / 1 h rollups of processed noise and volume as
+# samples arrive. Raw samples are reduced straight to 1 s rows with
+# vectorized reductions; every closed row cascades into the next tier, so a
+# query over weeks reads a few thousand pre-aggregated rows instead of
+# millions of samples. Rows are persisted as rollup-<tier>.bin in `directory`.
+class Rollups:
+    def __init__(self, directory, threshold=None, max_gap=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.threshold = threshold  # Callable returning the current alert threshold
+        self.max_gap = max_gap      # Longest interval credited to one sample
+        self.tiers = [_Tier(name, seconds, os.path.join(directory, f"rollup-{name}.bin"))
+                      for name, seconds in TIERS]
+        self._tiers_by_name = {tier.name: tier for tier in self.tiers}
+        self._last_timestamp = None
+        self._lock = threading.Lock()
+
+    # Add a batch of samples (sorted timestamps)
+    def add(self, timestamps, processed, volume):
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        processed = np.asarray(processed, dtype=np.float64)
+        volume = np.asarray(volume, dtype=np.float64)
+        threshold = self.threshold() if self.threshold is not None else np.inf
+
+        with self._lock:
+            # Keep timestamps non-decreasing (as SampleStore does) so rows stay sorted
+            previous = self._last_timestamp if self._last_timestamp is not None else timestamps[0]
+            if timestamps[0] < previous or np.any(np.diff(timestamps) < 0):
+                timestamps = np.maximum.accumulate(np.maximum(timestamps, previous))
+
+            # Time each sample stands for, capped so gaps don't count as "above"
+            dt = np.clip(np.diff(timestamps, prepend=previous), 0, self.max_gap)
+            self._last_timestamp = timestamps[-1]
+
+            seconds = np.floor(timestamps)
+            starts = np.flatnonzero(np.concatenate(([True], seconds[1:] != seconds[:-1])))
+            rows = np.zeros(len(starts), dtype=TIER_DTYPES['1s'])
+            rows['start'] = seconds[starts]
+            rows['count'] = np.diff(np.append(starts, len(timestamps)))
+            rows['sum'] = np.add.reduceat(processed, starts)
+            rows['energy'] = np.add.reduceat(10 ** (processed / 10), starts)
+            rows['min'] = np.minimum.reduceat(processed, starts)
+            rows['max'] = np.maximum.reduceat(processed, starts)
+            rows['above'] = np.add.reduceat(np.where(processed > threshold, dt, 0.0), starts)
+            rows['volume_sum'] = np.add.reduceat(volume, starts)
+            rows['volume_min'] = np.minimum.reduceat(volume, starts)
+            rows['volume_max'] = np.maximum.reduceat(volume, starts)
+
+            # Histogram per row in one bincount over (row, bin) pairs
+            row_index = np.repeat(np.arange(len(starts)), rows['count'])
+            bins = np.clip(np.rint(processed), 0, HIST_BINS - 1).astype(np.int64)
+            rows['hist'] = np.bincount(row_index * HIST_BINS + bins,
+                                       minlength=len(starts) * HIST_BINS).reshape(len(starts), HIST_BINS)
+
+            for tier in self.tiers:
+                rows = tier.add(rows)
+                if len(rows) == 0:
+                    break
+
+    # Write out every open bucket (call on shutdown). Rows closed in a tier,
+    # whether by the merge or as its open bucket, cascade into the next one.
+    def close(self):
+        with self._lock:
+            closed = np.zeros(0, dtype=TIER_DTYPES['1s'])
+            for tier in self.tiers:
+                if len(closed):
+                    closed = np.concatenate((tier.add(closed), tier.close_open()))
+                else:
+                    closed = tier.close_open()
+
+    def query(self, tier, start_time, end_time):
+        with self._lock:
+            return self._tiers_by_name[tier].query(start_time, end_time)
+
+    # Hourly rows merged into one row per local calendar day
+    def daily(self, start_time, end_time):
+        rows = self.query('1h', start_time, end_time)
+        midnights = {}
+        keys = np.empty(len(rows))
+        for i, start in enumerate(rows['start'].tolist()):
+            day = date.fromtimestamp(start)
+            if day not in midnights:
+                midnights[day] = time.mktime(day.timetuple())
+            keys[i] = midnights[day]
+        return aggregate(rows, keys, TIER_DTYPES['1h'])
@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# Views over one contiguous run of stored samples
+StoreChunk = namedtuple('StoreChunk', ['timestamp', 'raw', 'processed', 'volume'])
+
+COLUMNS = (('timestamp', np.float64), ('raw', np.float32), ('processed', np.float32), ('volume', np.float32))
+INDEX_STRIDE = 4096  # One sparse index entry per this many samples
+
+
+# One fixed-size segment directory: a preallocated memory-mapped file per
+# column, a sparse index holding every INDEX_STRIDE-th timestamp, and
+# segment.json with the committed sample count and time span.
+class _Segment:
+    def __init__(self, path, capacity, count=0, first=None, last=None):
+        self.path = path
+        self.capacity = capacity
+        self.count = count
+        self.first = first
+        self.last = last
+        self._mapping = None  # (columns, index, writable), swapped as a whole
+
+    @classmethod
+    def create(cls, path, capacity):
+        os.makedirs(path)
+        for name, dtype in COLUMNS:
+            with open(os.path.join(path, name + '.bin'), 'wb') as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize)
+        with open(os.path.join(path, 'index.bin'), 'wb') as f:
+            f.truncate(cls._index_length(capacity) * 8)
+        segment = cls(path, capacity)
+        segment.save()
+        return segment
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'segment.json'), 'r') as f:
+            meta = json.load(f)
+        return cls(path, meta['capacity'], meta['count'], meta.get('first'), meta.get('last'))
+
+    @staticmethod
+    def _index_length(capacity):
+        return (capacity + INDEX_STRIDE - 1) // INDEX_STRIDE
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    # Map the column files on first use (writable while the segment is active).
+    # Returns (columns, index); callers keep their own reference so a
+    # concurrent close() cannot pull the maps out from under them.
+    def open(self, writable=False):
+        mapping = self._mapping
+        if mapping is None or (writable and not mapping[2]):
+            mode = 'r+' if writable else 'r'
+            columns = [np.memmap(os.path.join(self.path, name + '.bin'), dtype=dtype, mode=mode,
+                                 shape=(self.capacity,)) for name, dtype in COLUMNS]
+            index = np.memmap(os.path.join(self.path, 'index.bin'), dtype=np.float64, mode=mode,
+                              shape=(self._index_length(self.capacity),))
+            mapping = self._mapping = (columns, index, writable)
+        return mapping[0], mapping[1]
+
+    def write(self, values):
+        columns, index = self.open(writable=True)
+        start = self.count
+        end = start + len(values[0])
+        for column, value in zip(columns, values):
+            column[start:end] = value
+
+        # Extend the sparse index for every stride boundary we crossed
+        first_entry = (start + INDEX_STRIDE - 1) // INDEX_STRIDE
+        last_entry = (end - 1) // INDEX_STRIDE
+        if first_entry <= last_entry:
+            index[first_entry:last_entry + 1] = columns[0][first_entry * INDEX_STRIDE:end:INDEX_STRIDE]
+
+        if self.first is None:
+            self.first = float(values[0][0])
+        self.last = float(values[0][-1])
+        self.count = end  # Readers only look below count, so publish it last
+
+    # Persist the column data and the committed count
+    def save(self):
+        mapping = self._mapping
+        if mapping is not None and mapping[2]:
+            for column in mapping[0]:
+                column.flush()
+            mapping[1].flush()
+        meta = {'capacity': self.capacity, 'count': self.count, 'first': self.first, 'last': self.last}
+        temp_path = os.path.join(self.path, 'segment.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, os.path.join(self.path, 'segment.json'))
+
+    # First position below `count` whose timestamp is >= t: a search of the
+    # sparse index followed by one within a single INDEX_STRIDE block
+    @staticmethod
+    def locate(columns, index, count, t):
+        entries = index[:(count + INDEX_STRIDE - 1) // INDEX_STRIDE]
+        block = max(int(np.searchsorted(entries, t, side='left')) - 1, 0)
+        lo = block * INDEX_STRIDE
+        hi = min(lo + INDEX_STRIDE, count)
+        return lo + int(np.searchsorted(columns[0][lo:hi], t, side='left'))
+
+    def close(self):
+        self._mapping = None
+
+
+# Append-only on-disk store of full-rate samples. Samples go into fixed-width
+# column files in numbered segment directories, memory-mapped for both writing
+# and reading, so a time-range query is two binary searches per segment and
+# returns NumPy views into the page cache without any parsing.
+#
+# There is a single writer; readers on other threads see a segment's samples
+# once its count has been advanced past them.
+class SampleStore:
+    def __init__(self, directory, segment_capacity=1 << 20):
+        self.directory = directory
+        self.segment_capacity = segment_capacity
+        self.segments = []
+        self._write_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.startswith('seg-') and os.path.isfile(os.path.join(path, 'segment.json')):
+                self.segments.append(_Segment.load(path))
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    # (first, last) timestamp stored, or None when empty
+    def time_range(self):
+        stored = [segment for segment in self.segments if segment.count]
+        if not stored:
+            return None
+        return stored[0].first, stored[-1].last
+
+    # Append equally long arrays of samples. Timestamps are kept non-decreasing
+    # (a clock stepping backwards is clamped) so range queries stay valid.
+    def append(self, timestamps, raw, processed, volume):
+        values = [np.asarray(timestamps, dtype=np.float64), np.asarray(raw, dtype=np.float32),
+                  np.asarray(processed, dtype=np.float32), np.asarray(volume, dtype=np.float32)]
+        if len(values[0]) == 0:
+            return
+        with self._write_lock:
+            last = self._last_timestamp()
+            if last is not None and (values[0][0] < last or np.any(np.diff(values[0]) < 0)):
+                values[0] = np.maximum.accumulate(np.maximum(values[0], last))
+
+            offset = 0
+            total = len(values[0])
+            while offset < total:
+                segment = self._active_segment()
+                take = min(segment.capacity - segment.count, total - offset)
+                segment.write([value[offset:offset + take] for value in values])
+                offset += take
+                if segment.full:
+                    segment.save()
+
+    # Make everything appended so far durable
+    def flush(self):
+        with self._write_lock:
+            if self.segments:
+                self.segments[-1].save()
+
+    # Views of the samples with start_time <= timestamp < end_time, one chunk
+    # per segment touched, oldest first
+    def query(self, start_time, end_time):
+        chunks = []
+        for segment in list(self.segments):
+            count = segment.count
+            if not count or segment.last < start_time or segment.first >= end_time:
+                continue
+            columns, index = segment.open()
+            start = segment.locate(columns, index, count, start_time)
+            end = segment.locate(columns, index, count, end_time)
+            if end > start:
+                chunks.append(StoreChunk(*(column[start:end] for column in columns)))
+        return chunks
+
+    # Same as query() but concatenated into one set of arrays (copies)
+    def query_arrays(self, start_time, end_time):
+        chunks = self.query(start_time, end_time)
+        if not chunks:
+            return StoreChunk(*(np.empty(0, dtype=dtype) for _, dtype in COLUMNS))
+        return StoreChunk(*(np.concatenate(parts) for parts in zip(*chunks)))
+
+    def close(self):
+        self.flush()
+        for segment in self.segments:
+            segment.close()
+
+    def _last_timestamp(self):
+        for segment in reversed(self.segments):
+            if segment.count:
+                return segment.last
+        return None
+
+    def _active_segment(self):
+        if self.segments and not self.segments[-1].full:
+            return self.segments[-1]
+        if self.segments:
+            # Drop the writable maps; readers remap the sealed segment read-only
+            self.segments[-1].close()
+        number = len(self.segments) + 1
+        path = os.path.join(self.directory, f"seg-{number:06d}")
+        segment = _Segment.create(path, self.segment_capacity)
+        self.segments.append(segment)
+        return segment
+
+
+# Copies new samples from the in-memory SampleHistory into a SampleStore on a
+# background thread. The ring buffer acts as the queue, so the sampling path
+# does no extra work; samples are lost only if the persister falls more than
+# a full history capacity behind (counted in `lost`). Each `consumers`
+# callable also receives every new batch as (timestamp, raw, processed,
+# volume) arrays, whether or not the store is enabled.
+class HistoryPersister:
+    def __init__(self, history, store, interval=1.0, flush_interval=10.0, is_enabled=None, on_error=None,
+                 consumers=()):
+        self.history = history
+        self.store = store
+        self.consumers = list(consumers)
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.is_enabled = is_enabled
+        self.on_error = on_error
+        self.persisted = history.total
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-persister", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.persist()
+        self.store.flush()
+
+    # Switch to a new history buffer (e.g. after its capacity changed)
+    def attach(self, history):
+        with self._lock:
+            self._persist()
+            self.history = history
+            self.persisted = history.total
+
+    # Copy any samples not yet in the store (safe to call from any thread)
+    def persist(self):
+        with self._lock:
+            return self._persist()
+
+    def _persist(self):
+        history = self.history
+        snapshot = history.snapshot(include_cleared=True)
+        new = snapshot.total - self.persisted
+        if new <= 0:
+            return 0
+        if new > len(snapshot.timestamp):
+            self.lost += new - len(snapshot.timestamp)
+            new = len(snapshot.timestamp)
+        self.persisted = snapshot.total
+        columns = [column[-new:] for column in snapshot[1:]]
+        if self.is_enabled is None or self.is_enabled():
+            self.store.append(*columns)
+        for consumer in self.consumers:
+            consumer(*columns)
+        return new
+
+    def _run(self):
+        since_flush = 0.0
+        while not self._stop.wait(self.interval):
+            try:
+                self.persist()
+                since_flush += self.interval
+                if since_flush >= self.flush_interval:
+                    self.store.flush()
+                    since_flush = 0.0
+            except Exception as e:
+                print(f"Error storing samples: {e}")
+                if self.on_error is not None:
+                    self.on_error(f"Error storing samples: {e}")
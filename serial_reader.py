@@ -0,0 +1,245 @@
+import binascii
+import struct
+import time
+
+import numpy as np
+
+# Binary frame layout (little-endian), see sketch_mar3a.ino:
+#   sync (A5 5A) | sequence u16 | device millis u32 | count u16 | count x u16 samples | CRC-16 u16
+# The CRC is CRC-16/CCITT-FALSE over everything between the sync and the CRC.
+# Raw audio frames (AUDIO_FRAMES) have the same layout with sync A5 5B.
+FRAME_SYNC = b'\xa5\x5a'
+AUDIO_SYNC = b'\xa5\x5b'
+FRAME_HEADER = struct.Struct('<2sHIH')
+FRAME_CRC = struct.Struct('<H')
+MAX_FRAME_SAMPLES = 1024
+
+
+# Extract the raw noise value from one text line sent by the ESP32.
+# Returns None when the line does not carry a reading.
+def parse_noise_line(line):
+    if line.isdigit():
+        # Just a number
+        return int(line)
+    if "Noise Level:" in line:
+        # Format: "Raw Noise Level: X | Smoothed Noise: Y | Mapped Volume: Z"
+        parts = line.split('|')[0].split(':')
+        if len(parts) >= 2:
+            noise_part = parts[1].strip()
+            if noise_part.isdigit():
+                return int(noise_part)
+    return None
+
+
+# Reads whatever the port has buffered in one call instead of polling
+# in_waiting/readline with a sleep, and turns it into raw noise samples.
+# The text format, binary frames and raw audio frames are accepted; the format
+# is detected from the first valid line or frame. In 'audio' mode the samples
+# are audio waveform (see acoustic.py) and come back as a NumPy array. Partial lines/frames stay in a reusable
+# bytearray until the rest arrives. With an enabled `metrics` (see metrics.py)
+# the port read and the decoding are timed separately.
+class SerialSampleReader:
+    def __init__(self, ser, max_read=65536, max_line_length=4096, metrics=None):
+        self.ser = ser
+        self.metrics = metrics
+        self.max_read = max_read
+        self.max_line_length = max_line_length
+        self.buffer = bytearray()
+        self.mode = None  # 'text', 'binary' or 'audio' once detected
+        self._sync = FRAME_SYNC
+
+        # Counters (written by the reading thread only)
+        self.total_bytes = 0
+        self.total_lines = 0
+        self.invalid_lines = 0
+        self.total_frames = 0
+        self.frame_errors = 0
+        self.lost_frames = 0
+        self.dropped_bytes = 0
+        self.port_high_water = 0
+        self.buffer_high_water = 0
+        self.last_sequence = None
+        self.last_device_time = None
+        self.last_arrival = 0.0  # perf_counter when the last data was read (timed reads only)
+        self._last_stats_time = time.monotonic()
+        self._last_stats_bytes = 0
+        self._last_stats_lines = 0
+        self._last_stats_frames = 0
+
+    # Block until data arrives (or the port timeout expires), then return the
+    # raw samples decoded so far as a list of ints (an array in audio mode).
+    def read_samples(self):
+        waiting = self.ser.in_waiting
+        if waiting > self.port_high_water:
+            self.port_high_water = waiting
+        metrics = self.metrics
+        if metrics is not None and metrics.enabled:
+            return self._read_samples_timed(waiting, metrics)
+        data = self.ser.read(min(max(waiting, 1), self.max_read))
+        if not data:
+            return []
+        return self.feed(data)
+
+    def _read_samples_timed(self, waiting, metrics):
+        start = time.perf_counter()
+        data = self.ser.read(min(max(waiting, 1), self.max_read))
+        self.last_arrival = read_done = time.perf_counter()
+        if waiting:
+            # Only reads of already buffered data; otherwise this is idle waiting
+            metrics.observe('serial_read', read_done - start)
+        if not data:
+            return []
+        samples = self.feed(data)
+        metrics.observe('parse', time.perf_counter() - read_done)
+        metrics.count('bytes_in', len(data))
+        metrics.count('samples_in', len(samples))
+        return samples
+
+    # Decode `data` plus anything carried over from the previous read
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        self.total_bytes += len(data)
+        if len(buffer) > self.buffer_high_water:
+            self.buffer_high_water = len(buffer)
+
+        if self.mode is None:
+            self.mode = self._detect_mode()
+            if self.mode is None:
+                # Nothing recognizable yet; don't let boot noise grow the buffer forever
+                if len(buffer) > self.max_line_length:
+                    self.dropped_bytes += len(buffer)
+                    del buffer[:]
+                return []
+
+        if self.mode == 'binary':
+            return self._parse_frames().tolist()
+        if self.mode == 'audio':
+            return self._parse_frames()
+        return self._parse_lines()
+
+    # Pick the wire format from the first valid frame or parseable line
+    def _detect_mode(self):
+        for mode, sync in (('binary', FRAME_SYNC), ('audio', AUDIO_SYNC)):
+            self._sync = sync
+            frame, _ = self._next_frame(0)
+            if frame is not None:
+                return mode
+        self._sync = FRAME_SYNC
+        for line in bytes(self.buffer).split(b'\n')[:-1]:
+            if parse_noise_line(line.decode('utf-8', errors='replace').strip()) is not None:
+                return 'text'
+        return None
+
+    def _parse_lines(self):
+        buffer = self.buffer
+        end = buffer.rfind(b'\n')
+        if end < 0:
+            # No line terminator yet; guard against a runaway stream of garbage
+            if len(buffer) > self.max_line_length:
+                self.dropped_bytes += len(buffer)
+                del buffer[:]
+            return []
+
+        lines = bytes(buffer[:end]).split(b'\n')
+        del buffer[:end + 1]
+        self.total_lines += len(lines)
+
+        samples = []
+        for raw_line in lines:
+            line = raw_line.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            noise_value = parse_noise_line(line)
+            if noise_value is None:
+                self.invalid_lines += 1
+                print(f"Invalid data received: {line}")
+            else:
+                samples.append(noise_value)
+        return samples
+
+    # Find the next frame with a valid CRC at or after `pos`.
+    # Returns (frame, keep_from): frame is (start, sequence, device_time, count)
+    # or None, and keep_from is where unconsumed data begins.
+    def _next_frame(self, pos):
+        buffer = self.buffer
+        sync = self._sync
+        while True:
+            start = buffer.find(sync, pos)
+            if start < 0:
+                # Keep a trailing half of the sync marker for the next read
+                if buffer.endswith(sync[:1]):
+                    return None, max(pos, len(buffer) - 1)
+                return None, max(pos, len(buffer))
+            if len(buffer) - start < FRAME_HEADER.size:
+                return None, start
+
+            _, sequence, device_time, count = FRAME_HEADER.unpack_from(buffer, start)
+            if count > MAX_FRAME_SAMPLES:
+                # Not a real header; resync on the next marker
+                self.frame_errors += 1
+                pos = start + 1
+                continue
+            end = start + FRAME_HEADER.size + 2 * count
+            if len(buffer) < end + FRAME_CRC.size:
+                return None, start
+
+            (crc,) = FRAME_CRC.unpack_from(buffer, end)
+            with memoryview(buffer) as view:
+                valid = binascii.crc_hqx(view[start + len(sync):end], 0xFFFF) == crc
+            if not valid:
+                self.frame_errors += 1
+                pos = start + 1
+                continue
+            return (start, sequence, device_time, count), end + FRAME_CRC.size
+
+    def _parse_frames(self):
+        buffer = self.buffer
+        blocks = []
+        pos = 0
+        while True:
+            frame, keep_from = self._next_frame(pos)
+            if frame is None:
+                break
+            start, sequence, device_time, count = frame
+            self.dropped_bytes += start - pos
+
+            # Sequence gaps mean frames were lost on the wire
+            if self.last_sequence is not None:
+                self.lost_frames += (sequence - self.last_sequence - 1) & 0xFFFF
+            self.last_sequence = sequence
+            self.last_device_time = device_time
+            self.total_frames += 1
+
+            # View the samples in place; the only copy is the batch handed on
+            blocks.append(np.frombuffer(buffer, dtype='<u2', count=count,
+                                        offset=start + FRAME_HEADER.size))
+            pos = keep_from
+
+        samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint16)
+        del blocks  # release the views before resizing the buffer
+        self.dropped_bytes += keep_from - pos
+        del buffer[:keep_from]
+        return samples
+
+    # Throughput since the previous call plus lifetime counters
+    def stats(self):
+        now = time.monotonic()
+        elapsed = max(now - self._last_stats_time, 1e-9)
+        result = {
+            'mode': self.mode or 'detecting',
+            'bytes_per_sec': (self.total_bytes - self._last_stats_bytes) / elapsed,
+            'lines_per_sec': (self.total_lines - self._last_stats_lines) / elapsed,
+            'frames_per_sec': (self.total_frames - self._last_stats_frames) / elapsed,
+            'port_high_water': self.port_high_water,
+            'buffer_high_water': self.buffer_high_water,
+            'invalid_lines': self.invalid_lines,
+            'frame_errors': self.frame_errors,
+            'lost_frames': self.lost_frames,
+            'dropped_bytes': self.dropped_bytes,
+        }
+        self._last_stats_time = now
+        self._last_stats_bytes = self.total_bytes
+        self._last_stats_lines = self.total_lines
+        self._last_stats_frames = self.total_frames
+        return result
@@ -0,0 +1,73 @@
+import threading
+from dataclasses import dataclass, fields, replace
+
+
+# Immutable snapshot of every setting the processing path needs.
+# The GUI publishes a new snapshot whenever a widget changes; the serial
+# thread only ever reads `SettingsStore.current`, so no Tk calls happen per sample.
+@dataclass(frozen=True)
+class Settings:
+    version: int = 0
+    com_port: str = "COM3"
+    baud_rate: int = 115200
+    sensitivity: float = 3.0
+    min_threshold: int = 0
+    max_threshold: int = 3000
+    auto_calibrate: bool = True
+    calibration_window: float = 600.0  # Seconds of readings the auto-calibrated range covers
+    calibration_low: float = 5.0  # Percentile used as the minimum
+    calibration_high: float = 95.0  # Percentile used as the maximum
+    filter_chain: str = "average:5"  # See filters.py
+    audio_sample_rate: int = 8000  # AUDIO_SAMPLE_RATE of the firmware in raw audio mode
+    acoustic_metric: str = "leq"  # See acoustic.py
+    acoustic_window: float = 10.0  # Seconds covered by Leq/L10/L90
+    a_weighting: bool = True
+    acoustic_offset_db: float = 0.0  # Calibration added to dB re 1 ADC count
+    alert_threshold: int = 80
+    alert_duration: float = 3.0
+    alert_hysteresis: float = 0.0  # Points below the threshold the level must fall to resolve
+    alert_cooldown: float = 0.0  # Seconds after resolving before the alert can trigger again
+    alert_renotify: float = 0.0  # Seconds between repeat notifications while firing, 0 = once
+    alert_rules: str = ""  # Extra alert rules, see alerts.py
+    alert_enabled: bool = True
+    sound_alert: bool = True
+    volume_control: bool = True
+    default_volume: int = 50
+    max_volume: int = 100
+    volume_min_delta: float = 1.0  # Percent
+    volume_hysteresis: float = 0.0  # Percent
+    volume_max_rate: float = 20.0  # Updates per second, 0 = unlimited
+    volume_backend: str = "auto"
+    logging_enabled: bool = False
+    logging_interval: float = 5.0
+    log_file: str = "noise_log.csv"
+    log_every_sample: bool = False
+    log_rotate_daily: bool = True
+    log_max_mb: int = 100
+    store_enabled: bool = True
+
+
+SETTING_NAMES = tuple(f.name for f in fields(Settings) if f.name != 'version')
+
+
+# Holds the current snapshot. Readers take `current` without locking (a single
+# reference read); writers are serialized so versions increase monotonically.
+class SettingsStore:
+    def __init__(self, settings=None):
+        self._current = settings if settings is not None else Settings()
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self._current
+
+    # Publish a new snapshot with the given values. Returns the snapshot in
+    # effect afterwards; the version only moves when something actually changed.
+    def publish(self, **values):
+        with self._lock:
+            old = self._current
+            changed = {name: value for name, value in values.items() if getattr(old, name) != value}
+            if not changed:
+                return old
+            self._current = replace(old, version=old.version + 1, **changed)
+            return self._current
@@ -3,15 +3,104 @@ int noiseLevel = 0;
 const int smoothFactor = 10;  // Higher = Smoother changes
 int smoothedNoise = 0;
 
+// Set to 1 to send compact binary frames instead of text lines.
+// Frame: A5 5A | sequence u16 | millis u32 | count u16 | count x u16 samples | CRC-16 u16
+// (little-endian, CRC-16/CCITT-FALSE over sequence..samples). mfc.py detects either format.
+#define BINARY_FRAMES 0
+const int FRAME_SAMPLES = 10;                 // Samples per frame
+const unsigned long SAMPLE_INTERVAL_MS = 10;  // 100 samples/s in binary mode
+
+// Set to 1 to stream the raw microphone waveform for sound level measurement
+// on the host (Leq, L10, L90; see acoustic.py). Frames use the layout above
+// with sync A5 5B and AUDIO_FRAME_SAMPLES samples taken at AUDIO_SAMPLE_RATE.
+// This needs more bandwidth: select AUDIO_BAUD_RATE in the app and set its
+// Sample Rate to AUDIO_SAMPLE_RATE.
+#define AUDIO_FRAMES 0
+const unsigned long AUDIO_SAMPLE_RATE = 8000;
+const int AUDIO_FRAME_SAMPLES = 256;
+const unsigned long AUDIO_BAUD_RATE = 921600;
+
+uint16_t frameSamples[FRAME_SAMPLES];
+uint16_t audioSamples[AUDIO_FRAME_SAMPLES];
+int audioCount = 0;
+uint16_t audioSequence = 0;
+unsigned long nextAudioSample = 0;
+int frameCount = 0;
+uint16_t frameSequence = 0;
+unsigned long lastSampleTime = 0;
+
+uint16_t crc16(const uint8_t *data, size_t length) {
+    uint16_t crc = 0xFFFF;
+    while (length--) {
+        crc ^= (uint16_t)(*data++) << 8;
+        for (int i = 0; i < 8; i++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+void sendFrame(uint8_t syncLow, uint16_t &sequence, const uint16_t *samples, uint16_t count, uint32_t timestamp) {
+    static uint8_t frame[10 + AUDIO_FRAME_SAMPLES * 2 + 2];
+    size_t pos = 0;
+
+    frame[pos++] = 0xA5;
+    frame[pos++] = syncLow;
+    memcpy(frame + pos, &sequence, 2); pos += 2;
+    memcpy(frame + pos, &timestamp, 4); pos += 4;
+    memcpy(frame + pos, &count, 2); pos += 2;
+    memcpy(frame + pos, samples, count * 2); pos += count * 2;
+
+    uint16_t crc = crc16(frame + 2, pos - 2);
+    memcpy(frame + pos, &crc, 2); pos += 2;
+
+    Serial.write(frame, pos);
+    sequence++;
+}
+
 void setup() {
+#if AUDIO_FRAMES
+    Serial.setTxBufferSize(4096);  // Let a frame go out while the next one is sampled
+    Serial.begin(AUDIO_BAUD_RATE);
+#else
     Serial.begin(115200);
+#endif
     pinMode(analogPin, INPUT);
     analogReadResolution(12);
+#if AUDIO_FRAMES
+    nextAudioSample = micros();
+#endif
 }
 
 void loop() {
+#if AUDIO_FRAMES
+    // Paced from the previous sample time so the average rate stays exact
+    unsigned long now = micros();
+    if ((long)(now - nextAudioSample) < 0) {
+        return;
+    }
+    nextAudioSample += 1000000UL / AUDIO_SAMPLE_RATE;
+
+    audioSamples[audioCount++] = analogRead(analogPin);
+    if (audioCount == AUDIO_FRAME_SAMPLES) {
+        sendFrame(0x5B, audioSequence, audioSamples, audioCount, millis());
+        audioCount = 0;
+    }
+#elif BINARY_FRAMES
+    unsigned long now = millis();
+    if (now - lastSampleTime < SAMPLE_INTERVAL_MS) {
+        return;
+    }
+    lastSampleTime = now;
+
+    frameSamples[frameCount++] = analogRead(analogPin);
+    if (frameCount == FRAME_SAMPLES) {
+        sendFrame(0x5A, frameSequence, frameSamples, frameCount, now);
+        frameCount = 0;
+    }
+#else
     noiseLevel = analogRead(analogPin);
-    
+
     // Apply simple moving average smoothing
     smoothedNoise = (smoothedNoise * (smoothFactor - 1) + noiseLevel) / smoothFactor;
 
@@ -25,4 +114,5 @@ void loop() {
     Serial.println(volume);
 
     delay(100);
+#endif
 }
@@ -0,0 +1,29 @@
+import time
+
+
+# Single-slot "latest value wins" mailbox between a producer thread and the GUI.
+# The producer overwrites the slot on every post; the GUI polls it at its own
+# refresh rate and sees only the newest value. Posts that were overwritten
+# before being read are counted as merged. Publishing is one reference
+# assignment, so neither side takes a lock.
+class Mailbox:
+    def __init__(self):
+        self._slot = (0, None, 0.0)  # (sequence, value, post time)
+        self._sequence = 0           # Producer side only
+        self._taken = 0              # Consumer side only
+        self.merged = 0              # Posts never seen by the consumer
+        self.last_latency = 0.0      # Seconds between post and take of the last value
+
+    def post(self, value):
+        self._sequence += 1
+        self._slot = (self._sequence, value, time.monotonic())
+
+    # Return the newest value if it has not been taken yet, else None
+    def take(self):
+        sequence, value, posted = self._slot
+        if sequence == self._taken:
+            return None
+        self.merged += sequence - self._taken - 1
+        self._taken = sequence
+        self.last_latency = time.monotonic() - posted
+        return value
@@ -0,0 +1,276 @@
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+# Backend names accepted by create_backend ('auto' picks the first that works)
+VOLUME_BACKENDS = ('auto', 'pycaw', 'pulseaudio', 'alsa', 'mock', 'none')
+
+
+# Windows system volume through pycaw (Core Audio). Must be created on the
+# thread that will use it.
+class PycawBackend:
+    name = 'pycaw'
+
+    def __init__(self):
+        import comtypes
+        from ctypes import cast, POINTER
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        comtypes.CoInitialize()
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self._volume = cast(interface, POINTER(IAudioEndpointVolume))
+
+    def set(self, level):
+        self._volume.SetMasterVolumeLevelScalar(level, None)
+
+
+# Linux system volume by running the PulseAudio or ALSA mixer command
+class CommandBackend:
+    COMMANDS = {
+        'pulseaudio': ['pactl', 'set-sink-volume', '@DEFAULT_SINK@', '{percent}%'],
+        'alsa': ['amixer', '-q', 'sset', 'Master', '{percent}%'],
+    }
+
+    def __init__(self, name, timeout=2.0):
+        command = self.COMMANDS[name]
+        if shutil.which(command[0]) is None:
+            raise RuntimeError(f"{command[0]} not found")
+        self.name = name
+        self.command = command
+        self.timeout = timeout
+
+    def set(self, level):
+        args = [part.format(percent=round(level * 100)) for part in self.command]
+        subprocess.run(args, check=True, capture_output=True, timeout=self.timeout)
+
+
+# In-memory backend for tests and benchmarks; records (perf_counter, level)
+# of the most recent calls and can simulate a slow device with `delay`
+class MockBackend:
+    name = 'mock'
+
+    def __init__(self, delay=0.0, keep=10000):
+        self.delay = delay
+        self.level = None
+        self.count = 0
+        self.calls = deque(maxlen=keep)
+
+    def set(self, level):
+        if self.delay:
+            time.sleep(self.delay)
+        self.level = level
+        self.count += 1
+        self.calls.append((time.perf_counter(), level))
+
+
+def create_backend(name):
+    if name == 'none':
+        return None
+    if name == 'mock':
+        return MockBackend()
+    if name == 'pycaw':
+        return PycawBackend()
+    if name in CommandBackend.COMMANDS:
+        return CommandBackend(name)
+    if name == 'auto':
+        for candidate in (('pycaw',) if sys.platform == 'win32' else ('pulseaudio', 'alsa')):
+            try:
+                return create_backend(candidate)
+            except Exception:
+                continue
+        return None
+    raise ValueError(f"Unknown volume backend: {name}")
+
+
+# Applies volume targets on its own thread so a slow or failing backend never
+# stalls sampling. request() only stores the newest target (older pending
+# targets are collapsed into it) and wakes the thread, which then:
+#   - skips changes smaller than `min_delta`, and reversals of direction
+#     smaller than `hysteresis` (levels are 0.0 to 1.0),
+#   - waits so that at most `max_rate` calls per second reach the backend
+#     (0 = unlimited), picking up any newer target in the meantime,
+#   - counts and reports backend errors through `on_error` (at most one
+#     report per `error_interval` seconds).
+# `backend` is a backend object or a name for create_backend; named backends
+# are created on the actuator thread.
+class VolumeActuator:
+    def __init__(self, backend='auto', min_delta=0.01, hysteresis=0.0, max_rate=20.0, on_error=None,
+                 on_applied=None, metrics=None, error_interval=10.0):
+        self.min_delta = min_delta
+        self.hysteresis = hysteresis
+        self.max_rate = max_rate
+        self.on_error = on_error
+        self.on_applied = on_applied  # Called as on_applied(level, stamp, applied_time) after each set
+        self.metrics = metrics
+        self.error_interval = error_interval
+
+        self.backend = None
+        self.backend_name = None
+        self.open_span = None  # (start, end) perf_counter times of the last backend open
+        self._requested_backend = backend
+        self.level = None  # Last level the backend accepted
+
+        # Counters
+        self.requests = 0
+        self.applied = 0
+        self.suppressed = 0
+        self.errors = 0
+        self.no_backend = 0  # Targets taken while no backend was open
+        self.last_error = None
+
+        self._target = None   # (level, stamp, force), replaced as a whole by request()
+        self._handled = None  # Last target taken by the thread
+        self._direction = 0
+        self._last_set = 0.0
+        self._last_report = 0.0
+        self._unreported = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="volume-actuator", daemon=True)
+        self._thread.start()
+        self._wake.set()  # Open the backend right away
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Switch backend (applied by the actuator thread)
+    def set_backend(self, backend):
+        self._requested_backend = backend
+        self._wake.set()
+
+    def configure(self, min_delta, hysteresis, max_rate):
+        self.min_delta = min_delta
+        self.hysteresis = hysteresis
+        self.max_rate = max_rate
+
+    # Ask for a new level (0.0 to 1.0). Never blocks; `stamp` is the
+    # perf_counter time the request originates from, for latency figures.
+    def request(self, level, stamp=None):
+        self.requests += 1
+        self._target = (level, stamp if stamp is not None else time.perf_counter(), False)
+        if not self._wake.is_set():
+            self._wake.set()
+
+    # Set a level regardless of min_delta/hysteresis (e.g. the default volume).
+    # Counted as a request like any other.
+    def force(self, level):
+        self.requests += 1
+        self._target = (level, time.perf_counter(), True)
+        self._wake.set()
+
+    # Requests that were replaced by a newer one before the thread got to them
+    @property
+    def collapsed(self):
+        return max(self.requests - self.applied - self.suppressed - self.errors - self.no_backend, 0)
+
+    def stats(self):
+        return {
+            'backend': self.backend_name or 'none',
+            'requests': self.requests,
+            'applied': self.applied,
+            'suppressed': self.suppressed,
+            'collapsed': self.collapsed,
+            'errors': self.errors,
+            'no_backend': self.no_backend,
+            'last_error': self.last_error,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._requested_backend is not None:
+                self._open_backend(self._requested_backend)
+
+            target = self._target
+            if target is None or target is self._handled:
+                continue
+
+            # Rate limit; newer targets arriving during the wait replace this one
+            if self.max_rate > 0:
+                wait = self._last_set + 1.0 / self.max_rate - time.perf_counter()
+                if wait > 0:
+                    if self._stop.wait(wait):
+                        break
+                    target = self._target
+            self._handled = target
+            self._apply(*target)
+
+    def _open_backend(self, backend):
+        self._requested_backend = None
+        self.backend = None
+        self.backend_name = None
+        self.level = None
+        start = time.perf_counter()
+        try:
+            named = isinstance(backend, str)
+            if named:
+                backend = create_backend(backend)
+            if backend is not None:
+                self.backend = backend
+                self.backend_name = backend.name
+                if named:
+                    print(f"Volume control initialized ({backend.name})")
+        except Exception as e:
+            self._report(f"Error initializing volume control: {e}", force=True)
+        self.open_span = (start, time.perf_counter())
+
+    def _apply(self, level, stamp, force):
+        backend = self.backend
+        if backend is None:
+            self.no_backend += 1
+            return
+        if not force and self.level is not None:
+            delta = level - self.level
+            if abs(delta) < self.min_delta or (delta * self._direction < 0 and abs(delta) < self.hysteresis):
+                self.suppressed += 1
+                return
+
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            backend.set(level)
+        except Exception as e:
+            self.errors += 1
+            self._report(f"Volume error: {e}")
+            return
+        done = self._last_set = time.perf_counter()
+
+        if self.level is not None and level != self.level:
+            self._direction = 1 if level > self.level else -1
+        self.level = level
+        self.applied += 1
+        if metrics is not None and metrics.enabled:
+            metrics.observe('volume_set', done - start)
+            metrics.observe('volume_request_to_set', done - stamp)
+        if self.on_applied is not None:
+            self.on_applied(level, stamp, done)
+
+    def _report(self, message, force=False):
+        self.last_error = message
+        now = time.monotonic()
+        if not force and now - self._last_report < self.error_interval:
+            self._unreported += 1
+            return
+        if self._unreported:
+            message += f" ({self._unreported} more since the last report)"
+        self._unreported = 0
+        self._last_report = now
+        print(message)
+        if self.on_error is not None:
+            self.on_error(message)